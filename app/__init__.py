@@ -13,6 +13,9 @@ import app
 from config import Config
 from flask_moment import Moment
 from flask_wtf import CSRFProtect
+from app.cache import UserCache, FileCache
+from app.rendering import RenderPool
+from app.intervals import MonthIntervalCache
 
 # Initialiseer extensies globaal
 db = SQLAlchemy()
@@ -21,6 +24,10 @@ login = LoginManager()
 oauth = OAuth()
 csrf = CSRFProtect()
 moment = Moment()
+dashboard_cache = UserCache('dashboard')
+chart_cache = FileCache('weight_charts', suffix='.png')
+chart_renderer = RenderPool()
+calendar_cache = MonthIntervalCache()
 
 # Stel logging in
 logger = logging.getLogger(__name__)
@@ -80,6 +87,10 @@ def create_app(config_class=Config):
     login.init_app(app)  # Gebruikersauthenticatie
     oauth.init_app(app)  # OAuth voor Auth0
     csrf.init_app(app)  # Activeer CSRF-bescherming
+    dashboard_cache.init_app(app)  # Dashboard-cache per gebruiker
+    chart_cache.init_app(app)  # Gerenderde grafieken op schijf
+    chart_renderer.init_app(app)  # Procespool voor matplotlib-renders
+    calendar_cache.init_app(app)  # Interval tree van de huidige maand per gebruiker
 
     # Stel login-view in voor Flask-Login
     login.login_view = 'auth.login'  # Verwijs naar de login-route in de auth blueprint
@@ -127,6 +138,9 @@ def create_app(config_class=Config):
     from app.admin import admin
     app.register_blueprint(admin)
 
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)  # Flask CLI-commando's
+
     # Importeer modellen om database-tabellen te registreren
     from app import models
 
@@ -3,10 +3,19 @@
 from flask import render_template, redirect, url_for, flash, request, jsonify, session
 from datetime import datetime, timedelta
 import json
+import logging
+
+from flask_login import login_required, current_user
+
+from app import db
+from app.analytics import weekly_muscle_volume
+from app.models import User
 
 # Import the admin blueprint from __init__.py
 from app.admin import admin
 
+logger = logging.getLogger(__name__)
+
 
 # Mock data for development
 def get_mock_user():
@@ -696,6 +705,41 @@ def api_client_progress(client_id):
     return jsonify(progress)
 
 
+@admin.route('/api/clients/<int:client_id>/muscle_volume')
+@login_required
+def api_client_muscle_volume(client_id):
+    """Wekelijks volume per spiergroep van een klant (alleen voor trainers) - TIJDELIJK UITGESCHAKELD"""
+
+    # ===================================================================
+    # TIJDELIJKE BLOKKADE - Er is nog geen koppeling tussen trainer en klant,
+    # dus zonder blokkade kan elke trainer het volume van elke gebruiker lezen
+    # ===================================================================
+    logger.info(f"Opvragen spiervolume van klant {client_id} geblokkeerd voor gebruiker: {current_user.id}")
+    return jsonify({'error': 'Client not found'}), 404
+
+    # ===================================================================
+    # ORIGINELE CODE HIERONDER - BLIJFT BEHOUDEN VOOR LATER GEBRUIK
+    # Haal de blokkade weg zodra de trainer-klantrelatie bestaat en controleer
+    # dan ook dat de klant bij current_user hoort
+    # ===================================================================
+    if not current_user.is_trainer:
+        return jsonify({'error': 'Forbidden'}), 403
+    client = db.session.get(User, client_id)
+    if client is None or client.account_type != 'user':
+        return jsonify({'error': 'Client not found'}), 404
+
+    week_of = request.args.get('week')
+    try:
+        week_of = datetime.strptime(week_of, '%Y-%m-%d').date() if week_of else None
+    except ValueError:
+        return jsonify({'error': 'Invalid week, expected YYYY-MM-DD'}), 400
+
+    return jsonify({
+        'client_id': client.id,
+        'muscles': weekly_muscle_volume(client.id, week_of=week_of)
+    })
+
+
 @admin.route('/api/workouts/<int:workout_id>/assign', methods=['POST'])
 def api_assign_workout(workout_id):
     """Assign workout to clients"""
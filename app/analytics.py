@@ -0,0 +1,486 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import SetLog, Exercise, ExerciseMuscle, Muscle, exercise_muscle_association
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+WEEK = 7 * DAY
+# 1970-01-01 was een donderdag; met deze verschuiving beginnen weken op maandag
+WEEK_OFFSET = 3 * DAY
+
+FORMULAS = ('epley', 'brzycki')
+
+# Intensiteitszones als fractie van de beste geschatte 1RM per oefening
+INTENSITY_BINS = np.array([0.0, 0.5, 0.6, 0.7, 0.8, 0.9, np.inf])
+INTENSITY_LABELS = ['<50%', '50-60%', '60-70%', '70-80%', '80-90%', '90%+']
+
+# Relatieve 1RM-stijging per week waaronder een oefening als plateau telt
+PLATEAU_THRESHOLD = 0.005
+
+# Minimaal aantal trainingsweken voor een trend
+MIN_TREND_WEEKS = 3
+
+MUSCLES = [muscle.name for muscle in Muscle]
+
+# Aandeel van het setvolume dat meetelt voor primaire en secundaire spieren
+PRIMARY_WEIGHT = 1.0
+SECONDARY_WEIGHT = 0.5
+
+
+def estimate_one_rm(weight, reps, formula='epley'):
+    """
+    Geschatte 1RM per set, gevectoriseerd.
+
+    Args:
+        weight (array-like): Gewichten in kg.
+        reps (array-like): Herhalingen.
+        formula (str): 'epley' (gewicht * (1 + reps / 30)) of 'brzycki' (gewicht * 36 / (37 - reps)).
+
+    Returns:
+        np.ndarray: Schattingen; NaN waar geen schatting mogelijk is (geen gewicht, geen reps,
+        of Brzycki bij 37+ reps). Bij één rep is de schatting het gewicht zelf.
+    """
+    if formula not in FORMULAS:
+        raise ValueError(f'Onbekende formule: {formula}')
+    weight = np.asarray(weight, dtype=float)
+    reps = np.asarray(reps, dtype=float)
+    valid = (weight > 0) & (reps > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if formula == 'epley':
+            estimate = weight * (1.0 + reps / 30.0)
+        else:
+            estimate = weight * 36.0 / (37.0 - reps)
+            valid &= reps < 37
+    estimate = np.where(reps == 1, weight, estimate)
+    return np.where(valid, estimate, np.nan)
+
+
+def week_start(week):
+    """ISO-datum van de maandag van een weekindex (weken sinds de epoch, zie WEEK_OFFSET)."""
+    return datetime.fromtimestamp(int(week) * WEEK - WEEK_OFFSET, tz=timezone.utc).date().isoformat()
+
+
+def to_json(values, decimals=2):
+    """Zet een float-array om naar een lijst voor JSON, met None voor NaN."""
+    values = np.round(np.asarray(values, dtype=float), decimals)
+    return [None if np.isnan(value) else float(value) for value in values.ravel()]
+
+
+def masked_slope(matrix):
+    """
+    Kleinste-kwadraten helling per kolom over de rij-index, waarbij NaN ontbrekende punten zijn.
+
+    Returns:
+        tuple: (helling, aantal punten, gemiddelde) per kolom; helling is NaN bij minder dan twee punten.
+    """
+    mask = np.isfinite(matrix)
+    count = mask.sum(axis=0)
+    x = np.arange(matrix.shape[0], dtype=float)[:, None]
+    values = np.where(mask, matrix, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = (x * mask).sum(axis=0) / count
+        y_mean = values.sum(axis=0) / count
+        dx = np.where(mask, x - x_mean, 0.0)
+        slope = (dx * (values - y_mean)).sum(axis=0) / (dx ** 2).sum(axis=0)
+    return np.where(count >= 2, slope, np.nan), count, y_mean
+
+
+class MuscleWeights:
+    """
+    Onveranderlijke gewichtenmatrix oefeningen x spiergroepen (MUSCLES).
+
+    Notities:
+        - PRIMARY_WEIGHT voor primaire en SECONDARY_WEIGHT voor secundaire spieren; staat een spier
+          bij een oefening als beide geregistreerd, dan telt het hoogste gewicht.
+        - Volume per spiergroep is daarmee één matrix-vectorproduct: volume_per_oefening @ matrix.
+    """
+
+    def __init__(self, rows):
+        self.exercise_ids = sorted({exercise_id for exercise_id, _, _ in rows})
+        self.position = {exercise_id: i for i, exercise_id in enumerate(self.exercise_ids)}
+        self.matrix = np.zeros((len(self.exercise_ids), len(MUSCLES)))
+        muscle_index = {name: i for i, name in enumerate(MUSCLES)}
+        for exercise_id, muscle, is_primary in rows:
+            i, j = self.position[exercise_id], muscle_index[getattr(muscle, 'name', str(muscle).upper())]
+            self.matrix[i, j] = max(self.matrix[i, j], PRIMARY_WEIGHT if is_primary else SECONDARY_WEIGHT)
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls):
+        """Bouw de matrix met één query over exercise_muscle_association."""
+        rows = db.session.execute(
+            sa.select(
+                exercise_muscle_association.c.exercise_id, ExerciseMuscle.muscle, exercise_muscle_association.c.is_primary
+            ).join(ExerciseMuscle, ExerciseMuscle.id == exercise_muscle_association.c.muscle_id)
+        ).all()
+        weights = cls(rows)
+        logger.info(f"Spiergewichten geladen: {len(weights.exercise_ids)} oefeningen, {len(rows)} koppelingen")
+        return weights
+
+    def rows(self, exercise_ids):
+        """Deelmatrix in de volgorde van exercise_ids; oefeningen zonder spieren krijgen een nulrij."""
+        matrix = np.zeros((len(exercise_ids), len(MUSCLES)))
+        known = [(i, self.position[exercise_id]) for i, exercise_id in enumerate(exercise_ids) if exercise_id in self.position]
+        if known:
+            target, source = zip(*known)
+            matrix[list(target)] = self.matrix[list(source)]
+        return matrix
+
+    def muscle_volume(self, volume_by_exercise):
+        """
+        Verdeel volume per oefening over de spiergroepen.
+
+        Args:
+            volume_by_exercise (iterable): Paren (exercise_id, volume).
+
+        Returns:
+            np.ndarray: Volume per spiergroep in de volgorde van MUSCLES.
+        """
+        vector = np.zeros(len(self.exercise_ids))
+        for exercise_id, volume in volume_by_exercise:
+            i = self.position.get(exercise_id)
+            if i is not None:
+                vector[i] += volume or 0.0
+        return vector @ self.matrix
+
+
+class MuscleWeightStore:
+    """
+    Proces-lokale houder van MuscleWeights, naar het voorbeeld van ExerciseCatalog.
+
+    Notities:
+        - Wordt lui gebouwd bij het eerste gebruik en daarna atomair vervangen, nooit gemuteerd.
+        - Spierkoppelingen wijzigen alleen via seeding; de matrix wordt na EXERCISE_CATALOG_MAX_AGE
+          seconden opnieuw gebouwd.
+    """
+
+    def __init__(self):
+        self._weights = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self, weights):
+        max_age = current_app.config.get('EXERCISE_CATALOG_MAX_AGE', 600)
+        return weights is None or time.monotonic() - weights.built_at > max_age
+
+    def get(self):
+        """Geef de huidige matrix, en bouw hem (opnieuw) als hij ontbreekt of verouderd is."""
+        weights = self._weights
+        if self._is_stale(weights):
+            with self._lock:
+                weights = self._weights
+                if self._is_stale(weights):
+                    weights = MuscleWeights.build()
+                    self._weights = weights
+        return weights
+
+
+muscle_weights = MuscleWeightStore()
+
+
+def weekly_muscle_volume(user_id, week_of=None):
+    """
+    Volume per spiergroep in één kalenderweek (maandag t/m zondag).
+
+    Notities:
+        - Eén GROUP BY per oefening in SQL, daarna één matrix-vectorproduct met muscle_weights.
+
+    Args:
+        user_id (int): Gebruiker.
+        week_of (date, optional): Een dag in de gewenste week; standaard vandaag.
+
+    Returns:
+        list: [{'muscle', 'label', 'volume', 'percentage'}, ...] aflopend op volume, alleen spieren met
+        volume; percentage is relatief aan de meest getrainde spiergroep.
+    """
+    day = week_of or datetime.now(timezone.utc).date()
+    start = datetime.combine(day - timedelta(days=day.weekday()), datetime.min.time(), tzinfo=timezone.utc)
+    moment = db.func.coalesce(SetLog.completed_at, SetLog.created_at)
+    rows = db.session.execute(
+        sa.select(
+            SetLog.exercise_id,
+            db.func.sum(db.func.coalesce(SetLog.reps, 0) * db.func.coalesce(SetLog.weight, 0))
+        ).where(
+            SetLog.user_id == user_id,
+            SetLog.completed == True,
+            moment >= start,
+            moment < start + timedelta(days=7)
+        ).group_by(SetLog.exercise_id)
+    ).all()
+
+    volume = muscle_weights.get().muscle_volume(rows)
+    top = volume.max() if len(volume) else 0.0
+    return [{
+        'muscle': MUSCLES[i],
+        'label': Muscle[MUSCLES[i]].value.capitalize(),
+        'volume': round(float(volume[i]), 1),
+        'percentage': round(float(volume[i] / top * 100)),
+    } for i in np.argsort(-volume, kind='stable') if volume[i] > 0]
+
+
+class SetHistory:
+    """
+    Voltooide sets van één gebruiker als NumPy-kolommen.
+
+    Notities:
+        - Eén query, zonder ORM-objecten; alle analyses zijn daarna gevectoriseerde array-bewerkingen.
+        - timestamps zijn epoch-seconden (completed_at, anders created_at), oplopend gesorteerd.
+        - exercise bevat per set de index in exercise_ids.
+        - duration en distance zijn NaN voor krachtsets.
+    """
+
+    def __init__(self, timestamps, exercise, reps, weight, duration, distance, exercise_ids):
+        self.timestamps = timestamps
+        self.exercise = exercise
+        self.reps = reps
+        self.weight = weight
+        self.duration = duration
+        self.distance = distance
+        self.exercise_ids = exercise_ids
+        self._names = None
+
+    @classmethod
+    def load(cls, user_id, since=None):
+        """
+        Laad de set-historie van een gebruiker.
+
+        Args:
+            user_id (int): Gebruiker.
+            since (datetime, optional): Alleen sets vanaf dit moment.
+        """
+        moment = db.func.coalesce(SetLog.completed_at, SetLog.created_at)
+        stmt = sa.select(
+            sa.extract('epoch', moment), SetLog.exercise_id, SetLog.reps, SetLog.weight,
+            SetLog.duration_minutes, SetLog.distance_km
+        ).where(
+            SetLog.user_id == user_id,
+            SetLog.completed == True
+        )
+        if since is not None:
+            stmt = stmt.where(moment >= since)
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            empty = np.array([], dtype=float)
+            return cls(empty.astype(np.int64), empty.astype(np.intp), empty, empty, empty, empty, [])
+
+        timestamps, exercise_ids, reps, weight, duration, distance = zip(*rows)
+        timestamps = np.array(timestamps, dtype=float).astype(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        ids, exercise = np.unique(np.array(exercise_ids, dtype=str), return_inverse=True)
+        return cls(
+            timestamps[order],
+            exercise[order],
+            np.array(reps, dtype=float)[order],
+            np.array(weight, dtype=float)[order],
+            np.array(duration, dtype=float)[order],
+            np.array(distance, dtype=float)[order],
+            ids.tolist()
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def weeks(self):
+        """Weekindex per set (maandag-weken sinds de epoch)."""
+        return (self.timestamps + WEEK_OFFSET) // WEEK
+
+    @property
+    def volume(self):
+        """reps * gewicht per set; 0 voor sets zonder gewicht (cardio, lichaamsgewicht)."""
+        return np.nan_to_num(self.reps * self.weight)
+
+    @property
+    def names(self):
+        """Namen van de oefeningen in exercise_ids (één query, gecachet)."""
+        if self._names is None:
+            rows = db.session.execute(
+                sa.select(Exercise.id, Exercise.name).where(Exercise.id.in_(self.exercise_ids))
+            ).all() if self.exercise_ids else []
+            by_id = dict(rows)
+            self._names = [by_id.get(exercise_id, exercise_id) for exercise_id in self.exercise_ids]
+        return self._names
+
+    def exercise_index(self, exercise_id):
+        """Index van een oefening in exercise_ids, of None als er geen sets van zijn."""
+        try:
+            return self.exercise_ids.index(exercise_id)
+        except ValueError:
+            return None
+
+    def _week_range(self):
+        weeks = self.weeks
+        first = int(weeks.min())
+        return weeks - first, first, int(weeks.max()) - first + 1
+
+    def one_rm_curve(self, exercise_id, formula='epley'):
+        """
+        Beste geschatte 1RM per trainingsdag voor één oefening.
+
+        Returns:
+            dict: dates, one_rm (beste schatting van die dag) en best (lopend maximum).
+        """
+        index = self.exercise_index(exercise_id)
+        if index is None:
+            return {'exercise_id': exercise_id, 'formula': formula, 'dates': [], 'one_rm': [], 'best': []}
+        estimate = estimate_one_rm(self.weight, self.reps, formula)
+        mask = (self.exercise == index) & np.isfinite(estimate)
+        days = self.timestamps[mask] // DAY
+        estimate = estimate[mask]
+        if not len(days):
+            return {'exercise_id': exercise_id, 'formula': formula, 'dates': [], 'one_rm': [], 'best': []}
+
+        # Sets zijn op tijd gesorteerd: elke nieuwe dag begint een groep voor reduceat
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        daily = np.fmax.reduceat(estimate, starts)
+        return {
+            'exercise_id': exercise_id,
+            'name': self.names[index],
+            'formula': formula,
+            'dates': [datetime.fromtimestamp(int(day) * DAY, tz=timezone.utc).date().isoformat()
+                      for day in days[starts]],
+            'one_rm': to_json(daily),
+            'best': to_json(np.fmax.accumulate(daily)),
+        }
+
+    def weekly_volume_matrix(self):
+        """
+        Volume per week per oefening.
+
+        Returns:
+            tuple: (matrix weken x oefeningen, eerste weekindex); ook weken zonder training zitten erin.
+        """
+        week, first, n_weeks = self._week_range()
+        n_exercises = len(self.exercise_ids)
+        matrix = np.bincount(
+            week * n_exercises + self.exercise, weights=self.volume, minlength=n_weeks * n_exercises
+        ).reshape(n_weeks, n_exercises)
+        return matrix, first
+
+    def weekly_volume(self):
+        """
+        Wekelijks volume per oefening en per spiergroep (gewogen via muscle_weights).
+
+        Returns:
+            dict: weeks (maandagen), exercises en muscles met per reeks één waarde per week.
+        """
+        if not len(self):
+            return {'weeks': [], 'exercises': [], 'muscles': []}
+        matrix, first = self.weekly_volume_matrix()
+        muscle_matrix = matrix @ muscle_weights.get().rows(self.exercise_ids)
+        weeks = [week_start(first + i) for i in range(matrix.shape[0])]
+
+        totals = matrix.sum(axis=0)
+        exercises = [{
+            'exercise_id': self.exercise_ids[i],
+            'name': self.names[i],
+            'total': round(float(totals[i]), 2),
+            'volume': to_json(matrix[:, i]),
+        } for i in np.argsort(-totals, kind='stable') if totals[i] > 0]
+
+        muscle_totals = muscle_matrix.sum(axis=0)
+        muscles = [{
+            'muscle': MUSCLES[i],
+            'total': round(float(muscle_totals[i]), 2),
+            'volume': to_json(muscle_matrix[:, i]),
+        } for i in np.argsort(-muscle_totals, kind='stable') if muscle_totals[i] > 0]
+
+        return {'weeks': weeks, 'exercises': exercises, 'muscles': muscles}
+
+    def best_one_rm(self, formula='epley'):
+        """Beste geschatte 1RM per oefening (NaN als er geen schatting is)."""
+        best = np.full(len(self.exercise_ids), np.nan)
+        estimate = estimate_one_rm(self.weight, self.reps, formula)
+        mask = np.isfinite(estimate)
+        np.fmax.at(best, self.exercise[mask], estimate[mask])
+        return best
+
+    def intensity_distribution(self, formula='epley', exercise_id=None):
+        """
+        Verdeling van sets over intensiteitszones (gewicht / beste geschatte 1RM van de oefening).
+
+        Returns:
+            dict: labels, counts en percentages per zone.
+        """
+        counts = np.zeros(len(INTENSITY_LABELS), dtype=int)
+        if len(self):
+            best = self.best_one_rm(formula)
+            mask = self.weight > 0
+            if exercise_id is not None:
+                mask &= self.exercise == self.exercise_index(exercise_id)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = self.weight[mask] / best[self.exercise[mask]]
+            counts = np.histogram(relative[np.isfinite(relative)], bins=INTENSITY_BINS)[0]
+        total = int(counts.sum())
+        return {
+            'formula': formula,
+            'labels': INTENSITY_LABELS,
+            'counts': counts.tolist(),
+            'percentages': to_json(counts / total * 100 if total else np.zeros(len(counts)), 1),
+            'total': total,
+        }
+
+    def overload_trends(self, formula='epley'):
+        """
+        Progressive overload per oefening: helling van de wekelijkse beste 1RM en van het weekvolume.
+
+        Returns:
+            list: Per oefening de hellingen (kg per week), het aantal trainingsweken en een status
+                  ('progressing', 'plateau', 'regressing' of 'insufficient_data'), meest getraind eerst.
+
+        Notities:
+            - Weken zonder sets van een oefening tellen niet mee in de regressie.
+        """
+        if not len(self):
+            return []
+        week, _, n_weeks = self._week_range()
+        shape = (n_weeks, len(self.exercise_ids))
+
+        estimate = estimate_one_rm(self.weight, self.reps, formula)
+        mask = np.isfinite(estimate)
+        weekly_best = np.full(shape, np.nan)
+        np.fmax.at(weekly_best, (week[mask], self.exercise[mask]), estimate[mask])
+
+        volume, _ = self.weekly_volume_matrix()
+        volume = np.where(volume > 0, volume, np.nan)
+
+        one_rm_slope, weeks_trained, one_rm_mean = masked_slope(weekly_best)
+        volume_slope, _, _ = masked_slope(volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = one_rm_slope / one_rm_mean
+
+        status = np.where(relative > PLATEAU_THRESHOLD, 'progressing',
+                          np.where(relative < -PLATEAU_THRESHOLD, 'regressing', 'plateau'))
+        status = np.where(weeks_trained >= MIN_TREND_WEEKS, status, 'insufficient_data')
+
+        # Eerste en laatste week met een schatting per oefening
+        finite = np.isfinite(weekly_best)
+        first_row = finite.argmax(axis=0)
+        last_row = n_weeks - 1 - finite[::-1].argmax(axis=0)
+        columns = np.arange(shape[1])
+        first_best = weekly_best[first_row, columns]
+        last_best = weekly_best[last_row, columns]
+
+        sets_per_exercise = np.bincount(self.exercise, minlength=shape[1])
+        order = np.lexsort((-sets_per_exercise, -weeks_trained))
+        one_rm_slope, volume_slope = to_json(one_rm_slope), to_json(volume_slope)
+        first_best, last_best = to_json(first_best), to_json(last_best)
+        return [{
+            'exercise_id': self.exercise_ids[i],
+            'name': self.names[i],
+            'weeks_trained': int(weeks_trained[i]),
+            'sets': int(sets_per_exercise[i]),
+            'first_one_rm': first_best[i],
+            'last_one_rm': last_best[i],
+            'one_rm_slope': one_rm_slope[i],
+            'volume_slope': volume_slope[i],
+            'status': str(status[i]),
+        } for i in order]
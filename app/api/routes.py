@@ -1,41 +1,232 @@
-from flask import jsonify
+import base64
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify, request, current_app, url_for
 from flask_login import login_required, current_user
 
 from . import bp
+from .. import chart_renderer
+from ..analytics import SetHistory, FORMULAS
 from ..models import WeightLog
-from ..profile.routes import generate_weight_chart_data
+from ..profile.charts import MIN_CHART_POINTS, cached_weight_chart, weight_chart_etag, weight_chart_series, \
+    weight_log_state
+
+# Standaard- en maximale periode (in weken) voor de analytics-endpoints
+ANALYTICS_DEFAULT_WEEKS = 12
+ANALYTICS_MAX_WEEKS = 520
+
+
+def _with_etag(response, etag):
+    """Zet een sterke ETag; de client moet altijd revalideren, wat bij een ongewijzigde grafiek een 304 oplevert."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(etag):
+    """Lege 304-respons met dezelfde ETag."""
+    return _with_etag(current_app.response_class(status=304), etag)
+
+
+def _series_fallback():
+    """
+    JSON-reeks in plaats van een PNG die niet (op tijd) gerenderd kon worden.
+
+    Notities:
+        - Zonder ETag en niet cachebaar: de volgende aanvraag krijgt de PNG zodra die klaar is.
+    """
+    weights = WeightLog.query.filter_by(user_id=current_user.id) \
+        .order_by(WeightLog.logged_at).all()
+    response = jsonify({
+        'success': True,
+        'fallback': True,
+        'series': weight_chart_series(weights, current_user)
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 @bp.route('/weight_chart', methods=['GET'])
 @login_required
 def api_weight_chart():
-    """API endpoint voor het ophalen van gewichtsgrafiek als json"""
-    try:
-        weights = WeightLog.query.filter_by(user_id=current_user.id) \
-            .order_by(WeightLog.logged_at).all()
+    """
+    API endpoint voor de gewichtsgrafiek.
 
-        if not weights or len(weights) < 2:
-            return jsonify({
-                'error': 'Insufficient data',
-                'message': 'Je hebt minimaal 2 gewichtsmetingen nodig voor een grafiek'
-            }), 400
+    Notities:
+        - Standaard een JSON-reeks (tijdstippen, gewichten, trend, doel) die in de browser getekend wordt.
+        - Alleen met ?format=png de server-side matplotlib-grafiek als base64 (uit chart_cache); lukt
+          renderen niet binnen de timeout van de renderpool, dan volgt de JSON-reeks met fallback=True.
+        - Conditional GET: bij een ongewijzigde reeks een 304 zonder metingen te laden.
+    """
+    chart_format = request.args.get('format', 'json')
+    if chart_format not in ('json', 'png'):
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'format moet json of png zijn'
+        }), 400
 
-        chart_data = generate_weight_chart_data(weights, current_user)
+    state = weight_log_state(current_user.id)
+    if state[0] < MIN_CHART_POINTS:
+        return jsonify({
+            'error': 'Insufficient data',
+            'message': 'Je hebt minimaal 2 gewichtsmetingen nodig voor een grafiek'
+        }), 400
+
+    etag = weight_chart_etag(current_user, state, 'series' if chart_format == 'json' else 'png')
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
 
-        if chart_data:
-            return jsonify({
+    try:
+        if chart_format == 'json':
+            weights = WeightLog.query.filter_by(user_id=current_user.id) \
+                .order_by(WeightLog.logged_at).all()
+            response = jsonify({
                 'success': True,
-                'data': chart_data
+                'series': weight_chart_series(weights, current_user)
             })
         else:
-            return jsonify({
-                'error': 'Error generating chart',
-                'message': 'Er is een fout opgetreden bij het genereren van de grafiek'
-            }), 500
+            chart_data = cached_weight_chart(current_user, state)
+            if not chart_data:
+                return _series_fallback()
+            response = jsonify({
+                'success': True,
+                'data': base64.b64encode(chart_data).decode()
+            })
 
     except Exception as e:
         print(f"Error in weight_chart: {e}")  # Voor debugging
         return jsonify({
             'error': 'Server error',
             'message': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+    return _with_etag(response, etag)
+
+
+@bp.route('/weight_chart.png', methods=['GET'])
+@login_required
+def api_weight_chart_png():
+    """
+    Server-side gerenderde gewichtsgrafiek als afbeelding, voor clients die geen JSON-reeks kunnen tekenen.
+
+    Notities:
+        - Uit de content-addressed bestandscache; alleen bij nieuwe metingen of een ander doel wordt
+          opnieuw gerenderd.
+    """
+    state = weight_log_state(current_user.id)
+    if state[0] < MIN_CHART_POINTS:
+        return jsonify({
+            'error': 'Insufficient data',
+            'message': 'Je hebt minimaal 2 gewichtsmetingen nodig voor een grafiek'
+        }), 400
+
+    etag = weight_chart_etag(current_user, state, 'png')
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    chart_data = cached_weight_chart(current_user, state)
+    if not chart_data:
+        response = jsonify({
+            'error': 'Chart unavailable',
+            'message': 'De grafiek wordt nog gerenderd, gebruik de JSON-reeks of probeer het zo opnieuw',
+            'series_url': url_for('api.api_weight_chart')
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
+    return _with_etag(current_app.response_class(chart_data, mimetype='image/png'), etag)
+
+
+@bp.route('/metrics/render_pool', methods=['GET'])
+@login_required
+def api_render_pool_metrics():
+    """Wachtrijdiepte, tellers en render-latency van de renderpool in dit workerproces."""
+    return jsonify(chart_renderer.stats())
+
+
+def _analytics_params():
+    """
+    Lees weeks en formula uit de querystring en laad de set-historie van die periode.
+
+    Returns:
+        tuple: (SetHistory, weeks, formula)
+
+    Raises:
+        ValueError: Bij een onbekende formule.
+    """
+    formula = request.args.get('formula', 'epley')
+    if formula not in FORMULAS:
+        raise ValueError(f"formula moet een van {', '.join(FORMULAS)} zijn")
+    weeks = max(1, min(request.args.get('weeks', ANALYTICS_DEFAULT_WEEKS, type=int), ANALYTICS_MAX_WEEKS))
+    since = datetime.now(timezone.utc) - timedelta(weeks=weeks)
+    return SetHistory.load(current_user.id, since=since), weeks, formula
+
+
+def _analytics_error(message):
+    return jsonify({'error': 'Invalid parameters', 'message': message}), 400
+
+
+@bp.route('/analytics/summary', methods=['GET'])
+@login_required
+def api_analytics_summary():
+    """Weekvolume, intensiteitsverdeling en overload-trends uit één keer laden van de set-historie"""
+    try:
+        history, weeks, formula = _analytics_params()
+    except ValueError as e:
+        return _analytics_error(str(e))
+    return jsonify({
+        'success': True,
+        'weeks': weeks,
+        'sets': len(history),
+        'volume': history.weekly_volume(),
+        'intensity': history.intensity_distribution(formula),
+        'overload': history.overload_trends(formula)
+    })
+
+
+@bp.route('/analytics/one_rm', methods=['GET'])
+@login_required
+def api_analytics_one_rm():
+    """Geschatte 1RM-curve (beste set per dag) voor één oefening"""
+    exercise_id = request.args.get('exercise_id')
+    if not exercise_id:
+        return _analytics_error('exercise_id is verplicht')
+    try:
+        history, weeks, formula = _analytics_params()
+    except ValueError as e:
+        return _analytics_error(str(e))
+    return jsonify({'success': True, 'weeks': weeks, **history.one_rm_curve(exercise_id, formula)})
+
+
+@bp.route('/analytics/volume', methods=['GET'])
+@login_required
+def api_analytics_volume():
+    """Wekelijks volume per oefening en per spiergroep"""
+    try:
+        history, weeks, formula = _analytics_params()
+    except ValueError as e:
+        return _analytics_error(str(e))
+    return jsonify({'success': True, 'weeks': weeks, **history.weekly_volume()})
+
+
+@bp.route('/analytics/intensity', methods=['GET'])
+@login_required
+def api_analytics_intensity():
+    """Verdeling van sets over intensiteitszones, optioneel voor één oefening"""
+    try:
+        history, weeks, formula = _analytics_params()
+    except ValueError as e:
+        return _analytics_error(str(e))
+    return jsonify({'success': True, 'weeks': weeks,
+                    **history.intensity_distribution(formula, request.args.get('exercise_id'))})
+
+
+@bp.route('/analytics/overload', methods=['GET'])
+@login_required
+def api_analytics_overload():
+    """Progressive-overload trends per oefening"""
+    try:
+        history, weeks, formula = _analytics_params()
+    except ValueError as e:
+        return _analytics_error(str(e))
+    return jsonify({'success': True, 'weeks': weeks, 'exercises': history.overload_trends(formula)})
@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class NullBackend:
+    """Backend zonder opslag; schakelt caching effectief uit."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class MemoryBackend:
+    """
+    In-process LRU-cache met TTL.
+
+    Notities:
+        - Per gunicorn-worker een eigen cache; invalidatie geldt dus alleen binnen deze worker.
+        - Thread-safe via een lock.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Cache in een lokaal SQLite-bestand, gedeeld tussen alle gunicorn-workers op dezelfde host.
+
+    Notities:
+        - Waarden worden als JSON opgeslagen; alleen JSON-serialiseerbare data is toegestaan.
+        - Eén verbinding per thread; WAL-modus zodat lezers schrijvers niet blokkeren.
+        - Bij een volle cache worden eerst verlopen en daarna de oudste entries verwijderd.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stored_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now + ttl, now)
+        )
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute('DELETE FROM cache WHERE expires_at < ?', (now,))
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at LIMIT ?)',
+                (max(0, count - self.max_entries),)
+            )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+
+class UserCache:
+    """
+    Cache per gebruiker met een pluggable backend.
+
+    Notities:
+        - Backend via DASHBOARD_CACHE_BACKEND: 'sqlite', 'memory' of 'null'.
+        - Fouten in de backend worden gelogd en gedragen zich als een cache-miss.
+        - Gebruik init_app() net als bij de andere Flask-extensies.
+    """
+
+    def __init__(self, namespace, app=None):
+        self.namespace = namespace
+        self.backend = NullBackend()
+        self.ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Kies de backend op basis van de app-configuratie."""
+        backend = app.config.get('DASHBOARD_CACHE_BACKEND', 'sqlite')
+        max_entries = app.config.get('DASHBOARD_CACHE_MAX_ENTRIES', 1024)
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', 300)
+
+        if backend == 'sqlite':
+            path = app.config.get('DASHBOARD_CACHE_PATH') or os.path.join(app.instance_path, 'dashboard_cache.db')
+            self.backend = SQLiteBackend(path, max_entries=max_entries)
+        elif backend == 'memory':
+            self.backend = MemoryBackend(max_entries=max_entries)
+        else:
+            self.backend = NullBackend()
+        logger.debug(f"{self.namespace} cache backend: {type(self.backend).__name__}")
+
+    def _key(self, user_id):
+        return f'{self.namespace}:{user_id}'
+
+    def get(self, user_id):
+        try:
+            return self.backend.get(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Cache get mislukt voor gebruiker {user_id}: {str(e)}")
+            return None
+
+    def set(self, user_id, value):
+        try:
+            self.backend.set(self._key(user_id), value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache set mislukt voor gebruiker {user_id}: {str(e)}")
+
+    def invalidate(self, user_id):
+        try:
+            self.backend.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Cache invalidatie mislukt voor gebruiker {user_id}: {str(e)}")
+
+
+class FileCache:
+    """
+    Content-addressed bestandscache op lokale schijf, gedeeld tussen alle workers op dezelfde host.
+
+    Notities:
+        - De sleutel is een hash van alles waar de inhoud van afhangt; een bestand wordt dus nooit
+          overschreven met andere inhoud en hoeft niet geïnvalideerd te worden.
+        - Een hit kost een stat (en een read); de mtime wordt bijgewerkt zodat eviction LRU is.
+        - Schrijven is atomair (tijdelijk bestand + os.replace). Boven FILE_CACHE_MAX_BYTES worden de
+          langst niet gebruikte bestanden verwijderd; 0 schakelt de cache uit.
+        - Fouten worden gelogd en gedragen zich als een cache-miss.
+    """
+
+    def __init__(self, namespace, suffix='', app=None):
+        self.namespace = namespace
+        self.suffix = suffix
+        self.directory = None
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bepaal map en maximale grootte op basis van de app-configuratie."""
+        self.max_bytes = app.config.get('FILE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        root = app.config.get('FILE_CACHE_DIR') or os.path.join(app.instance_path, 'file_cache')
+        self.directory = os.path.join(root, self.namespace)
+        if self.max_bytes:
+            os.makedirs(self.directory, exist_ok=True)
+        logger.debug(f"{self.namespace} bestandscache: {self.directory} ({self.max_bytes} bytes)")
+
+    def _path(self, key):
+        if not key.isalnum():
+            raise ValueError(f'Ongeldige cachesleutel: {key}')
+        return os.path.join(self.directory, key + self.suffix)
+
+    def path(self, key):
+        """Pad van het gecachete bestand, of None bij een miss."""
+        if not self.max_bytes:
+            return None
+        try:
+            path = self._path(key)
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Bestandscache lookup mislukt voor {key}: {str(e)}")
+            return None
+
+    def get(self, key):
+        """Inhoud van het gecachete bestand, of None bij een miss."""
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except Exception as e:
+            logger.warning(f"Bestandscache lezen mislukt voor {key}: {str(e)}")
+            return None
+
+    def set(self, key, data):
+        """Sla inhoud op onder key en ruim daarna zo nodig de oudste bestanden op."""
+        if not self.max_bytes:
+            return
+        try:
+            path = self._path(key)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict()
+        except Exception as e:
+            logger.warning(f"Bestandscache schrijven mislukt voor {key}: {str(e)}")
+
+    def _evict(self):
+        """Verwijder de langst niet gebruikte bestanden tot de map onder max_bytes zit."""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix) or entry.name.endswith('.tmp'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # Tegelijk door een andere worker verwijderd
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
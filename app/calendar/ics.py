@@ -0,0 +1,228 @@
+import hashlib
+from datetime import timedelta, timezone
+
+from app import db
+from app.models import CalendarEvent, CalendarTombstone, WorkoutPlan, WorkoutSession
+from .recurrence import CalendarOccurrence, as_utc
+
+# Verhoog bij een wijziging in de opmaak van de feed, zodat agenda-apps opnieuw ophalen
+ICS_FEED_VERSION = 1
+
+# Aantal rijen per databasebatch tijdens het streamen
+FEED_BATCH_SIZE = 500
+
+# Voorgestelde pollinterval voor agenda-apps
+FEED_REFRESH_INTERVAL = 'PT15M'
+
+RRULE_FREQUENCIES = {'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY'}
+
+
+def escape_text(value):
+    """Escape een TEXT-waarde volgens RFC 5545 (backslash, puntkomma, komma en regeleinden)."""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def content_line(name, value):
+    """
+    Eén contentregel met CRLF, gevouwen op 75 octets.
+
+    Notities:
+        - Vouwt nooit midden in een UTF-8-teken; vervolgregels beginnen met een spatie.
+    """
+    line = f'{name}:{value}'
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    size = 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current = ''
+            size = 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(moment):
+    """UTC-tijdstip in het basisformaat van iCalendar (20260131T080000Z)."""
+    return as_utc(moment).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def feed_state(user_id):
+    """
+    Last-Modified en ETag van de feed van een gebruiker, in drie aggregates op bestaande indexen.
+
+    Notities:
+        - Een wijziging aan een event of voorkomen verhoogt updated_at, een verwijdering laat een
+          tombstone achter en een voltooide sessie krijgt completed_at; aantallen vangen de rest.
+
+    Returns:
+        tuple: (last_modified of None, etag)
+    """
+    events = db.session.query(
+        db.func.count(CalendarEvent.id), db.func.max(CalendarEvent.updated_at)
+    ).filter(CalendarEvent.user_id == user_id).one()
+    sessions = db.session.query(
+        db.func.count(WorkoutSession.id), db.func.max(WorkoutSession.completed_at)
+    ).filter(WorkoutSession.user_id == user_id, WorkoutSession.is_completed == True).one()
+    deleted = db.session.query(
+        db.func.count(CalendarTombstone.id), db.func.max(CalendarTombstone.deleted_at)
+    ).filter(CalendarTombstone.user_id == user_id).one()
+
+    moments = [as_utc(moment) for _, moment in (events, sessions, deleted) if moment is not None]
+    last_modified = max(moments) if moments else None
+    key = f'ics:{ICS_FEED_VERSION}:{user_id}:{events[0]}:{events[1]}:{sessions[0]}:{sessions[1]}:{deleted[0]}:{deleted[1]}'
+    return last_modified, hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def recurrence_rule(event):
+    """
+    RRULE van een terugkerend event.
+
+    Notities:
+        - Maandelijks op dag 29-31 wordt BYMONTHDAY met BYSETPOS=-1, zodat kortere maanden net als in
+          de app op hun laatste dag vallen in plaats van overgeslagen te worden.
+        - recurrence_end_date is het einde van het laatste voorkomen; UNTIL is diens start.
+    """
+    start = as_utc(event.start_datetime)
+    parts = [f'FREQ={RRULE_FREQUENCIES[event.recurrence_pattern]}']
+    if event.recurrence_pattern == 'monthly' and start.day > 28:
+        parts.append('BYMONTHDAY=' + ','.join(str(day) for day in range(28, start.day + 1)))
+        parts.append('BYSETPOS=-1')
+    if event.recurrence_count:
+        parts.append(f'COUNT={event.recurrence_count}')
+    elif event.recurrence_end_date:
+        duration = as_utc(event.end_datetime) - start
+        parts.append(f'UNTIL={format_datetime(as_utc(event.recurrence_end_date) - duration)}')
+    return ';'.join(parts)
+
+
+def event_lines(item, uid, stamp, extra=()):
+    """VEVENT van een CalendarEvent of CalendarOccurrence."""
+    summary = item.title if item.status != 'completed' else f'✅ {item.title}'
+    description = item.description or ''
+    if item.workout_plan is not None:
+        description = f'{description}\n\nPlan: {item.workout_plan.name}'.strip()
+
+    lines = [
+        'BEGIN:VEVENT\r\n',
+        content_line('UID', uid),
+        content_line('DTSTAMP', format_datetime(stamp)),
+        content_line('DTSTART', format_datetime(item.start_datetime)),
+        content_line('DTEND', format_datetime(item.end_datetime)),
+        content_line('SUMMARY', escape_text(summary)),
+        content_line('STATUS', 'CANCELLED' if item.status == 'cancelled' else 'CONFIRMED'),
+        content_line('CATEGORIES', escape_text(item.event_type or 'workout')),
+    ]
+    if description:
+        lines.append(content_line('DESCRIPTION', escape_text(description)))
+    lines.extend(extra)
+    lines.append('END:VEVENT\r\n')
+    return ''.join(lines)
+
+
+def calendar_event_entries(event):
+    """
+    VEVENT('s) van één CalendarEvent.
+
+    Notities:
+        - Een reeks wordt één VEVENT met RRULE; geannuleerde voorkomens worden EXDATE en aangepaste
+          voorkomens een eigen VEVENT met dezelfde UID en RECURRENCE-ID.
+    """
+    uid = f'event-{event.id}@fittrack'
+    stamp = event.updated_at or event.created_at
+    if not event.is_recurring or event.recurrence_pattern not in RRULE_FREQUENCIES:
+        return event_lines(event, uid, stamp)
+
+    # Voltooien gebeurt per voorkomen; de reeks zelf staat altijd als gepland in de feed
+    series = CalendarOccurrence(event, as_utc(event.start_datetime))
+    series.status = 'planned' if event.status == 'completed' else event.status
+    extra = [content_line('RRULE', recurrence_rule(event))]
+    exceptions = sorted(event.exceptions, key=lambda exception: as_utc(exception.occurrence_start))
+    extra.extend(content_line('EXDATE', format_datetime(exception.occurrence_start))
+                 for exception in exceptions if exception.is_cancelled)
+    entries = [event_lines(series, uid, stamp, extra)]
+
+    for exception in exceptions:
+        if not exception.is_cancelled:
+            occurrence = CalendarOccurrence(event, as_utc(exception.occurrence_start), exception)
+            entries.append(event_lines(occurrence, uid, exception.updated_at or stamp, [
+                content_line('RECURRENCE-ID', format_datetime(exception.occurrence_start))
+            ]))
+    return ''.join(entries)
+
+
+def session_entry(session_id, plan_name, started_at, completed_at, duration_minutes):
+    """
+    VEVENT van een voltooide WorkoutSession.
+
+    Notities:
+        - De duur komt uit duration_minutes (60 als die leeg is), niet uit completed_at: een achteraf
+          voltooid gepland event heeft started_at op de geplande start en completed_at op het moment
+          van afvinken, soms maanden later.
+        - Zonder started_at eindigt de sessie op completed_at.
+    """
+    completed_at = as_utc(completed_at)
+    duration = timedelta(minutes=duration_minutes or 60)
+    start = as_utc(started_at) or completed_at - duration
+    return ''.join([
+        'BEGIN:VEVENT\r\n',
+        content_line('UID', f'session-{session_id}@fittrack'),
+        content_line('DTSTAMP', format_datetime(completed_at)),
+        content_line('DTSTART', format_datetime(start)),
+        content_line('DTEND', format_datetime(start + duration)),
+        content_line('SUMMARY', escape_text(f'✅ {plan_name or "Workout"}')),
+        content_line('STATUS', 'CONFIRMED'),
+        content_line('CATEGORIES', 'completed_workout'),
+        'END:VEVENT\r\n',
+    ])
+
+
+def iter_feed(user):
+    """
+    De iCalendar-feed van een gebruiker als generator van tekstblokken.
+
+    Notities:
+        - Events en sessies worden per FEED_BATCH_SIZE rijen uit de database gehaald en direct
+          doorgegeven; de volledige historie staat dus nooit tegelijk in het geheugen.
+        - Moet binnen stream_with_context lopen, zodat de databasesessie beschikbaar blijft.
+    """
+    yield ''.join([
+        'BEGIN:VCALENDAR\r\n',
+        'VERSION:2.0\r\n',
+        'PRODID:-//FitTrack//Agenda//NL\r\n',
+        'CALSCALE:GREGORIAN\r\n',
+        'METHOD:PUBLISH\r\n',
+        content_line('X-WR-CALNAME', escape_text(f'FitTrack – {user.name}' if user.name else 'FitTrack')),
+        content_line('X-PUBLISHED-TTL', FEED_REFRESH_INTERVAL),
+        content_line('REFRESH-INTERVAL;VALUE=DURATION', FEED_REFRESH_INTERVAL),
+    ])
+
+    events = CalendarEvent.query.options(
+        db.selectinload(CalendarEvent.exceptions),
+        db.selectinload(CalendarEvent.workout_plan)
+    ).filter(
+        CalendarEvent.user_id == user.id
+    ).order_by(CalendarEvent.id).yield_per(FEED_BATCH_SIZE)
+    for event in events:
+        yield calendar_event_entries(event)
+
+    sessions = db.session.query(
+        WorkoutSession.id, WorkoutPlan.name, WorkoutSession.started_at,
+        WorkoutSession.completed_at, WorkoutSession.duration_minutes
+    ).outerjoin(
+        WorkoutPlan, WorkoutPlan.id == WorkoutSession.workout_plan_id
+    ).filter(
+        WorkoutSession.user_id == user.id,
+        WorkoutSession.is_completed == True,
+        WorkoutSession.completed_at.isnot(None)
+    ).order_by(WorkoutSession.completed_at).yield_per(FEED_BATCH_SIZE)
+    for row in sessions:
+        yield session_entry(*row)
+
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,193 @@
+import calendar
+from datetime import timedelta, timezone
+
+RECURRENCE_PATTERNS = ('daily', 'weekly', 'monthly')
+
+STEPS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+# Venster voor het uitklappen van reeksen als de client geen einddatum meegeeft
+DEFAULT_HORIZON = timedelta(days=366)
+
+
+def as_utc(moment):
+    """Maak een datetime timezone-aware (SQLite levert naive datetimes)."""
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def add_months(moment, months):
+    """Tel maanden op, geklemd op de laatste dag van kortere maanden (31 jan + 1 = 28/29 feb)."""
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def occurrence_start(first_start, pattern, index):
+    """Startmoment van herhaling nummer index (0 is het eerste voorkomen)."""
+    if pattern == 'monthly':
+        return add_months(first_start, index)
+    return first_start + STEPS[pattern] * index
+
+
+def iter_occurrences(first_start, duration, pattern, window_start, window_end, count=None, until=None):
+    """
+    Startmomenten van de herhalingen die het venster [window_start, window_end) overlappen, oplopend.
+
+    Notities:
+        - Springt direct naar de eerste herhaling rond window_start in plaats van vanaf het begin van
+          de reeks te tellen; de kosten hangen dus alleen af van het aantal resultaten, ook voor
+          onbegrensde reeksen.
+        - Maandelijks valt op dezelfde dag van de maand, geklemd op kortere maanden.
+
+    Args:
+        first_start (datetime): Start van het eerste voorkomen.
+        duration (timedelta): Duur van elk voorkomen.
+        pattern (str): 'daily', 'weekly' of 'monthly'.
+        count (int, optional): Maximaal aantal voorkomens in de reeks.
+        until (datetime, optional): Geen voorkomens die na dit moment eindigen.
+    """
+    if pattern not in RECURRENCE_PATTERNS:
+        return
+
+    lower = window_start - duration
+    if pattern == 'monthly':
+        index = (lower.year - first_start.year) * 12 + lower.month - first_start.month - 1
+    else:
+        index = (lower - first_start) // STEPS[pattern]
+    index = max(0, index)
+
+    while count is None or index < count:
+        start = occurrence_start(first_start, pattern, index)
+        if start >= window_end or (until is not None and start + duration > until):
+            return
+        if start >= window_start or start + duration > window_start:
+            yield start
+        index += 1
+
+
+class CalendarOccurrence:
+    """
+    Eén voorkomen van een terugkerend CalendarEvent, met een eventuele uitzondering toegepast.
+
+    Notities:
+        - Wordt niet opgeslagen; heeft dezelfde attributen als CalendarEvent, zodat to_dict, templates
+          en UserDailyActivity.record_event er net zo mee werken.
+        - id combineert het event-id met het oorspronkelijke startmoment (epoch-seconden).
+    """
+
+    def __init__(self, event, start, exception=None):
+        duration = as_utc(event.end_datetime) - as_utc(event.start_datetime)
+
+        def override(name, default):
+            value = getattr(exception, name) if exception is not None else None
+            return default if value is None else value
+
+        self.event = event
+        self.exception = exception
+        self.occurrence_start = start
+        self.id = f'{event.id}_{int(start.timestamp())}'
+        self.event_id = event.id
+        self.user_id = event.user_id
+        self.title = override('title', event.title)
+        self.description = override('description', event.description)
+        self.start_datetime = as_utc(override('start_datetime', start))
+        self.end_datetime = as_utc(override('end_datetime', start + duration))
+        self.status = override('status', event.status)
+        self.color = override('color', event.color)
+        self.event_type = event.event_type
+        self.workout_plan_id = event.workout_plan_id
+        self.workout_plan = event.workout_plan
+        self.reminder_minutes = event.reminder_minutes
+        self.is_recurring = True
+        self.recurrence_pattern = event.recurrence_pattern
+
+    def to_dict(self):
+        """Converteer naar dictionary voor JSON responses, in hetzelfde formaat als CalendarEvent."""
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'occurrence': self.occurrence_start.isoformat(),
+            'title': self.title,
+            'description': self.description,
+            'start': self.start_datetime.isoformat(),
+            'end': self.end_datetime.isoformat(),
+            'workout_plan_id': self.workout_plan_id,
+            'workout_plan_name': self.workout_plan.name if self.workout_plan else None,
+            'event_type': self.event_type,
+            'status': self.status,
+            'color': self.color,
+            'is_recurring': True,
+            'recurrence_pattern': self.recurrence_pattern
+        }
+
+
+def overlaps(item, window_start, window_end):
+    """Overlapt het (virtuele) event het venster? Open grenzen ontbreken (None)."""
+    start, end = as_utc(item.start_datetime), as_utc(item.end_datetime)
+    return (window_end is None or start < window_end) and (window_start is None or end > window_start or start >= window_start)
+
+
+def expand_event(event, window_start, window_end):
+    """
+    Klap een terugkerend event uit tot de voorkomens binnen het venster.
+
+    Notities:
+        - Geannuleerde voorkomens vallen weg; verplaatste voorkomens verschijnen op hun nieuwe tijd,
+          ook als het oorspronkelijke moment buiten het venster valt.
+
+    Returns:
+        list: CalendarOccurrence-objecten, gesorteerd op start.
+    """
+    first_start = as_utc(event.start_datetime)
+    duration = as_utc(event.end_datetime) - first_start
+    exceptions = {as_utc(exception.occurrence_start): exception for exception in event.exceptions}
+
+    occurrences = []
+    for start in iter_occurrences(first_start, duration, event.recurrence_pattern, window_start, window_end,
+                                  count=event.recurrence_count, until=as_utc(event.recurrence_end_date)):
+        exception = exceptions.pop(start, None)
+        if exception is not None and exception.is_cancelled:
+            continue
+        occurrence = CalendarOccurrence(event, start, exception)
+        if overlaps(occurrence, window_start, window_end):
+            occurrences.append(occurrence)
+
+    # Voorkomens die vanuit een ander moment naar dit venster verplaatst zijn
+    for start, exception in exceptions.items():
+        if not exception.is_cancelled and exception.start_datetime is not None:
+            occurrence = CalendarOccurrence(event, start, exception)
+            if overlaps(occurrence, window_start, window_end):
+                occurrences.append(occurrence)
+
+    occurrences.sort(key=lambda occurrence: occurrence.start_datetime)
+    return occurrences
+
+
+def expand_events(events, window_start, window_end=None):
+    """
+    Vervang terugkerende events door hun voorkomens in het venster; gewone events blijven zoals ze zijn.
+
+    Args:
+        events (list): CalendarEvents uit een vensterquery.
+        window_start (datetime): Begin van het venster.
+        window_end (datetime, optional): Einde; standaard DEFAULT_HORIZON na window_start.
+
+    Returns:
+        list: CalendarEvent- en CalendarOccurrence-objecten, gesorteerd op start.
+    """
+    window_start = as_utc(window_start)
+    window_end = as_utc(window_end) or window_start + DEFAULT_HORIZON
+    items = []
+    for event in events:
+        if event.is_recurring and event.recurrence_pattern in RECURRENCE_PATTERNS:
+            items.extend(expand_event(event, window_start, window_end))
+        else:
+            items.append(event)
+    items.sort(key=lambda item: as_utc(item.start_datetime))
+    return items
@@ -1,15 +1,68 @@
-from flask import render_template, request, jsonify, flash, redirect, url_for
+from flask import render_template, request, jsonify, flash, redirect, url_for, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta, timezone
 from . import bp
 from app import db
-from app.models import CalendarEvent, WorkoutPlan, WorkoutSession
+from app.decorators import invalidates_dashboard
+from app.models import CalendarEvent, CalendarEventException, CalendarTombstone, WorkoutPlan, WorkoutSession, \
+    UserDailyActivity, User
+from .recurrence import RECURRENCE_PATTERNS, CalendarOccurrence, as_utc, expand_events, iter_occurrences
+from .services import CalendarService
+from .ics import feed_state, iter_feed
 import logging
 import uuid
+from werkzeug.http import is_resource_modified
 
 logger = logging.getLogger(__name__)
 
 
+def parse_datetime(value):
+    """Parse een ISO-datum van FullCalendar (met 'Z' of offset) naar een aware datetime."""
+    return as_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+
+def get_occurrence(event):
+    """
+    Het voorkomen uit ?occurrence= (oorspronkelijk startmoment) van een terugkerend event.
+
+    Returns:
+        CalendarOccurrence of None als er geen occurrence is meegegeven of het event niet terugkerend is.
+
+    Raises:
+        ValueError: Als het moment geen voorkomen van de reeks is.
+    """
+    value = request.args.get('occurrence')
+    if not value or not event.is_recurring:
+        return None
+    start = parse_datetime(value)
+    first_start = as_utc(event.start_datetime)
+    duration = as_utc(event.end_datetime) - first_start
+    matches = iter_occurrences(first_start, duration, event.recurrence_pattern, start, start + timedelta(seconds=1),
+                               count=event.recurrence_count, until=as_utc(event.recurrence_end_date))
+    if start not in matches:
+        raise ValueError(f'{value} is geen voorkomen van deze reeks')
+    exception = next((e for e in event.exceptions if as_utc(e.occurrence_start) == start), None)
+    return CalendarOccurrence(event, start, exception)
+
+
+def occurrence_exception(occurrence):
+    """Haal de uitzondering voor een voorkomen op of maak hem aan; markeert de reeks als gewijzigd."""
+    occurrence.event.updated_at = datetime.now(timezone.utc)
+    if occurrence.exception is None:
+        occurrence.exception = CalendarEventException(occurrence_start=occurrence.occurrence_start)
+        occurrence.event.exceptions.append(occurrence.exception)
+    return occurrence.exception
+
+
+def completed_occurrences(event):
+    """Voltooide (virtuele) events die van dit event in de rollup staan."""
+    if not event.is_recurring:
+        return [event]
+    return [CalendarOccurrence(event, as_utc(exception.occurrence_start), exception)
+            for exception in event.exceptions
+            if not exception.is_cancelled and (exception.status or event.status) == 'completed']
+
+
 @bp.route('/agenda')
 @login_required
 def agenda():
@@ -26,66 +79,48 @@ def agenda():
 @bp.route('/events')
 @login_required
 def get_events():
-    """API endpoint pour récupérer les événements du calendrier"""
+    """
+    API endpoint pour récupérer les événements du calendrier
+
+    Avec ?since=<cursor> seules les modifications depuis le curseur sont renvoyées (upserts et
+    tombstones); le curseur initial est dans l'en-tête X-Calendar-Cursor de la réponse complète.
+    """
     start = request.args.get('start')
     end = request.args.get('end')
+    since = request.args.get('since')
 
-    query = CalendarEvent.query.filter_by(user_id=current_user.id)
-
-    if start:
-        start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
-        query = query.filter(CalendarEvent.start_datetime >= start_date)
-
-    if end:
-        end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
-        query = query.filter(CalendarEvent.end_datetime <= end_date)
-
-    events = query.all()
-
-    # Ajouter aussi les workout sessions complétées comme événements
-    if start and end:
-        completed_sessions = WorkoutSession.query.filter(
-            WorkoutSession.user_id == current_user.id,
-            WorkoutSession.is_completed == True,
-            WorkoutSession.completed_at >= start_date,
-            WorkoutSession.completed_at <= end_date
-        ).all()
-
-        for session in completed_sessions:
-            events.append({
-                'id': f'session_{session.id}',
-                'title': f'✅ {session.workout_plan.name if session.workout_plan else "Workout"}',
-                'start': session.completed_at.isoformat(),
-                'end': (session.completed_at + timedelta(minutes=session.duration_minutes or 60)).isoformat(),
-                'color': '#4CAF50',
-                'editable': False,
-                'event_type': 'completed_workout'
-            })
+    try:
+        start_date = parse_datetime(start) if start else None
+        end_date = parse_datetime(end) if end else None
+        since_date = parse_datetime(since) if since else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Date invalide: {str(e)}'}), 400
 
-    # Convertir les événements en format pour FullCalendar
-    events_data = []
-    for event in events:
-        if isinstance(event, dict):
-            events_data.append(event)
-        else:
-            event_dict = event.to_dict()
-            # Ajouter des propriétés pour FullCalendar
-            event_dict['editable'] = event.status != 'completed'
-            events_data.append(event_dict)
+    if since_date is not None:
+        if start_date is None or end_date is None:
+            return jsonify({'success': False, 'message': 'since exige start et end'}), 400
+        changes = CalendarService.get_changes(current_user.id, since_date, start_date, end_date)
+        # Curseur trop ancien: les tombstones ont été purgés, le client recharge tout
+        return jsonify(changes if changes is not None else {'reset': True})
+
+    events_data, cursor = CalendarService.get_events(current_user.id, start_date, end_date)
 
-    return jsonify(events_data)
+    response = jsonify(events_data)
+    response.headers['X-Calendar-Cursor'] = cursor
+    return response
 
 
 @bp.route('/event', methods=['POST'])
 @login_required
+@invalidates_dashboard
 def create_event():
     """Créer un nouvel événement"""
     try:
         data = request.get_json()
 
         # Parser les dates
-        start_datetime = datetime.fromisoformat(data['start'].replace('Z', '+00:00'))
-        end_datetime = datetime.fromisoformat(data['end'].replace('Z', '+00:00'))
+        start_datetime = parse_datetime(data['start'])
+        end_datetime = parse_datetime(data['end'])
 
         # Créer l'événement
         event = CalendarEvent(
@@ -97,17 +132,21 @@ def create_event():
             workout_plan_id=data.get('workout_plan_id') if data.get('workout_plan_id') else None,
             event_type=data.get('event_type', 'workout'),
             color=data.get('color', '#FF6B35'),
-            is_recurring=data.get('is_recurring', False),
-            recurrence_pattern=data.get('recurrence_pattern'),
             reminder_minutes=data.get('reminder_minutes')
         )
 
-        db.session.add(event)
-
-        # Si c'est récurrent, créer les événements supplémentaires
-        if event.is_recurring and event.recurrence_pattern:
-            create_recurring_events(event, data.get('recurrence_count', 4))
+        # Une seule ligne par série: les occurrences sont calculées à la lecture
+        if data.get('is_recurring') and data.get('recurrence_pattern') in RECURRENCE_PATTERNS:
+            event.is_recurring = True
+            event.recurrence_pattern = data['recurrence_pattern']
+            # recurrence_count = nombre de répétitions après la première; vide = série illimitée
+            repetitions = data.get('recurrence_count')
+            event.recurrence_count = int(repetitions) + 1 if repetitions else None
+            if data.get('recurrence_end_date'):
+                event.recurrence_end_date = parse_datetime(data['recurrence_end_date'])
+            event.update_recurrence_bounds()
 
+        db.session.add(event)
         db.session.commit()
 
         return jsonify({
@@ -127,34 +166,80 @@ def create_event():
 
 @bp.route('/event/<int:event_id>', methods=['PUT'])
 @login_required
+@invalidates_dashboard
 def update_event(event_id):
-    """Mettre à jour un événement"""
+    """Mettre à jour un événement, une série entière ou une seule occurrence (?occurrence=)"""
     try:
         event = CalendarEvent.query.filter_by(
             id=event_id,
             user_id=current_user.id
         ).first_or_404()
 
+        try:
+            occurrence = get_occurrence(event)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
         data = request.get_json()
 
+        if occurrence is not None:
+            # Une seule occurrence: les modifications sont stockées comme exception de la série
+            UserDailyActivity.record_event(occurrence, sign=-1)
+            exception = occurrence_exception(occurrence)
+            for field, attribute in (('title', 'title'), ('description', 'description'),
+                                     ('color', 'color'), ('status', 'status')):
+                if field in data:
+                    setattr(exception, attribute, data[field])
+            if 'start' in data:
+                exception.start_datetime = parse_datetime(data['start'])
+            if 'end' in data:
+                exception.end_datetime = parse_datetime(data['end'])
+            occurrence = CalendarOccurrence(event, occurrence.occurrence_start, exception)
+            UserDailyActivity.record_event(occurrence)
+            db.session.commit()
+
+            return jsonify({
+                'success': True,
+                'event': occurrence.to_dict(),
+                'message': 'Occurrence mise à jour!'
+            })
+
+        # Retirer l'ancien état du rollup journalier, le nouvel état est ajouté après la mise à jour
+        previous = completed_occurrences(event)
+        for item in previous:
+            UserDailyActivity.record_event(item, sign=-1)
+
+        old_start = as_utc(event.start_datetime)
+
         # Mettre à jour les champs
         if 'title' in data:
             event.title = data['title']
         if 'description' in data:
             event.description = data['description']
         if 'start' in data:
-            event.start_datetime = datetime.fromisoformat(data['start'].replace('Z', '+00:00'))
+            event.start_datetime = parse_datetime(data['start'])
         if 'end' in data:
-            event.end_datetime = datetime.fromisoformat(data['end'].replace('Z', '+00:00'))
+            event.end_datetime = parse_datetime(data['end'])
         if 'workout_plan_id' in data:
             event.workout_plan_id = data['workout_plan_id'] if data['workout_plan_id'] else None
         if 'event_type' in data:
             event.event_type = data['event_type']
         if 'color' in data:
             event.color = data['color']
-        if 'status' in data:
+        # Le statut d'une série se gère par occurrence
+        if 'status' in data and not event.is_recurring:
             event.status = data['status']
 
+        if event.is_recurring:
+            # Les exceptions suivent le déplacement de la série
+            shift = as_utc(event.start_datetime) - old_start
+            if shift:
+                for exception in event.exceptions:
+                    exception.occurrence_start = as_utc(exception.occurrence_start) + shift
+            event.update_recurrence_bounds()
+
+        for item in completed_occurrences(event):
+            UserDailyActivity.record_event(item)
         db.session.commit()
 
         return jsonify({
@@ -174,14 +259,34 @@ def update_event(event_id):
 
 @bp.route('/event/<int:event_id>', methods=['DELETE'])
 @login_required
+@invalidates_dashboard
 def delete_event(event_id):
-    """Supprimer un événement"""
+    """Supprimer un événement, une série entière ou une seule occurrence (?occurrence=)"""
     try:
         event = CalendarEvent.query.filter_by(
             id=event_id,
             user_id=current_user.id
         ).first_or_404()
 
+        try:
+            occurrence = get_occurrence(event)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        if occurrence is not None:
+            # L'occurrence est annulée, la série reste
+            UserDailyActivity.record_event(occurrence, sign=-1)
+            occurrence_exception(occurrence).is_cancelled = True
+            db.session.commit()
+
+            return jsonify({
+                'success': True,
+                'message': 'Occurrence supprimée!'
+            })
+
+        for item in completed_occurrences(event):
+            UserDailyActivity.record_event(item, sign=-1)
+        db.session.add(CalendarTombstone(user_id=current_user.id, item_id=str(event.id)))
         db.session.delete(event)
         db.session.commit()
 
@@ -201,24 +306,49 @@ def delete_event(event_id):
 
 @bp.route('/event/<int:event_id>/complete', methods=['POST'])
 @login_required
+@invalidates_dashboard
 def complete_event(event_id):
-    """Marquer un événement comme complété et créer optionnellement une WorkoutSession"""
+    """Marquer un événement (ou une occurrence, ?occurrence=) comme complété et créer optionnellement une WorkoutSession"""
     try:
         event = CalendarEvent.query.filter_by(
             id=event_id,
             user_id=current_user.id
         ).first_or_404()
 
+        try:
+            occurrence = get_occurrence(event)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        # Sans occurrence, une série se complète à partir de sa première occurrence
+        if occurrence is None and event.is_recurring:
+            occurrence = CalendarOccurrence(event, as_utc(event.start_datetime), next(
+                (e for e in event.exceptions if as_utc(e.occurrence_start) == as_utc(event.start_datetime)), None
+            ))
+
         # Marquer l'événement comme complété
-        event.status = 'completed'
-        event.color = '#4CAF50'  # Vert pour complété
+        if occurrence is not None:
+            UserDailyActivity.record_event(occurrence, sign=-1)
+            exception = occurrence_exception(occurrence)
+            exception.status = 'completed'
+            exception.color = '#4CAF50'  # Vert pour complété
+            exception.is_cancelled = False
+            occurrence = CalendarOccurrence(event, occurrence.occurrence_start, exception)
+            UserDailyActivity.record_event(occurrence)
+            target = occurrence
+        else:
+            UserDailyActivity.record_event(event, sign=-1)
+            event.status = 'completed'
+            event.color = '#4CAF50'  # Vert pour complété
+            UserDailyActivity.record_event(event)
+            target = event
 
         # Si c'est lié à un workout plan, créer une WorkoutSession
         if event.workout_plan_id and event.event_type in ['workout', 'cardio']:
             # Calculer la durée
             duration = None
-            if event.end_datetime and event.start_datetime:
-                delta = event.end_datetime - event.start_datetime
+            if target.end_datetime and target.start_datetime:
+                delta = target.end_datetime - target.start_datetime
                 duration = int(delta.total_seconds() / 60)
 
             # Créer la session
@@ -226,7 +356,7 @@ def complete_event(event_id):
                 id=str(uuid.uuid4()),
                 user_id=current_user.id,
                 workout_plan_id=event.workout_plan_id,
-                started_at=event.start_datetime,
+                started_at=target.start_datetime,
                 completed_at=datetime.now(timezone.utc),
                 duration_minutes=duration or 60,
                 is_completed=True,
@@ -236,9 +366,10 @@ def complete_event(event_id):
             )
 
             db.session.add(workout_session)
+            UserDailyActivity.record_session(workout_session)
 
             # Message personnalisé pour workout avec plan
-            message = f'Training "{event.title}" voltooid! 🎉'
+            message = f'Training "{target.title}" voltooid! 🎉'
             response_data = {
                 'success': True,
                 'message': message,
@@ -248,7 +379,7 @@ def complete_event(event_id):
             }
         else:
             # Pour les événements sans workout plan ou non-workout
-            message = f'Événement "{event.title}" marqué comme complété!'
+            message = f'Événement "{target.title}" marqué comme complété!'
             response_data = {
                 'success': True,
                 'message': message
@@ -257,7 +388,7 @@ def complete_event(event_id):
         db.session.commit()
 
         # Log pour debug
-        logger.info(f"Event {event_id} marked as completed by user {current_user.id}")
+        logger.info(f"Event {target.id} marked as completed by user {current_user.id}")
         if event.workout_plan_id:
             logger.info(f"WorkoutSession created for workout_plan {event.workout_plan_id}")
 
@@ -272,33 +403,6 @@ def complete_event(event_id):
         }), 500
 
 
-def create_recurring_events(base_event, count=4):
-    """Créer des événements récurrents basés sur un événement de base"""
-    for i in range(1, count + 1):
-        if base_event.recurrence_pattern == 'daily':
-            delta = timedelta(days=i)
-        elif base_event.recurrence_pattern == 'weekly':
-            delta = timedelta(weeks=i)
-        elif base_event.recurrence_pattern == 'monthly':
-            delta = timedelta(days=30 * i)  # Approximation
-        else:
-            continue
-
-        new_event = CalendarEvent(
-            user_id=base_event.user_id,
-            title=base_event.title,
-            description=base_event.description,
-            start_datetime=base_event.start_datetime + delta,
-            end_datetime=base_event.end_datetime + delta,
-            workout_plan_id=base_event.workout_plan_id,
-            event_type=base_event.event_type,
-            color=base_event.color,
-            is_recurring=False,  # Les copies ne sont pas récurrentes
-            reminder_minutes=base_event.reminder_minutes
-        )
-        db.session.add(new_event)
-
-
 @bp.route('/week-view')
 @login_required
 def week_view():
@@ -307,11 +411,10 @@ def week_view():
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
 
-    events = CalendarEvent.query.filter(
-        CalendarEvent.user_id == current_user.id,
-        CalendarEvent.start_datetime >= start_of_week,
-        CalendarEvent.start_datetime <= end_of_week
-    ).order_by(CalendarEvent.start_datetime).all()
+    events = CalendarEvent.in_window(current_user.id, start_of_week, end_of_week).options(
+        db.selectinload(CalendarEvent.exceptions)
+    ).all()
+    events = expand_events(events, start_of_week, end_of_week)
 
     # Grouper par jour
     events_by_day = {}
@@ -333,49 +436,12 @@ def week_view():
 # Nieuwe functie voor synchronisatie
 @bp.route('/sync-stats', methods=['POST'])
 @login_required
+@invalidates_dashboard
 def sync_workout_stats():
     """Synchroniser les statistiques entre CalendarEvents et WorkoutSessions"""
     try:
-        # Compter les événements complétés qui n'ont pas de WorkoutSession correspondante
-        completed_events = CalendarEvent.query.filter_by(
-            user_id=current_user.id,
-            status='completed'
-        ).filter(
-            CalendarEvent.event_type.in_(['workout', 'cardio'])
-        ).all()
-
-        synced_count = 0
-        for event in completed_events:
-            # Vérifier s'il existe déjà une session pour cette date
-            existing_session = WorkoutSession.query.filter(
-                WorkoutSession.user_id == current_user.id,
-                WorkoutSession.workout_plan_id == event.workout_plan_id,
-                db.func.date(WorkoutSession.completed_at) == db.func.date(event.start_datetime)
-            ).first()
-
-            if not existing_session and event.workout_plan_id:
-                # Créer une session rétroactive
-                duration = 60  # Par défaut
-                if event.end_datetime and event.start_datetime:
-                    delta = event.end_datetime - event.start_datetime
-                    duration = int(delta.total_seconds() / 60)
-
-                workout_session = WorkoutSession(
-                    id=str(uuid.uuid4()),
-                    user_id=current_user.id,
-                    workout_plan_id=event.workout_plan_id,
-                    started_at=event.start_datetime,
-                    completed_at=event.start_datetime + timedelta(minutes=duration),
-                    duration_minutes=duration,
-                    is_completed=True,
-                    total_sets=0,
-                    total_reps=0,
-                    total_weight=0.0
-                )
-                db.session.add(workout_session)
-                synced_count += 1
-
-        db.session.commit()
+        # Une seule anti-jointure pour les événements complétés sans WorkoutSession, puis insertion en bloc
+        synced_count = CalendarService.reconcile_workout_sessions(user_id=current_user.id)[current_user.id]
 
         return jsonify({
             'success': True,
@@ -389,4 +455,64 @@ def sync_workout_stats():
         return jsonify({
             'success': False,
             'message': f'Erreur: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@bp.route('/feed/<token>.ics')
+def calendar_feed(token):
+    """
+    Flux iCalendar (abonnement) de l'agenda; le jeton dans l'URL remplace la connexion
+
+    Les applications d'agenda interrogent toutes les 15 minutes: ETag et Last-Modified viennent de
+    trois agrégats (feed_state), de sorte qu'un flux inchangé répond 304 sans lire les événements.
+    """
+    user = User.query.filter_by(calendar_feed_token=token).first()
+    if user is None:
+        abort(404)
+
+    last_modified, etag = feed_state(user.id)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = Response(stream_with_context(iter_feed(user)), mimetype='text/calendar')
+        response.headers['Content-Disposition'] = 'inline; filename="fittrack.ics"'
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@bp.route('/feed', methods=['POST'])
+@login_required
+def rotate_feed():
+    """Créer ou renouveler l'URL du flux iCalendar; l'ancienne URL cesse de fonctionner"""
+    try:
+        current_user.rotate_calendar_feed_token()
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'url': url_for('calendar.calendar_feed', token=current_user.calendar_feed_token, _external=True)
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de la création du flux: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Erreur: {str(e)}'
+        }), 500
+
+
+@bp.route('/feed', methods=['DELETE'])
+@login_required
+def disable_feed():
+    """Désactiver le flux iCalendar"""
+    current_user.calendar_feed_token = None
+    db.session.commit()
+
+    return jsonify({
+        'success': True,
+        'message': 'Flux désactivé!'
+    })
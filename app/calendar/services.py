@@ -0,0 +1,312 @@
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db, calendar_cache
+from app.models import CalendarEvent, CalendarTombstone, WorkoutSession, UserDailyActivity
+from .recurrence import as_utc, expand_event, expand_events, overlaps
+
+logger = logging.getLogger(__name__)
+
+# Een cursor ligt zoveel vóór het leesmoment, zodat writes die toen nog niet gecommit waren de
+# volgende sync alsnog meekomen; dubbel versturen is onschuldig (upserts)
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+# Namespace voor de deterministische ids van achteraf aangemaakte sessies
+RECONCILED_SESSION_NAMESPACE = uuid.UUID('6f1d2c3a-9b7e-4f0a-8c5d-2e4b6a8c0d1f')
+
+
+def day_bounds(column):
+    """
+    SQL-expressies voor het begin van de (UTC-)dag van column en het begin van de dag erna.
+
+    Notities:
+        - Als bereik op een andere kolom te gebruiken, zodat een index erop bruikbaar blijft
+          (func.date(kolom) == ... is dat niet).
+    """
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return sa.func.datetime(column, 'start of day'), sa.func.datetime(column, 'start of day', '+1 day')
+    day = sa.func.date_trunc('day', column)
+    return day, day + sa.text("interval '1 day'")
+
+
+class CalendarService:
+    """
+    Events voor de kalenderweergave (FullCalendar) per venster, en de koppeling met WorkoutSessions.
+
+    Notities:
+        - Een venster in de huidige maand komt uit calendar_cache (een IntervalTree per gebruiker);
+          andere vensters uit één overlapquery op ix_calendar_events_user_start_end.
+        - get_changes levert voor een cursor alleen de wijzigingen (upserts en tombstones), zodat de
+          agenda bij navigeren niet het hele venster opnieuw hoeft op te halen.
+        - Invalidatie gebeurt via invalidates_dashboard bij elke wijziging van events of sessies.
+    """
+
+    @staticmethod
+    def sync_cursor(moment):
+        """Cursor (ISO-tijdstip) voor een volgende get_changes na een read op moment."""
+        return (moment - SYNC_CURSOR_OVERLAP).isoformat()
+
+    @staticmethod
+    def get_events(user_id, start=None, end=None):
+        """
+        FullCalendar-dicts van events, voorkomens en voltooide sessies in [start, end).
+
+        Notities:
+            - Zonder start begint het venster nu; zonder end worden reeksen tot DEFAULT_HORIZON
+              uitgeklapt en komen er geen voltooide sessies mee.
+
+        Returns:
+            tuple: (dicts, cursor) met de cursor voor een volgende get_changes.
+        """
+        if start is not None and end is not None:
+            cached = calendar_cache.lookup(user_id, start, end, lambda span_start, span_end: (
+                CalendarService.window_items(user_id, span_start, span_end)
+            ))
+            if cached is not None:
+                events, loaded_at = cached
+                return events, CalendarService.sync_cursor(loaded_at)
+        loaded_at = datetime.now(timezone.utc)
+        events = [item for _, _, item in CalendarService.window_items(user_id, start, end)]
+        return events, CalendarService.sync_cursor(loaded_at)
+
+    @staticmethod
+    def get_changes(user_id, since, start, end):
+        """
+        Wijzigingen in [start, end) sinds cursor since.
+
+        Notities:
+            - Een gewijzigd los event is een upsert als het in het venster valt, anders een tombstone
+              (verplaatst naar buiten het venster).
+            - Een gewijzigde reeks (ook een gewijzigd voorkomen) geeft een tombstone met het event-id
+              plus alle voorkomens in het venster als upserts; de client past eerst de tombstones toe.
+            - Voltooide sessies komen mee als ze na since voltooid zijn; ze worden nooit verwijderd.
+
+        Returns:
+            dict: upserts, tombstones en de nieuwe cursor, of None als since ouder is dan de
+            bewaartermijn van tombstones (de client moet dan volledig herladen).
+        """
+        now = datetime.now(timezone.utc)
+        retention = timedelta(days=current_app.config.get('CALENDAR_TOMBSTONE_RETENTION_DAYS', 30))
+        if since < now - retention:
+            return None
+
+        upserts = []
+        tombstones = []
+
+        changed_events = CalendarEvent.query.options(
+            db.selectinload(CalendarEvent.exceptions),
+            db.selectinload(CalendarEvent.workout_plan)
+        ).filter(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.updated_at > since
+        ).all()
+
+        for event in changed_events:
+            if event.is_recurring:
+                tombstones.append(str(event.id))
+                upserts.extend(CalendarService.event_item(occurrence)[2]
+                               for occurrence in expand_event(event, start, end))
+            elif overlaps(event, start, end):
+                upserts.append(CalendarService.event_item(event)[2])
+            else:
+                tombstones.append(str(event.id))
+
+        tombstones.extend(item_id for (item_id,) in db.session.query(CalendarTombstone.item_id).filter(
+            CalendarTombstone.user_id == user_id,
+            CalendarTombstone.deleted_at > since
+        ))
+
+        completed_sessions = WorkoutSession.query.options(
+            db.joinedload(WorkoutSession.workout_plan)
+        ).filter(
+            WorkoutSession.user_id == user_id,
+            WorkoutSession.is_completed == True,
+            WorkoutSession.completed_at > max(since, start),
+            WorkoutSession.completed_at < end
+        ).all()
+        upserts.extend(CalendarService.session_item(session)[2] for session in completed_sessions)
+
+        return {
+            'upserts': upserts,
+            'tombstones': tombstones,
+            'cursor': CalendarService.sync_cursor(now)
+        }
+
+    @staticmethod
+    def window_items(user_id, start=None, end=None):
+        """
+        (start, end, dict)-tuples voor alles wat het venster overlapt, gesorteerd op start.
+
+        Notities:
+            - Voltooide sessies zijn punten op completed_at, zodat ze alleen meetellen in het venster
+              waarin ze voltooid zijn.
+        """
+        events = CalendarEvent.in_window(user_id, start, end).options(
+            db.selectinload(CalendarEvent.exceptions),
+            db.selectinload(CalendarEvent.workout_plan)
+        ).all()
+
+        # Terugkerende reeksen alleen binnen het gevraagde venster uitklappen
+        items = [CalendarService.event_item(event)
+                 for event in expand_events(events, start or datetime.now(timezone.utc), end)]
+
+        if start is not None and end is not None:
+            completed_sessions = WorkoutSession.query.options(
+                db.joinedload(WorkoutSession.workout_plan)
+            ).filter(
+                WorkoutSession.user_id == user_id,
+                WorkoutSession.is_completed == True,
+                WorkoutSession.completed_at >= start,
+                WorkoutSession.completed_at < end
+            ).all()
+            items.extend(CalendarService.session_item(session) for session in completed_sessions)
+
+        items.sort(key=lambda item: item[0])
+        return items
+
+    @staticmethod
+    def event_item(event):
+        """(start, end, dict) van een CalendarEvent of CalendarOccurrence."""
+        event_dict = event.to_dict()
+        event_dict['editable'] = event.status != 'completed'
+        return as_utc(event.start_datetime), as_utc(event.end_datetime), event_dict
+
+    @staticmethod
+    def session_item(session):
+        """(completed_at, completed_at, dict) van een voltooide WorkoutSession."""
+        completed_at = as_utc(session.completed_at)
+        return completed_at, completed_at, {
+            'id': f'session_{session.id}',
+            'title': f'✅ {session.workout_plan.name if session.workout_plan else "Workout"}',
+            'start': completed_at.isoformat(),
+            'end': (completed_at + timedelta(minutes=session.duration_minutes or 60)).isoformat(),
+            'color': '#4CAF50',
+            'editable': False,
+            'event_type': 'completed_workout'
+        }
+
+    @staticmethod
+    def unmatched_completed_events(user_id=None):
+        """
+        Voltooide workout/cardio-events met een plan zonder voltooide sessie van dat plan op dezelfde dag.
+
+        Notities:
+            - Eén anti-join (NOT EXISTS); de gecorreleerde subqueries zijn bereiken op de dag van het
+              event in plaats van func.date per sessie.
+            - Een sessie hoort bij de dag waarop ze begon of eindigde; zo blijft een event over middernacht
+              gekoppeld aan de sessie die reconcile_workout_sessions ervoor aanmaakte (die begint op het
+              begin van het event en eindigt de dag erna).
+            - Reeksen tellen niet mee: een voorkomen krijgt zijn sessie bij het voltooien.
+
+        Returns:
+            list: Rijen (id, user_id, workout_plan_id, start_datetime, end_datetime).
+        """
+        day_start, next_day = day_bounds(CalendarEvent.start_datetime)
+        same_plan = (
+            WorkoutSession.workout_plan_id == CalendarEvent.workout_plan_id,
+            WorkoutSession.is_completed == True,
+            WorkoutSession.user_id == CalendarEvent.user_id
+        )
+        completed_that_day = sa.exists().where(
+            *same_plan, WorkoutSession.completed_at >= day_start, WorkoutSession.completed_at < next_day
+        )
+        started_that_day = sa.exists().where(
+            *same_plan, WorkoutSession.started_at >= day_start, WorkoutSession.started_at < next_day
+        )
+        query = db.session.query(
+            CalendarEvent.id, CalendarEvent.user_id, CalendarEvent.workout_plan_id,
+            CalendarEvent.start_datetime, CalendarEvent.end_datetime
+        ).filter(
+            CalendarEvent.status == 'completed',
+            CalendarEvent.event_type.in_(['workout', 'cardio']),
+            CalendarEvent.workout_plan_id.isnot(None),
+            CalendarEvent.is_recurring == False,
+            ~completed_that_day,
+            ~started_that_day
+        )
+        if user_id is not None:
+            query = query.filter(CalendarEvent.user_id == user_id)
+        return query.order_by(CalendarEvent.id).all()
+
+    @staticmethod
+    def insert_missing_sessions(rows):
+        """
+        Voeg sessies in en sla ids over die al bestaan.
+
+        Notities:
+            - INSERT ... ON CONFLICT DO NOTHING op SQLite en PostgreSQL, anders eerst de bestaande ids ophalen.
+
+        Returns:
+            list: De rows die werkelijk zijn ingevoegd.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(WorkoutSession).values(rows).on_conflict_do_nothing(
+                index_elements=['id']
+            ).returning(WorkoutSession.id)
+            inserted = {session_id for (session_id,) in db.session.execute(stmt)}
+        else:
+            existing = {session_id for (session_id,) in db.session.query(WorkoutSession.id).filter(
+                WorkoutSession.id.in_([row['id'] for row in rows])
+            )}
+            inserted = {row['id'] for row in rows} - existing
+            if inserted:
+                db.session.execute(sa.insert(WorkoutSession), [row for row in rows if row['id'] in inserted])
+        return [row for row in rows if row['id'] in inserted]
+
+    @staticmethod
+    def reconcile_workout_sessions(user_id=None, batch_size=500):
+        """
+        Maak achteraf WorkoutSessions aan voor voltooide events zonder sessie (zie unmatched_completed_events).
+
+        Notities:
+            - Eén anti-join, daarna per batch één bulk insert en één rollup-upsert per (gebruiker, dag);
+              elke batch wordt gecommit.
+            - Veilig als periodieke taak voor alle gebruikers: het id van een sessie is afgeleid van het
+              event en de dag, en de insert slaat bestaande ids over. Een gelijktijdige run maakt dus geen
+              dubbele sessie en telt die ook niet dubbel in de rollup; de rest van de batch gaat gewoon door.
+
+        Returns:
+            Counter: Aantal aangemaakte sessies per gebruiker.
+        """
+        created = Counter()
+        unmatched = CalendarService.unmatched_completed_events(user_id)
+
+        for offset in range(0, len(unmatched), batch_size):
+            rows = []
+            for event_id, event_user_id, plan_id, start, end in unmatched[offset:offset + batch_size]:
+                start = as_utc(start)
+                duration = int((as_utc(end) - start).total_seconds() / 60) if end else 60
+                rows.append({
+                    'id': str(uuid.uuid5(RECONCILED_SESSION_NAMESPACE, f'{event_id}:{start.date().isoformat()}')),
+                    'user_id': event_user_id,
+                    'workout_plan_id': plan_id,
+                    'started_at': start,
+                    'completed_at': start + timedelta(minutes=duration),
+                    'duration_minutes': duration,
+                    'is_completed': True,
+                    'total_sets': 0,
+                    'total_reps': 0,
+                    'total_weight': 0.0
+                })
+
+            inserted = CalendarService.insert_missing_sessions(rows)
+            if len(inserted) < len(rows):
+                logger.info(f"{len(rows) - len(inserted)} sessies al aangemaakt door een andere run, overgeslagen")
+
+            activity = Counter((row['user_id'], row['completed_at'].date()) for row in inserted)
+            for (activity_user_id, day), count in activity.items():
+                UserDailyActivity.add(activity_user_id, day, sessions=count)
+            db.session.commit()
+            created.update(row['user_id'] for row in inserted)
+
+        return created
@@ -0,0 +1,375 @@
+import click
+from flask import Blueprint
+
+from app import db
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def activity():
+    """Beheer de user_daily_activity rollup."""
+    pass
+
+
+@activity.command()
+@click.option('--user-id', type=int, default=None, help='Herbouw alleen voor deze gebruiker.')
+def rebuild(user_id):
+    """Herbereken de dagelijkse activiteit-rollup vanuit de volledige historie."""
+    from app.models import UserDailyActivity
+    count = UserDailyActivity.rebuild(user_id=user_id)
+    db.session.commit()
+    click.echo(f'{count} dag-rijen herbouwd')
+
+
+@activity.command('backfill-streaks')
+@click.option('--user-id', type=int, default=None, help='Alleen deze gebruiker bijwerken.')
+@click.option('--batch-size', type=int, default=200, help='Aantal gebruikers per commit.')
+def backfill_streaks(user_id, batch_size):
+    """Herbereken workout_streak, longest_streak en last_workout_date vanuit de rollup."""
+    from app.models import User
+    query = db.session.query(User.id).order_by(User.id)
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+    user_ids = [uid for (uid,) in query]
+
+    for start in range(0, len(user_ids), batch_size):
+        for uid in user_ids[start:start + batch_size]:
+            db.session.get(User, uid).recompute_streak(full=True)
+        db.session.commit()
+        db.session.expunge_all()
+    click.echo(f'Streaks bijgewerkt voor {len(user_ids)} gebruikers')
+
+
+@bp.cli.group()
+def catalog():
+    """Beheer de in-memory oefeningencatalogus."""
+    pass
+
+
+@catalog.command()
+@click.option('--iterations', type=int, default=2000, help='Aantal zoekopdrachten.')
+@click.option('--seed', type=int, default=42, help='Seed voor de willekeurige zoektermen.')
+def benchmark(iterations, seed):
+    """Meet de zoeklatentie (p50/p99) met prefixen en typefouten van bestaande namen."""
+    import random
+    import time
+    from app.workouts.catalog import CatalogIndex
+
+    index = CatalogIndex.build()
+    if not len(index):
+        click.echo('Geen oefeningen in de database')
+        return
+
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    def sample_query():
+        name = rng.choice(index.names).lower()
+        query = name[:rng.randint(1, len(name))]
+        if len(query) > 3 and rng.random() < 0.5:
+            # Typefout: verwissel, laat weg of vervang één teken
+            i = rng.randrange(len(query) - 1)
+            query = rng.choice([
+                query[:i] + query[i + 1] + query[i] + query[i + 2:],
+                query[:i] + query[i + 1:],
+                query[:i] + rng.choice(letters) + query[i + 1:],
+            ])
+        return query
+
+    queries = [sample_query() for _ in range(iterations)]
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(search_term=query, page=1, per_page=10)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    click.echo(f'{len(index)} oefeningen, {iterations} zoekopdrachten: '
+               f'p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {timings[-1]:.3f} ms')
+
+
+@bp.cli.group()
+def sessions():
+    """Beheer workout-sessies."""
+    pass
+
+
+@sessions.command('check-totals')
+@click.option('--fix', is_flag=True, help='Corrigeer afwijkende totalen.')
+@click.option('--session-id', default=None, help='Controleer alleen deze sessie.')
+def check_totals(fix, session_id):
+    """Vergelijk de lopende sessietotalen met een volledige herberekening uit de SetLogs."""
+    from app.models import WorkoutSession, SetLog, UserDailyActivity
+
+    recomputed = db.session.query(
+        SetLog.workout_session_id,
+        db.func.count(SetLog.id),
+        db.func.coalesce(db.func.sum(SetLog.reps), 0),
+        db.func.coalesce(db.func.sum(SetLog.reps * SetLog.weight), 0.0)
+    ).filter(
+        SetLog.completed == True,
+        SetLog.workout_session_id.isnot(None)
+    ).group_by(SetLog.workout_session_id).subquery()
+
+    query = db.session.query(
+        WorkoutSession.id, WorkoutSession.total_sets, WorkoutSession.total_reps, WorkoutSession.total_weight,
+        *[db.func.coalesce(column, 0) for column in list(recomputed.c)[1:]]
+    ).outerjoin(recomputed, recomputed.c.workout_session_id == WorkoutSession.id)
+    if session_id:
+        query = query.filter(WorkoutSession.id == session_id)
+
+    mismatches = []
+    checked = 0
+    for sid, sets, reps, weight, real_sets, real_reps, real_weight in query:
+        checked += 1
+        if (sets or 0) != real_sets or (reps or 0) != real_reps or abs((weight or 0.0) - real_weight) > 1e-6:
+            mismatches.append({'id': sid, 'total_sets': real_sets, 'total_reps': real_reps,
+                               'total_weight': real_weight})
+            click.echo(f'{sid}: sets {sets} != {real_sets}, reps {reps} != {real_reps}, '
+                       f'gewicht {weight} != {real_weight}')
+
+    if fix and mismatches:
+        for values in mismatches:
+            workout_session = db.session.get(WorkoutSession, values.pop('id'))
+            # Voltooide sessies ook in de dag-rollup corrigeren
+            UserDailyActivity.record_session(workout_session, sign=-1)
+            for name, value in values.items():
+                setattr(workout_session, name, value)
+            UserDailyActivity.record_session(workout_session)
+        db.session.commit()
+    click.echo(f'{checked} sessies gecontroleerd, {len(mismatches)} afwijkend'
+               + (', gecorrigeerd' if fix and mismatches else ''))
+    if mismatches and not fix:
+        raise SystemExit(1)
+
+
+# Tabellen waarop een volledige table scan in een dashboard- of historiequery als regressie telt
+PLAN_CHECKED_TABLES = ('set_logs', 'workout_sessions', 'calendar_events', 'weight_log')
+
+
+@bp.cli.group()
+def queries():
+    """Controleer de queries van de drukste pagina's."""
+    pass
+
+
+@queries.command('check-plans')
+@click.option('--user-id', type=int, default=None, help='Bouw de queries voor deze gebruiker.')
+@click.option('--verbose', is_flag=True, help='Toon het plan van elke query.')
+def check_plans(user_id, verbose):
+    """
+    Draai EXPLAIN QUERY PLAN op de dashboard-, historie- en kalenderqueries (alleen SQLite).
+
+    Faalt als een query een volledige table scan doet op een van de PLAN_CHECKED_TABLES.
+    De queries worden opgevangen uit de echte code, dus nieuwe queries in DashboardService tellen vanzelf mee.
+    """
+    import re
+    from datetime import datetime, timedelta, timezone
+    import sqlalchemy as sa
+    from flask import current_app
+    from app.main.services import DashboardService
+    from app.models import User, WorkoutSession, CalendarEvent
+
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('check-plans gebruikt EXPLAIN QUERY PLAN en werkt alleen op SQLite')
+
+    user = db.session.get(User, user_id) if user_id else User.query.first()
+    if user is None:
+        # Lege database (bv. in CI): een niet-opgeslagen gebruiker volstaat voor EXPLAIN
+        user = User(id=0, auth0_id='', email='')
+    now = datetime.now(timezone.utc)
+
+    workloads = {
+        'dashboard': lambda: DashboardService.build_context(user),
+        'historie': lambda: WorkoutSession.query.filter_by(
+            user_id=user.id, is_completed=True, is_archived=False
+        ).order_by(WorkoutSession.completed_at.desc()).limit(10).all(),
+        'totaal workouts': lambda: WorkoutSession.query.filter_by(user_id=user.id, is_completed=True).count(),
+        'sessie-statistieken': lambda: WorkoutSession(id='', user_id=user.id).exercise_stats(),
+        'kalender week': lambda: CalendarEvent.in_window(user.id, now - timedelta(days=7), now).all(),
+        'kalender voltooid': lambda: CalendarEvent.query.filter_by(
+            user_id=user.id, status='completed'
+        ).filter(CalendarEvent.event_type.in_(['workout', 'cardio'])).all(),
+    }
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((current, statement, parameters))
+
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        with current_app.test_request_context():
+            for current, workload in workloads.items():
+                workload()
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+        db.session.rollback()
+
+    scan = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+    failures = 0
+    for name, statement, parameters in captured:
+        plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters
+        )]
+        scans = [detail for detail in plan
+                 if (match := scan.match(detail)) and match.group(1) in PLAN_CHECKED_TABLES]
+        if scans or verbose:
+            click.echo(f'[{name}] {" ".join(statement.split())}')
+            for detail in plan:
+                click.echo(f'    {detail}')
+        if scans:
+            failures += 1
+    db.session.rollback()
+
+    click.echo(f'{len(captured)} queries gecontroleerd, {failures} met een volledige table scan')
+    if failures:
+        raise SystemExit(1)
+
+
+@bp.cli.group()
+def records():
+    """Beheer de persoonlijke records."""
+    pass
+
+
+@records.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Herbouw alleen voor deze gebruiker.')
+def rebuild_records(user_id):
+    """Herbereken personal_record en de PR-historie vanuit alle voltooide sets."""
+    from app.models import PersonalRecord
+    count = PersonalRecord.rebuild(user_id=user_id)
+    db.session.commit()
+    click.echo(f'{count} records herbouwd')
+
+
+@bp.cli.group()
+def calendar():
+    """Kalenderqueries en de interval-cache van de huidige maand."""
+    pass
+
+
+@calendar.command('benchmark')
+@click.option('--events', 'event_count', type=int, default=10000, help='Aantal events voor een tijdelijke testgebruiker.')
+@click.option('--user-id', type=int, default=None, help='Meet op de events van deze gebruiker in plaats van testdata.')
+@click.option('--iterations', type=int, default=200, help='Aantal vensterqueries per variant.')
+@click.option('--seed', type=int, default=42, help='Seed voor de testdata en vensters.')
+def benchmark_calendar(event_count, user_id, iterations, seed):
+    """
+    Meet de latency (p50/p99) van kalendervensters: overlapquery op de database tegenover de interval tree.
+
+    Zonder --user-id wordt een testgebruiker met --events losse events over vier jaar aangemaakt;
+    alles wordt na afloop teruggedraaid.
+    """
+    import random
+    import time
+    import uuid
+    from datetime import timedelta
+    import sqlalchemy as sa
+    from app import calendar_cache
+    from app.calendar.services import CalendarService
+    from app.models import User, CalendarEvent
+
+    rng = random.Random(seed)
+    month, span_start, span_end = calendar_cache.month_span()
+
+    try:
+        if user_id is None:
+            token = uuid.uuid4().hex
+            user = User(name='Benchmark', email=f'benchmark-{token}@fittrack.local', auth0_id=f'benchmark-{token}')
+            db.session.add(user)
+            db.session.flush()
+            user_id = user.id
+            first_day = span_start - timedelta(days=730)
+            rows = []
+            for i in range(event_count):
+                start = first_day + timedelta(minutes=rng.randrange(4 * 365 * 24 * 60))
+                rows.append({
+                    'user_id': user_id,
+                    'title': f'Training {i}',
+                    'start_datetime': start,
+                    'end_datetime': start + timedelta(minutes=rng.choice((30, 45, 60, 90, 120))),
+                    'event_type': rng.choice(('workout', 'cardio', 'rest')),
+                    'status': 'planned',
+                    'is_recurring': False
+                })
+            db.session.execute(sa.insert(CalendarEvent), rows)
+            db.session.flush()
+
+        total = db.session.query(sa.func.count(CalendarEvent.id)).filter(CalendarEvent.user_id == user_id).scalar()
+        if not total:
+            click.echo('Geen events voor deze gebruiker')
+            return
+
+        # Week- en maandvensters binnen de gecachete periode, zoals de kalender ze opvraagt
+        windows = []
+        for _ in range(iterations):
+            length = timedelta(days=rng.choice((7, 42)))
+            offset = timedelta(hours=rng.randrange(int((span_end - span_start - length).total_seconds() // 3600)))
+            windows.append((span_start + offset, span_start + offset + length))
+
+        def measure(fn):
+            timings = []
+            for window_start, window_end in windows:
+                started = time.perf_counter()
+                fn(window_start, window_end)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.session.expunge_all()
+            timings.sort()
+            return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+        database = measure(lambda start, end: CalendarService.window_items(user_id, start, end))
+
+        calendar_cache.invalidate(user_id)
+        started = time.perf_counter()
+        items = CalendarService.window_items(user_id, span_start, span_end)
+        build_ms = (time.perf_counter() - started) * 1000
+        if calendar_cache.lookup(user_id, span_start, span_end, lambda *span: items) is None:
+            raise click.ClickException('De kalendercache staat uit (CALENDAR_CACHE_MAX_USERS = 0)')
+        cached = measure(lambda start, end: calendar_cache.lookup(
+            user_id, start, end, lambda *span: CalendarService.window_items(user_id, *span)
+        ))
+
+        click.echo(f'{total} events, {len(items)} in de gecachete maand {month[0]}-{month[1]:02d}, '
+                   f'{iterations} vensters')
+        click.echo(f'  database:      p50 {database[0]:.3f} ms, p99 {database[1]:.3f} ms')
+        click.echo(f'  interval tree: p50 {cached[0]:.3f} ms, p99 {cached[1]:.3f} ms '
+                   f'(opbouw {build_ms:.1f} ms)')
+    finally:
+        calendar_cache.invalidate(user_id)
+        db.session.rollback()
+
+
+@calendar.command('prune-tombstones')
+@click.option('--days', type=int, default=None,
+              help='Bewaartermijn in dagen (standaard CALENDAR_TOMBSTONE_RETENTION_DAYS).')
+def prune_tombstones(days):
+    """Verwijder tombstones van de agenda-delta-sync die ouder zijn dan de bewaartermijn."""
+    from datetime import datetime, timedelta, timezone
+    from flask import current_app
+    from app.models import CalendarTombstone
+
+    if days is None:
+        days = current_app.config.get('CALENDAR_TOMBSTONE_RETENTION_DAYS', 30)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    count = CalendarTombstone.query.filter(CalendarTombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{count} tombstones verwijderd')
+
+
+@calendar.command('reconcile-sessions')
+@click.option('--user-id', type=int, default=None, help='Alleen voor deze gebruiker (standaard alle gebruikers).')
+@click.option('--batch-size', type=int, default=500, help='Aantal sessies per bulk insert en commit.')
+def reconcile_sessions(user_id, batch_size):
+    """Maak ontbrekende WorkoutSessions aan voor voltooide events; geschikt als periodieke taak."""
+    from app import dashboard_cache
+    from app.calendar.services import CalendarService
+
+    created = CalendarService.reconcile_workout_sessions(user_id=user_id, batch_size=batch_size)
+    for affected_user_id in created:
+        dashboard_cache.invalidate(affected_user_id)
+    click.echo(f'{sum(created.values())} sessies aangemaakt voor {len(created)} gebruikers')
@@ -2,6 +2,7 @@ from flask import url_for, jsonify, request
 import re
 from flask_login import current_user
 from functools import wraps
+from app import dashboard_cache, calendar_cache
 from app.models import WorkoutPlan, WorkoutPlanExercise
 
 
@@ -85,6 +86,27 @@ def owns_workout_plan(f):
     return decorated_function
 
 
+def invalidates_dashboard(f):
+    """
+    Decorator die de dashboard- en kalendercache van de huidige gebruiker leegt na een wijzigend verzoek.
+
+    Notities:
+        - GET-verzoeken wijzigen niets en laten de cache staan.
+        - Invalideert ook na een fout; een onnodige cache-miss is goedkoper dan een verouderd dashboard.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        finally:
+            if request.method != 'GET' and current_user.is_authenticated:
+                dashboard_cache.invalidate(current_user.id)
+                calendar_cache.invalidate(current_user.id)
+
+    return decorated_function
+
+
 def get_user_workout_plans(user_id, archived=False):
     """Haal workout-plannen op voor een specifieke gebruiker."""
     # Basisquery voor gebruikersplannen
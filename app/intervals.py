@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Marge rond de maand, zodat de zes weken van een maandweergave plus de week die de agenda aan
+# weerszijden vooraf laadt (ook met tijdzoneverschil) erin vallen
+MONTH_MARGIN_BEFORE = timedelta(days=14)
+MONTH_MARGIN_AFTER = timedelta(days=21)
+
+
+class IntervalTree:
+    """
+    Statische interval tree over (start, end, value)-tuples.
+
+    Notities:
+        - Impliciete gebalanceerde boom over de op start gesorteerde intervallen: elke knoop is het
+          midden van een deelbereik en kent het grootste einde in zijn deelboom. Opbouwen kost
+          O(n log n), zoeken O(log n + k).
+        - Niet te wijzigen; na een wijziging wordt de boom opnieuw opgebouwd.
+    """
+
+    def __init__(self, intervals):
+        self._items = sorted(intervals, key=lambda item: item[0])
+        self._max_end = [None] * len(self._items)
+        self._build(0, len(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._items[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start, end):
+        """
+        Waarden van de intervallen die [start, end) overlappen, gesorteerd op start.
+
+        Notities:
+            - Zelfde regel als CalendarEvent.in_window: een interval zonder duur telt mee als het
+              binnen het venster begint.
+        """
+        result = []
+        self._search(0, len(self._items), start, end, result)
+        return result
+
+    def _search(self, lo, hi, start, end, result):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] < start:
+            return
+        self._search(lo, mid, start, end, result)
+        item_start, item_end, value = self._items[mid]
+        if item_start >= end:
+            # De rechter deelboom begint nog later
+            return
+        if item_end > start or item_start >= start:
+            result.append(value)
+        self._search(mid + 1, hi, start, end, result)
+
+
+class MonthIntervalCache:
+    """
+    In-process cache van de huidige kalendermaand per gebruiker, als IntervalTree.
+
+    Notities:
+        - Dekt de maand plus MONTH_MARGIN_BEFORE/AFTER; vensters die daar buiten vallen gaan langs
+          de database.
+        - Per gunicorn-worker een eigen cache; invalidatie geldt dus alleen binnen deze worker,
+          daarom verloopt een entry na CALENDAR_CACHE_TTL seconden.
+        - Een opbouw die tijdens een invalidatie liep wordt niet opgeslagen.
+        - CALENDAR_CACHE_MAX_USERS = 0 schakelt de cache uit.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.max_users = 512
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self._counters = dict.fromkeys(('hits', 'misses', 'bypassed'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lees TTL en maximaal aantal gebruikers uit de app-configuratie."""
+        self.ttl = app.config.get('CALENDAR_CACHE_TTL', 60)
+        self.max_users = app.config.get('CALENDAR_CACHE_MAX_USERS', 512)
+
+    @staticmethod
+    def month_span(moment=None):
+        """(maand, begin, einde) van de gecachete periode rond de maand van moment (standaard nu, UTC)."""
+        moment = moment or datetime.now(timezone.utc)
+        month_start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        return (month_start.year, month_start.month), month_start - MONTH_MARGIN_BEFORE, next_month + MONTH_MARGIN_AFTER
+
+    def lookup(self, user_id, start, end, loader):
+        """
+        Waarden die [start, end) overlappen, uit de boom van de huidige maand.
+
+        Args:
+            loader (callable): loader(span_start, span_end) levert bij een miss de
+                (start, end, value)-tuples van de hele periode.
+
+        Returns:
+            tuple: (waarden gesorteerd op start, moment waarop de boom geladen werd), of None als het
+            venster niet binnen de periode valt.
+        """
+        month, span_start, span_end = self.month_span()
+        if not self.max_users or start < span_start or end > span_end:
+            with self._lock:
+                self._counters['bypassed'] += 1
+            return None
+
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry[0] == month and entry[1] > time.monotonic():
+                self._data.move_to_end(user_id)
+                self._counters['hits'] += 1
+                return entry[2].overlapping(start, end), entry[3]
+            self._counters['misses'] += 1
+            generation = self._invalidations
+
+        loaded_at = datetime.now(timezone.utc)
+        tree = IntervalTree(loader(span_start, span_end))
+        with self._lock:
+            if generation == self._invalidations:
+                self._data[user_id] = (month, time.monotonic() + self.ttl, tree, loaded_at)
+                self._data.move_to_end(user_id)
+                while len(self._data) > self.max_users:
+                    self._data.popitem(last=False)
+        return tree.overlapping(start, end), loaded_at
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            self._data.pop(user_id, None)
+
+    def stats(self):
+        """Aantal gecachete gebruikers en tellers van dit proces."""
+        with self._lock:
+            return {
+                'users': len(self._data),
+                'max_users': self.max_users,
+                'ttl_seconds': self.ttl,
+                **self._counters
+            }
@@ -0,0 +1,321 @@
+from datetime import datetime, date, timedelta, timezone
+import logging
+
+from flask import url_for
+
+from app import db, dashboard_cache
+from app.analytics import weekly_muscle_volume
+from app.models import WorkoutPlan, WorkoutPlanExercise, Exercise, WorkoutSession, WeightLog, SetLog, UserDailyActivity, \
+    PersonalRecord
+
+logger = logging.getLogger(__name__)
+
+WEEK_DAYS = ['Ma', 'Di', 'Wo', 'Do', 'Vr', 'Za', 'Zo']
+
+
+def as_utc(timestamp):
+    """Maak een timestamp timezone-aware (SQLite levert naive datetimes)."""
+    if timestamp is not None and timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def format_time_ago(timestamp):
+    """Format timestamp naar 'x tijd geleden' """
+    if not timestamp:
+        return "Onbekend"
+
+    # Zorg dat timestamp timezone-aware is
+    timestamp = as_utc(timestamp)
+
+    now = datetime.now(timezone.utc)
+    diff = now - timestamp
+
+    if diff.days > 7:
+        return timestamp.strftime('%d %B')
+    elif diff.days > 0:
+        return f"{diff.days} {'dag' if diff.days == 1 else 'dagen'} geleden"
+    elif diff.seconds > 3600:
+        hours = diff.seconds // 3600
+        return f"{hours} {'uur' if hours == 1 else 'uur'} geleden"
+    elif diff.seconds > 60:
+        minutes = diff.seconds // 60
+        return f"{minutes} {'minuut' if minutes == 1 else 'minuten'} geleden"
+    else:
+        return "Zojuist"
+
+
+class DashboardService:
+    """
+    Bouwt de volledige context voor het dashboard (main.index) in een vast aantal queries.
+
+    Notities:
+        - Het aantal queries is onafhankelijk van het aantal plannen, sessies en events.
+        - Elke _load_* methode voert precies één query uit.
+        - De context bevat alleen JSON-serialiseerbare data zodat hij in dashboard_cache past.
+    """
+
+    @staticmethod
+    def get_context(user):
+        """
+        Haal de dashboard-context uit de cache of bouw hem opnieuw op.
+
+        Notities:
+            - Invalidatie gebeurt via invalidates_dashboard bij elke wijziging van sets, sessies,
+              plannen, gewicht of kalender.
+        """
+        context = dashboard_cache.get(user.id)
+        if context is None:
+            context = DashboardService.build_context(user)
+            dashboard_cache.set(user.id, context)
+        return dict(context)
+
+    @staticmethod
+    def build_context(user):
+        """
+        Verzamel alle dashboard-data voor een gebruiker.
+
+        Returns:
+            dict: Template-context voor index.html (zonder formulieren en quote).
+        """
+        today = date.today()
+        start_of_week = today - timedelta(days=today.weekday())
+        start_of_month = today.replace(day=1)
+
+        workout_data = DashboardService._load_workout_data(user.id)
+        last_performed = DashboardService._load_last_performed([info['plan']['id'] for info in workout_data])
+        recent_sessions = DashboardService._load_recent_sessions(user.id)
+        activity_days = DashboardService._load_activity(user.id, min(start_of_week, start_of_month))
+        recent_weights = DashboardService._load_recent_weights(user.id)
+        first_weight = DashboardService._load_first_weight(user.id)
+        personal_records = DashboardService._load_personal_records(user.id)
+        cardio_count = DashboardService._load_cardio_count(user.id)
+        muscle_volume = weekly_muscle_volume(user.id, week_of=today)
+
+        for workout_info in workout_data:
+            completed_at = last_performed.get(workout_info['plan']['id'])
+            workout_info['last_performed'] = format_time_ago(completed_at) if completed_at else None
+
+            # Geschatte duur en calorieën
+            exercise_count = len(workout_info['exercises'])
+            workout_info['estimated_duration'] = exercise_count * 5  # 5 min per oefening geschat
+            workout_info['estimated_calories'] = exercise_count * 50  # 50 cal per oefening geschat
+
+            # Categorie bepalen
+            if any('cardio' in ex['name'].lower() for ex in workout_info['exercises']):
+                workout_info['category'] = 'cardio'
+            else:
+                workout_info['category'] = 'strength'
+
+        # Trainingsdagen (sessies + voltooide events) uit de rollup
+        workouts_this_month = sum(count for day, count in activity_days if day >= start_of_month)
+        workouts_this_week = sum(count for day, count in activity_days if day >= start_of_week)
+        active_days = {day for day, _ in activity_days}
+        week_activity = [{
+            'name': name,
+            'letter': name[0],
+            'completed': start_of_week + timedelta(days=i) in active_days
+        } for i, name in enumerate(WEEK_DAYS)]
+
+        latest_weight = recent_weights[0] if recent_weights else None
+        weight_progress = 0
+        if latest_weight and first_weight:
+            weight_progress = first_weight.weight - latest_weight.weight
+
+        last_session = recent_sessions[0] if recent_sessions else None
+
+        return {
+            'workout_data': workout_data,
+            'workouts_this_month': workouts_this_month,
+            'workouts_this_week': workouts_this_week,
+            'streak_days': user.current_streak,
+            'weight_progress': weight_progress,
+            'last_workout': DashboardService._last_workout(last_session),
+            'week_activity': week_activity,
+            'goal_progress': DashboardService._goal_progress(user, first_weight),
+            'weekly_goal': user.weekly_workouts or 3,
+            'personal_records': personal_records,
+            'muscle_volume': muscle_volume,
+            'workout_suggestions': DashboardService._suggestions(last_session, cardio_count),
+            'recent_activities': DashboardService._recent_activities(recent_sessions, recent_weights)
+        }
+
+    @staticmethod
+    def _load_workout_data(user_id):
+        """Haal actieve plannen met hun oefeningen op in één join."""
+        rows = db.session.query(WorkoutPlan.id, WorkoutPlan.name, Exercise.id, Exercise.name).outerjoin(
+            WorkoutPlanExercise, WorkoutPlanExercise.workout_plan_id == WorkoutPlan.id
+        ).outerjoin(
+            Exercise, Exercise.id == WorkoutPlanExercise.exercise_id
+        ).filter(
+            WorkoutPlan.user_id == user_id,
+            WorkoutPlan.is_archived == False
+        ).order_by(
+            WorkoutPlan.created_at.desc(), WorkoutPlan.id, WorkoutPlanExercise.order
+        ).all()
+
+        workout_data = []
+        by_plan = {}
+        for plan_id, plan_name, exercise_id, exercise_name in rows:
+            if plan_id not in by_plan:
+                by_plan[plan_id] = {'plan': {'id': plan_id, 'name': plan_name}, 'exercises': []}
+                workout_data.append(by_plan[plan_id])
+            if exercise_id is not None:
+                by_plan[plan_id]['exercises'].append({'id': exercise_id, 'name': exercise_name})
+        return workout_data
+
+    @staticmethod
+    def _load_last_performed(plan_ids):
+        """Laatste voltooiingsmoment per plan via één GROUP BY."""
+        if not plan_ids:
+            return {}
+        rows = db.session.query(
+            WorkoutSession.workout_plan_id,
+            db.func.max(WorkoutSession.completed_at)
+        ).filter(
+            WorkoutSession.workout_plan_id.in_(plan_ids),
+            WorkoutSession.is_completed == True
+        ).group_by(WorkoutSession.workout_plan_id).all()
+        return {plan_id: completed_at for plan_id, completed_at in rows}
+
+    @staticmethod
+    def _load_recent_sessions(user_id, limit=3):
+        """Laatste voltooide sessies inclusief plan (joinedload, geen lazy loads)."""
+        return WorkoutSession.query.options(
+            db.joinedload(WorkoutSession.workout_plan)
+        ).filter(
+            WorkoutSession.user_id == user_id,
+            WorkoutSession.is_completed == True
+        ).order_by(WorkoutSession.completed_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def _load_activity(user_id, since):
+        """Lees de dagelijkse rollup vanaf 'since' als [(date, sessions), ...]."""
+        return db.session.query(UserDailyActivity.date, UserDailyActivity.sessions).filter(
+            UserDailyActivity.user_id == user_id,
+            UserDailyActivity.date >= since,
+            UserDailyActivity.sessions > 0
+        ).all()
+
+    @staticmethod
+    def _load_recent_weights(user_id, limit=2):
+        """Meest recente gewichtsmetingen (nieuwste eerst)."""
+        return WeightLog.query.filter_by(user_id=user_id).order_by(WeightLog.logged_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def _load_first_weight(user_id):
+        """Eerste gewichtsmeting, gebruikt als startgewicht."""
+        return WeightLog.query.filter_by(user_id=user_id).order_by(WeightLog.logged_at).first()
+
+    @staticmethod
+    def _load_personal_records(user_id, limit=3):
+        """Zwaarste gewichten per oefening, direct uit de personal_record tabel."""
+        heaviest = db.session.query(Exercise.name, PersonalRecord.best_weight).join(
+            Exercise, Exercise.id == PersonalRecord.exercise_id
+        ).filter(
+            PersonalRecord.user_id == user_id,
+            PersonalRecord.best_weight > 0
+        ).order_by(PersonalRecord.best_weight.desc()).limit(limit).all()
+
+        return [{'exercise': name, 'value': f'{weight}kg'} for name, weight in heaviest]
+
+    @staticmethod
+    def _load_cardio_count(user_id):
+        """Aantal gelogde cardio-sets."""
+        return db.session.query(db.func.count(SetLog.id)).join(
+            Exercise, SetLog.exercise_id == Exercise.id
+        ).filter(
+            SetLog.user_id == user_id,
+            Exercise.category == 'CARDIO'
+        ).scalar() or 0
+
+    @staticmethod
+    def _last_workout(last_session):
+        """Samenvatting van de laatste workout voor de 'herhaal'-kaart."""
+        if not last_session:
+            return None
+        return {
+            'id': last_session.workout_plan_id,
+            'name': last_session.workout_plan.name if last_session.workout_plan else "Onbekende workout",
+            'date': last_session.completed_at.strftime('%d %B'),
+            'duration': last_session.duration_minutes or 30,
+            'exercise_count': last_session.total_sets or 0
+        }
+
+    @staticmethod
+    def _goal_progress(user, first_weight):
+        """Bereken voortgang naar gewichtsdoel"""
+        if not user.fitness_goal or not user.current_weight or not first_weight:
+            return 0
+
+        start = first_weight.weight
+        if start == user.fitness_goal:
+            return 100
+
+        progress = abs(start - user.current_weight) / abs(start - user.fitness_goal) * 100
+        return min(100, round(progress))
+
+    @staticmethod
+    def _suggestions(last_session, cardio_count):
+        """Genereer workout suggesties gebaseerd op gebruikersdata"""
+        suggestions = []
+
+        if not last_session or (datetime.now(timezone.utc) - as_utc(last_session.completed_at)).days > 3:
+            suggestions.append({
+                'title': 'Tijd voor een workout!',
+                'description': 'Je hebt al een paar dagen niet getraind',
+                'icon': 'fas fa-exclamation-circle',
+                'link': url_for('main.index')
+            })
+
+        # Suggestie voor cardio als er weinig cardio is
+        if cardio_count < 5:
+            suggestions.append({
+                'title': 'Probeer wat cardio',
+                'description': 'Verbeter je conditie met cardio oefeningen',
+                'icon': 'fas fa-running',
+                'link': url_for('workouts.search_exercise', plan_id=0, category='CARDIO')
+            })
+
+        # Als geen suggesties, toon algemene
+        if not suggestions:
+            suggestions = [
+                {
+                    'title': 'Full Body Workout',
+                    'description': 'Train je hele lichaam in één sessie',
+                    'icon': 'fas fa-dumbbell',
+                    'link': url_for('workouts.add_workout')
+                },
+                {
+                    'title': 'HIIT Training',
+                    'description': 'Verbrand calorieën met interval training',
+                    'icon': 'fas fa-fire',
+                    'link': url_for('workouts.add_workout')
+                }
+            ]
+
+        return suggestions
+
+    @staticmethod
+    def _recent_activities(recent_sessions, recent_weights, limit=5):
+        """Combineer recente sessies en gewichtsmetingen, nieuwste eerst."""
+        activities = []
+
+        for session in recent_sessions:
+            activities.append((as_utc(session.completed_at), {
+                'type': 'workout',
+                'icon': 'fas fa-dumbbell',
+                'text': f'Workout "{session.workout_plan.name if session.workout_plan else "Workout"}" voltooid',
+                'time': format_time_ago(session.completed_at)
+            }))
+
+        for log in recent_weights:
+            activities.append((as_utc(log.logged_at), {
+                'type': 'weight',
+                'icon': 'fas fa-weight',
+                'text': f'Gewicht bijgewerkt: {log.weight}kg',
+                'time': format_time_ago(log.logged_at)
+            }))
+
+        activities.sort(key=lambda item: item[0], reverse=True)
+        return [activity for _, activity in activities[:limit]]
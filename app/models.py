@@ -1,11 +1,14 @@
 import json
+import secrets
 from enum import Enum
 import pytz
 import sqlalchemy as sa
 import sqlalchemy.orm as so
-from datetime import datetime, timezone
+import datetime as dt
+from datetime import datetime, timezone, date, timedelta
 from typing import Optional
 from app import db
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import TypeDecorator, TEXT
 import uuid
 
@@ -16,7 +19,7 @@ class JSONEncodedList(TypeDecorator):
     Notities:
         - Converteert lijsten naar JSON bij opslaan (`process_bind_param`).
         - Parseert JSON naar lijsten bij ophalen (`process_result_value`).
-        - Gebruikt voor velden zoals Exercise.images en Exercise.instructions.
+        - Voor TEXT-kolommen met JSON; Exercise gebruikt inmiddels native JSON (JSONList).
     """
     impl = TEXT
 
@@ -41,6 +44,27 @@ class JSONEncodedList(TypeDecorator):
         return json.loads(value)
 
 
+# Native JSON: JSONB op PostgreSQL (indexeerbaar, containment-queries), JSON op SQLite en andere dialecten
+JSONList = sa.JSON().with_variant(JSONB(), 'postgresql')
+
+
+def as_json_list(value):
+    """
+    Normaliseer invoer voor een JSON-lijstkolom naar een Python-lijst.
+
+    Notities:
+        - Accepteert ook JSON-strings (bv. uit seed_exercises.py); ongeldige JSON wordt [].
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value else []
+        except json.JSONDecodeError:
+            return []
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
 class ExperienceLevel(str, Enum):
     """
     Enum voor ervaringsniveaus van oefeningen.
@@ -180,9 +204,14 @@ class User(db.Model):
     start_weight: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
     total_workouts: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
     workout_streak: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
+    longest_streak: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
     achievements_count: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
     last_workout_date: so.Mapped[Optional[datetime]] = so.mapped_column(sa.Date, nullable=True)
 
+    # Geheim token in de URL van het ICS-abonnement op de agenda; None = geen feed
+    calendar_feed_token: so.Mapped[Optional[str]] = so.mapped_column(sa.String(64), index=True, unique=True,
+                                                                      nullable=True)
+
     # Relaties
     weight_logs: so.WriteOnlyMapped['WeightLog'] = so.relationship(back_populates='user', cascade="all, delete-orphan")
     exercise_logs: so.WriteOnlyMapped['ExerciseLog'] = so.relationship(back_populates='user',
@@ -199,6 +228,11 @@ class User(db.Model):
         post_update=True  # Voorkomt circulaire updates
     )
 
+    def rotate_calendar_feed_token(self):
+        """Maak een nieuw feed-token aan; een eerder gedeelde feed-URL werkt daarna niet meer."""
+        self.calendar_feed_token = secrets.token_urlsafe(32)
+        return self.calendar_feed_token
+
     @property
     def is_trainer(self):
         """Check of de gebruiker een trainer is"""
@@ -224,6 +258,84 @@ class User(db.Model):
         """Vlag of de gebruiker anoniem is (voor Flask-Login)."""
         return False
 
+    @property
+    def current_streak(self):
+        """
+        Huidige workout streak in dagen.
+
+        Notities:
+            - workout_streak is de reeks die eindigt op last_workout_date.
+            - Die reeks telt alleen nog als er vandaag of gisteren getraind is.
+        """
+        if not self.last_workout_date or (date.today() - self.last_workout_date).days > 1:
+            return 0
+        return self.workout_streak or 0
+
+    def record_workout_day(self, day):
+        """
+        Werk de streak in O(1) bij voor een nieuwe trainingsdag.
+
+        Notities:
+            - Een dag vóór last_workout_date (bijv. een achteraf voltooid event) valt terug op recompute_streak.
+        """
+        last_day = self.last_workout_date
+        if last_day is not None and day < last_day:
+            self.recompute_streak()
+            return
+
+        if last_day is None or day > last_day + timedelta(days=1):
+            self.workout_streak = 1
+        elif day == last_day + timedelta(days=1):
+            self.workout_streak = (self.workout_streak or 0) + 1
+        else:
+            self.workout_streak = self.workout_streak or 1
+
+        self.last_workout_date = day
+        self.longest_streak = max(self.longest_streak or 0, self.workout_streak)
+
+    def recompute_streak(self, full=False):
+        """
+        Herbereken de streak vanuit de user_daily_activity rollup.
+
+        Args:
+            full (bool): Loop de volledige historie door om ook longest_streak te herberekenen.
+                         Zonder full stopt de berekening na de laatste aaneengesloten reeks.
+        """
+        rows = db.session.execute(
+            sa.select(UserDailyActivity.date).where(
+                UserDailyActivity.user_id == self.id,
+                UserDailyActivity.sessions > 0
+            ).order_by(UserDailyActivity.date.desc())
+        )
+
+        last_day = None
+        previous = None
+        current = longest = run = 0
+        in_first_run = True
+        for (day,) in rows:
+            if previous is None:
+                last_day = day
+                run = 1
+            elif (previous - day).days == 1:
+                run += 1
+            else:
+                if not full:
+                    break
+                in_first_run = False
+                run = 1
+            if in_first_run:
+                current = run
+            longest = max(longest, run)
+            previous = day
+        rows.close()
+
+        self.last_workout_date = last_day
+        self.workout_streak = current
+        if full:
+            self.longest_streak = longest
+        else:
+            self.longest_streak = max(self.longest_streak or 0, current)
+
     def get_id(self):
         """
         Haal de gebruikers-ID op als string (voor Flask-Login).
@@ -258,7 +370,8 @@ class User(db.Model):
             'height': self.height,
             'fitness_level': self.fitness_level,
             'total_workouts': self.total_workouts,
-            'workout_streak': self.workout_streak
+            'workout_streak': self.current_streak,
+            'longest_streak': self.longest_streak
         }
 
         # Voeg trainer-specifieke velden toe indien trainer
@@ -290,6 +403,10 @@ class WeightLog(db.Model):
         - Gebruikt voor gewichtsverloopgrafieken en statistieken.
         - Automatisch timestamp met UTC-tijdzone.
     """
+    __table_args__ = (
+        # Dashboard en grafieken: metingen van een gebruiker op datum
+        sa.Index('ix_weight_log_user_logged_at', 'user_id', 'logged_at'),
+    )
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), nullable=False)
     weight: so.Mapped[float] = so.mapped_column(nullable=False)
@@ -331,12 +448,34 @@ class ExerciseMuscle(db.Model):
         return f'<ExerciseMuscle {self.muscle}>'
 
 
+PLACEHOLDER_IMAGE = 'img/placeholder.png'
+
+
+def normalize_image_path(img):
+    """
+    Normaliseer een ruw afbeeldingspad naar een pad onder static/.
+
+    Returns:
+        str: Pad als 'img/exercises/...', of None voor lege of standaardafbeeldingen.
+    """
+    if not img or 'default.jpg' in img:
+        return None
+    if img.startswith('img/exercises/'):
+        return img
+    if img.startswith('img/'):
+        # img/3_4_Sit-Up/0.jpg -> img/exercises/3_4_Sit-Up/0.jpg
+        return img.replace('img/', 'img/exercises/', 1)
+    return f'img/exercises/{img}'
+
+
 class Exercise(db.Model):
     """
     Model voor fitness-oefeningen.
     Notities:
-        - Gebruikt JSONEncodedList voor instructions en images.
+        - instructions en images zijn native JSON-lijsten (JSONB op PostgreSQL, met GIN-index op images).
         - Veel-op-veel-relaties met ExerciseMuscle via exercise_muscle_association.
+        - thumbnail_url, image_count en image_records worden bij elke toewijzing aan images
+          berekend, zodat leespaden geen JSON of paden meer hoeven te verwerken.
     """
     id: so.Mapped[str] = so.mapped_column(sa.String(50), primary_key=True)
     name: so.Mapped[str] = so.mapped_column(sa.String(100), index=True)
@@ -345,11 +484,23 @@ class Exercise(db.Model):
     mechanic: so.Mapped[Optional[str]] = so.mapped_column(sa.Enum(Mechanic))
     equipment: so.Mapped[Optional[str]] = so.mapped_column(sa.Enum(Equipment), index=True)
     category: so.Mapped[str] = so.mapped_column(sa.Enum(Category), index=True)
-    instructions: so.Mapped[str] = so.mapped_column(sa.Text)
-    images: so.Mapped[str] = so.mapped_column(sa.Text)
+    instructions: so.Mapped[list] = so.mapped_column(JSONList, default=list)
+    images: so.Mapped[list] = so.mapped_column(JSONList, default=list)
+    thumbnail_url: so.Mapped[str] = so.mapped_column(sa.String(255), default=PLACEHOLDER_IMAGE,
+                                                     server_default=PLACEHOLDER_IMAGE)
+    image_count: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    image_records: so.Mapped[list['ExerciseImage']] = so.relationship(
+        back_populates='exercise', order_by='ExerciseImage.position',
+        cascade='all, delete-orphan', passive_deletes=True
+    )
     is_public: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=True)
     user_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey('user.id'), nullable=True)
     user: so.Mapped[Optional['User']] = so.relationship('User', backref='exercises')
+
+    __table_args__ = (
+        # GIN-index voor containment-queries (Exercise.images.contains([...])) op PostgreSQL
+        sa.Index('ix_exercise_images_gin', 'images', postgresql_using='gin'),
+    )
     primary_muscles: so.WriteOnlyMapped['ExerciseMuscle'] = so.relationship(
         secondary=lambda: exercise_muscle_association,
         primaryjoin=lambda: (exercise_muscle_association.c.exercise_id == Exercise.id) & (
@@ -369,6 +520,51 @@ class Exercise(db.Model):
         """String-representatie van het Exercise-object."""
         return f'<Exercise {self.name}>'
 
+    @so.validates('instructions')
+    def _validate_instructions(self, key, value):
+        """Sla instructions altijd als lijst op, ook als een JSON-string wordt toegewezen."""
+        return as_json_list(value)
+
+    @so.validates('images')
+    def _resolve_images(self, key, value):
+        """
+        Bereken de genormaliseerde afbeeldings-URL's zodra images wordt gezet (insert, seed of update).
+
+        Notities:
+            - Accepteert een lijst of een JSON-string; opgeslagen wordt altijd de lijst.
+        """
+        raw_images = as_json_list(value)
+
+        urls = []
+        for img in raw_images:
+            url = normalize_image_path(img) if isinstance(img, str) else None
+            if url and url not in urls:
+                urls.append(url)
+
+        self.image_records = [ExerciseImage(position=i, url=url) for i, url in enumerate(urls)]
+        self.image_count = len(urls)
+        self.thumbnail_url = urls[0] if urls else PLACEHOLDER_IMAGE
+        return raw_images
+
+    @classmethod
+    def images_contain(cls, image):
+        """
+        Filterexpressie: oefeningen waarvan de (ruwe) images-lijst deze afbeelding bevat.
+
+        Notities:
+            - PostgreSQL: JSONB containment (@>), gebruikt de GIN-index ix_exercise_images_gin.
+            - Overige dialecten: json_each over de JSON-kolom.
+        """
+        if db.engine.dialect.name == 'postgresql':
+            return sa.type_coerce(cls.images, JSONB).contains([image])
+        elements = sa.func.json_each(cls.images).table_valued('value')
+        return sa.exists().where(elements.c.value == image)
+
+    @property
+    def image_urls(self):
+        """Genormaliseerde afbeeldings-URL's (laad met selectinload(Exercise.image_records) bij lijsten)."""
+        return [record.url for record in self.image_records]
+
     @property
     def is_cardio(self):
         """Controleer of oefening cardio is gebaseerd op category"""
@@ -377,42 +573,30 @@ class Exercise(db.Model):
     @property
     def images_list(self):
         """
-        Haal de lijst van afbeeldingen op als Python-lijst.
+        Haal de lijst van (ruwe) afbeeldingen op.
 
         Returns:
-            list: Geparseerde afbeeldingslijst, of [] bij fouten.
+            list: Afbeeldingslijst, of [] als er geen is.
         """
-        try:
-            return json.loads(self.images) if self.images else []
-        except json.JSONDecodeError:
-            return []
+        return self.images or []
 
     @images_list.setter
     def images_list(self, value):
         """
-        Stel de afbeeldingslijst in als JSON-string.
+        Stel de afbeeldingslijst in.
         """
-        self.images = json.dumps(value)
+        self.images = value
 
     def to_dict(self):
         """
         Converteer Exercise-object naar dictionary voor JSON-responsen.
+
         Notities:
-            - Genereert fallback-afbeeldingspaden op basis van oefeningnaam.
-            - Parseert instructions als JSON-lijst.
-        """
-        image_list = self.images_list  # Gebruikt property voor consistentie
-        fixed_images = []
-        for img_path in image_list:
-            if not img_path.startswith("img/exercises/"):
-                safe_name = self.name.strip().replace(" ", "_")  # Normaliseer naam
-                fixed_images.append(f"img/exercises/{safe_name}/0.jpg")
-            else:
-                fixed_images.append(img_path)
-        if not fixed_images:
-            safe_name = self.name.strip().replace(" ", "_")
-            fixed_images = [f"img/exercises/{safe_name}/0.jpg"]
+            - Gebruikt de bij het opslaan genormaliseerde afbeeldings-URL's.
 
+        Returns:
+            dict: Oefening-gegevens inclusief afbeeldingen en instructies.
+        """
         return {
             'id': self.id,
             'name': self.name,
@@ -420,12 +604,34 @@ class Exercise(db.Model):
             'level': self.level,
             'mechanic': self.mechanic,
             'equipment': self.equipment,
-            'instructions': json.loads(self.instructions) if self.instructions else [],
+            'instructions': self.instructions or [],
             'category': self.category,
-            'images': fixed_images
+            'images': self.image_urls or [self.thumbnail_url]
         }
 
 
+class ExerciseImage(db.Model):
+    """
+    Genormaliseerde afbeeldings-URL's van een oefening, in weergavevolgorde.
+
+    Notities:
+        - Wordt gevuld door Exercise._resolve_images; niet rechtstreeks bewerken.
+    """
+    __tablename__ = 'exercise_image'
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    exercise_id: so.Mapped[str] = so.mapped_column(
+        sa.ForeignKey('exercise.id', ondelete='CASCADE'), index=True, nullable=False
+    )
+    position: so.Mapped[int] = so.mapped_column(default=0)
+    url: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=False)
+    exercise: so.Mapped['Exercise'] = so.relationship(back_populates='image_records')
+
+    def __repr__(self):
+        """String-representatie van het ExerciseImage-object."""
+        return f'<ExerciseImage {self.exercise_id} #{self.position}>'
+
+
 class WorkoutPlan(db.Model):
     """
     Model voor workout-plannen van gebruikers.
@@ -554,6 +760,13 @@ class SetLog(db.Model):
         - Gebruikt SET NULL voor workout_plan_id om integriteit te behouden bij plan-verwijdering.
     """
     __tablename__ = 'set_logs'
+    __table_args__ = (
+        # Eén rij per set binnen een sessie; nodig voor de upsert in SetLog.upsert_many
+        sa.UniqueConstraint('workout_session_id', 'workout_plan_exercise_id', 'set_number',
+                            name='uq_set_logs_session_wpe_set'),
+        # Dashboard: cardio-telling en voltooide sets per gebruiker
+        sa.Index('ix_set_logs_user_completed', 'user_id', 'completed'),
+    )
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     workout_plan_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey('workout_plan.id', ondelete='SET NULL'),
@@ -601,6 +814,58 @@ class SetLog(db.Model):
             'exercise_name': self.exercise.name if self.exercise else None
         }
 
+    UPSERT_KEY = ('workout_session_id', 'workout_plan_exercise_id', 'set_number')
+    UPSERT_FIELDS = ('reps', 'weight', 'duration_minutes', 'distance_km', 'completed')
+
+    @classmethod
+    def upsert_many(cls, rows):
+        """
+        Voeg sets in of werk ze bij op (workout_session_id, workout_plan_exercise_id, set_number).
+
+        Args:
+            rows (list): Dicts met alle kolommen van een nieuwe SetLog.
+
+        Returns:
+            list: [(id, workout_plan_exercise_id, set_number), ...] van de geschreven sets.
+
+        Notities:
+            - Eén INSERT ... ON CONFLICT DO UPDATE op SQLite en PostgreSQL, anders een ORM-fallback.
+            - completed_at wordt alleen overschreven als de set (opnieuw) voltooid wordt.
+            - Dubbele sleutels in rows: de laatste wint.
+        """
+        rows = list({tuple(row[key] for key in cls.UPSERT_KEY): row for row in rows}.values())
+        if not rows:
+            return []
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls).values(rows)
+            set_ = {name: getattr(stmt.excluded, name) for name in cls.UPSERT_FIELDS}
+            set_['completed_at'] = db.func.coalesce(stmt.excluded.completed_at, cls.completed_at)
+            stmt = stmt.on_conflict_do_update(index_elements=list(cls.UPSERT_KEY), set_=set_).returning(
+                cls.id, cls.workout_plan_exercise_id, cls.set_number
+            )
+            return [tuple(row) for row in db.session.execute(stmt)]
+
+        written = []
+        for row in rows:
+            set_log = cls.query.filter_by(**{key: row[key] for key in cls.UPSERT_KEY}).first()
+            if set_log is None:
+                set_log = cls(**row)
+                db.session.add(set_log)
+            else:
+                for name in cls.UPSERT_FIELDS:
+                    setattr(set_log, name, row[name])
+                if row.get('completed_at'):
+                    set_log.completed_at = row['completed_at']
+            written.append(set_log)
+        db.session.flush()
+        return [(s.id, s.workout_plan_exercise_id, s.set_number) for s in written]
+
     @property
     def is_cardio(self):
         """Check of deze set log cardio is"""
@@ -623,6 +888,12 @@ class WorkoutSession(db.Model):
         - Statistieken worden berekend via calculate_statistics.
     """
     __tablename__ = 'workout_sessions'
+    __table_args__ = (
+        # Dashboard, historie en totalen: voltooide sessies van een gebruiker, nieuwste eerst
+        sa.Index('ix_workout_sessions_user_completed_at', 'user_id', 'is_completed', 'completed_at'),
+        # Laatst uitgevoerd per plan
+        sa.Index('ix_workout_sessions_plan_completed_at', 'workout_plan_id', 'is_completed', 'completed_at'),
+    )
     id: so.Mapped[str] = so.mapped_column(sa.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), nullable=False)
     workout_plan_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('workout_plan.id'), nullable=False)
@@ -650,19 +921,47 @@ class WorkoutSession(db.Model):
         if self.completed_at and self.completed_at.tzinfo is None:
             self.completed_at = self.completed_at.replace(tzinfo=pytz.UTC)
 
-    def calculate_statistics(self):
+    def exercise_stats(self):
+        """
+        Aggregeer de voltooide sets van deze sessie per oefening in één GROUP BY.
+
+        Returns:
+            list: Rijen met exercise_id, sets, reps, avg_reps, avg_weight en volume (sum reps * gewicht).
+        """
+        return db.session.query(
+            SetLog.exercise_id,
+            db.func.count(SetLog.id).label('sets'),
+            db.func.coalesce(db.func.sum(SetLog.reps), 0).label('reps'),
+            db.func.avg(SetLog.reps).label('avg_reps'),
+            db.func.avg(SetLog.weight).label('avg_weight'),
+            db.func.coalesce(db.func.sum(SetLog.reps * SetLog.weight), 0.0).label('volume')
+        ).filter(
+            SetLog.workout_session_id == self.id,
+            SetLog.completed == True
+        ).group_by(SetLog.exercise_id).all()
+
+    def calculate_statistics(self, exercise_stats=None):
         """
-        Bereken statistieken voor de workout-sessie op basis van SetLogs.
+        Bereken statistieken voor de workout-sessie volledig opnieuw op basis van SetLogs.
+
+        Args:
+            exercise_stats (list, optional): Resultaat van exercise_stats(), om de query te hergebruiken.
 
         Notities:
-            - Telt totaal aantal sets, herhalingen, en gewicht (reps * gewicht).
-            - Berekent duur in minuten als started_at en completed_at beschikbaar zijn.
+            - Telt totaal aantal sets, herhalingen, en gewicht (reps * gewicht) in SQL, zonder SetLogs te laden.
+            - In de normale flow worden de totalen als delta bijgehouden (apply_totals_delta); dit is de
+              volledige herberekening voor de consistentiecheck.
             - Update object-attributen direct.
         """
-        set_logs = SetLog.query.filter_by(workout_session_id=self.id, completed=True).all()
-        self.total_sets = len(set_logs)
-        self.total_reps = sum(log.reps for log in set_logs)
-        self.total_weight = sum(log.reps * log.weight for log in set_logs)
+        if exercise_stats is None:
+            exercise_stats = self.exercise_stats()
+        self.total_sets = sum(row.sets for row in exercise_stats)
+        self.total_reps = sum(row.reps for row in exercise_stats)
+        self.total_weight = sum(row.volume for row in exercise_stats)
+        self.calculate_duration()
+
+    def calculate_duration(self):
+        """Berekent duur in minuten als started_at en completed_at beschikbaar zijn."""
         if self.started_at and self.completed_at:
             started_at = self.started_at if self.started_at.tzinfo else self.started_at.replace(tzinfo=pytz.UTC)
             completed_at = self.completed_at if self.completed_at.tzinfo else self.completed_at.replace(tzinfo=pytz.UTC)
@@ -671,6 +970,33 @@ class WorkoutSession(db.Model):
         else:
             self.duration_minutes = 0
 
+    @staticmethod
+    def set_contribution(completed, reps, weight):
+        """Bijdrage van één set aan de sessietotalen: (sets, reps, volume)."""
+        if not completed:
+            return 0, 0, 0.0
+        reps = reps or 0
+        return 1, reps, reps * (weight or 0.0)
+
+    @classmethod
+    def apply_totals_delta(cls, session_id, sets=0, reps=0, volume=0.0):
+        """
+        Tel deltas atomisch op bij total_sets, total_reps en total_weight van een sessie.
+
+        Notities:
+            - Eén UPDATE ... SET total = total + delta, dus veilig bij gelijktijdige set-writes.
+            - Een geladen WorkoutSession in de ORM-sessie wordt direct bijgewerkt (synchronize_session).
+        """
+        if not (sets or reps or volume):
+            return
+        db.session.execute(
+            sa.update(cls).where(cls.id == session_id).values(
+                total_sets=db.func.coalesce(cls.total_sets, 0) + sets,
+                total_reps=db.func.coalesce(cls.total_reps, 0) + reps,
+                total_weight=db.func.coalesce(cls.total_weight, 0.0) + volume
+            ).execution_options(synchronize_session='fetch')
+        )
+
     def to_dict(self):
         """
         Converteer WorkoutSession-object naar dictionary voor JSON-responsen.
@@ -691,11 +1017,53 @@ class WorkoutSession(db.Model):
         }
 
 
+class SetOperation(db.Model):
+    """
+    Log van toegepaste set-operaties uit de offline sync, één rij per idempotency key.
+
+    Notities:
+        - op_key wordt door de client gegenereerd; dezelfde key binnen een sessie wordt maar één keer toegepast.
+        - id is oplopend en dient als server-cursor voor de client.
+        - Wordt samen met de sessie verwijderd (CASCADE).
+    """
+    __tablename__ = 'set_operations'
+    __table_args__ = (
+        sa.UniqueConstraint('workout_session_id', 'op_key', name='uq_set_operations_session_key'),
+    )
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    workout_session_id: so.Mapped[str] = so.mapped_column(
+        sa.ForeignKey('workout_sessions.id', ondelete='CASCADE'), nullable=False)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    op_key: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=False)
+    op: so.Mapped[str] = so.mapped_column(sa.String(10), nullable=False)
+    workout_plan_exercise_id: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    set_number: so.Mapped[int] = so.mapped_column(nullable=False)
+    set_log_id: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    applied_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True),
+                                                       default=lambda: datetime.now(timezone.utc))
+
+    OPS = ('set', 'delete')
+
+    def __repr__(self):
+        return f'<SetOperation {self.id}: {self.op} {self.op_key}>'
+
+
 class CalendarEvent(db.Model):
     """
     Model voor kalender gebeurtenissen in de FitTrack-applicatie.
     """
     __tablename__ = 'calendar_events'
+    __table_args__ = (
+        # Overlapqueries van kalender- en weekweergave: bereik op start, einde gefilterd uit de index
+        sa.Index('ix_calendar_events_user_start_end', 'user_id', 'start_datetime', 'end_datetime'),
+        # Terugkerende reeksen die vóór het venster begonnen zijn
+        sa.Index('ix_calendar_events_user_series_start', 'user_id', 'start_datetime',
+                 sqlite_where=sa.text('is_recurring = 1'), postgresql_where=sa.text('is_recurring')),
+        # Delta-sync van de kalender: gewijzigd sinds een cursor
+        sa.Index('ix_calendar_events_user_updated', 'user_id', 'updated_at'),
+        # Voltooide workouts/cardio voor de activiteit-rollup
+        sa.Index('ix_calendar_events_user_status_type', 'user_id', 'status', 'event_type'),
+    )
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), nullable=False)
@@ -715,9 +1083,12 @@ class CalendarEvent(db.Model):
     # Statut
     status: so.Mapped[str] = so.mapped_column(sa.String(20), default='planned')  # planned, completed, cancelled
 
-    # Récurrence
+    # Récurrence: één rij per reeks, voorkomens worden per venster uitgeklapt (zie app.calendar.recurrence)
     is_recurring: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
     recurrence_pattern: so.Mapped[Optional[str]] = so.mapped_column(sa.String(50), nullable=True)  # daily, weekly, monthly
+    # Aantal voorkomens inclusief het eerste; None met recurrence_end_date None is een onbegrensde reeks
+    recurrence_count: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    # Einde van het laatste voorkomen; bij een count berekend door update_recurrence_bounds()
     recurrence_end_date: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
 
     # Couleur pour l'affichage
@@ -736,11 +1107,50 @@ class CalendarEvent(db.Model):
     # Relations
     user: so.Mapped['User'] = so.relationship(backref='calendar_events')
     workout_plan: so.Mapped[Optional['WorkoutPlan']] = so.relationship(backref='calendar_events')
+    exceptions: so.Mapped[list['CalendarEventException']] = so.relationship(
+        back_populates='event', cascade='all, delete-orphan', passive_deletes=True
+    )
+
+    @classmethod
+    def in_window(cls, user_id, start=None, end=None):
+        """
+        Query voor de events van een gebruiker die het venster [start, end) overlappen.
+
+        Notities:
+            - Een event overlapt als het vóór end begint en na start eindigt; een event zonder duur
+              telt mee als het binnen het venster begint. Dit deel gebruikt alleen kolommen van
+              ix_calendar_events_user_start_end, dus rijen buiten het venster kosten geen tabellookup.
+            - Terugkerende reeksen komen daarnaast mee als ze vóór end beginnen en niet vóór start
+              zijn afgelopen (via ix_calendar_events_user_series_start); het uitklappen gebeurt daarna
+              in Python.
+            - Beide delen worden met UNION gecombineerd: een OR over beide zou elke rij vóór end
+              langs de tabel laten gaan.
+        """
+        overlapping = [cls.user_id == user_id]
+        series = [cls.user_id == user_id, cls.is_recurring == True]
+        if end is not None:
+            overlapping.append(cls.start_datetime < end)
+            series.append(cls.start_datetime < end)
+        if start is not None:
+            overlapping.append(sa.or_(cls.end_datetime > start, cls.start_datetime >= start))
+            series.append(sa.or_(cls.recurrence_end_date.is_(None), cls.recurrence_end_date > start))
+        return cls.query.filter(*overlapping).union(cls.query.filter(*series))
+
+    def update_recurrence_bounds(self):
+        """Zet recurrence_end_date op het einde van het laatste voorkomen als de reeks een count heeft."""
+        from app.calendar.recurrence import occurrence_start
+        if not self.is_recurring or not self.recurrence_count:
+            return
+        first_start = self.start_datetime
+        last_start = occurrence_start(first_start, self.recurrence_pattern, self.recurrence_count - 1)
+        self.recurrence_end_date = last_start + (self.end_datetime - first_start)
 
     def to_dict(self):
         """Converteer naar dictionary voor JSON responses"""
         return {
             'id': self.id,
+            'event_id': self.id,
+            'occurrence': None,
             'title': self.title,
             'description': self.description,
             'start': self.start_datetime.isoformat() if self.start_datetime else None,
@@ -751,5 +1161,485 @@ class CalendarEvent(db.Model):
             'status': self.status,
             'color': self.color,
             'is_recurring': self.is_recurring,
-            'recurrence_pattern': self.recurrence_pattern
-        }
\ No newline at end of file
+            'recurrence_pattern': self.recurrence_pattern,
+            'recurrence_count': self.recurrence_count
+        }
+
+
+class CalendarEventException(db.Model):
+    """
+    Afwijking van één voorkomen van een terugkerend CalendarEvent.
+
+    Notities:
+        - occurrence_start is het oorspronkelijke startmoment volgens de regel en identificeert het voorkomen.
+        - is_cancelled laat het voorkomen weg; de overige velden overschrijven die van de reeks als ze gezet zijn.
+        - Wordt samen met de reeks verwijderd (CASCADE).
+    """
+    __tablename__ = 'calendar_event_exceptions'
+    __table_args__ = (
+        sa.UniqueConstraint('event_id', 'occurrence_start', name='uq_calendar_event_exceptions_occurrence'),
+    )
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    event_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey('calendar_events.id', ondelete='CASCADE'), nullable=False)
+    occurrence_start: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), nullable=False)
+    is_cancelled: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False, nullable=False)
+    title: so.Mapped[Optional[str]] = so.mapped_column(sa.String(200), nullable=True)
+    description: so.Mapped[Optional[str]] = so.mapped_column(sa.Text, nullable=True)
+    start_datetime: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    end_datetime: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    status: so.Mapped[Optional[str]] = so.mapped_column(sa.String(20), nullable=True)
+    color: so.Mapped[Optional[str]] = so.mapped_column(sa.String(7), nullable=True)
+    updated_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True),
+                                                       default=lambda: datetime.now(timezone.utc),
+                                                       onupdate=lambda: datetime.now(timezone.utc))
+
+    event: so.Mapped['CalendarEvent'] = so.relationship(back_populates='exceptions')
+
+    def __repr__(self):
+        return f'<CalendarEventException {self.event_id}@{self.occurrence_start}>'
+
+
+class CalendarTombstone(db.Model):
+    """
+    Verwijderd kalenderitem, voor de delta-sync van de agenda.
+
+    Notities:
+        - item_id is het id zoals de kalender het toont; bij een reeks het event-id, waarmee de client
+          ook alle voorkomens (met dat event_id) verwijdert.
+        - Ouder dan CALENDAR_TOMBSTONE_RETENTION_DAYS wordt opgeruimd met: flask calendar prune-tombstones.
+          Een cursor van vóór die termijn moet daarom volledig herladen.
+    """
+    __tablename__ = 'calendar_tombstones'
+    __table_args__ = (
+        sa.Index('ix_calendar_tombstones_user_deleted', 'user_id', 'deleted_at'),
+    )
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    item_id: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=False)
+    deleted_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), nullable=False,
+                                                       default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<CalendarTombstone {self.item_id}@{self.deleted_at}>'
+
+
+class UserDailyActivity(db.Model):
+    """
+    Rollup van trainingsactiviteit per gebruiker per dag.
+
+    Notities:
+        - Wordt incrementeel bijgewerkt bij het voltooien van sessies en kalender-events.
+        - sessions telt voltooide WorkoutSessions én voltooide workout/cardio CalendarEvents,
+          net als de dashboard-tellingen.
+        - Dagen worden bepaald in UTC; rebuild() herberekent de rollup vanuit de volledige historie.
+    """
+    __tablename__ = 'user_daily_activity'
+
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    date: so.Mapped[dt.date] = so.mapped_column(sa.Date, primary_key=True)
+    sessions: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
+    sets: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
+    reps: so.Mapped[int] = so.mapped_column(default=0, server_default='0', nullable=False)
+    volume: so.Mapped[float] = so.mapped_column(default=0.0, server_default='0', nullable=False)
+    cardio_minutes: so.Mapped[float] = so.mapped_column(default=0.0, server_default='0', nullable=False)
+
+    COUNTERS = ('sessions', 'sets', 'reps', 'volume', 'cardio_minutes')
+
+    def __repr__(self):
+        """String-representatie van het UserDailyActivity-object."""
+        return f'<UserDailyActivity {self.user_id} {self.date}: {self.sessions} sessions>'
+
+    @classmethod
+    def add(cls, user_id, day, **deltas):
+        """
+        Tel deltas op bij de rij (user_id, day) en maak de rij aan als die nog niet bestaat.
+
+        Notities:
+            - Gebruikt een atomische upsert op SQLite en PostgreSQL, anders een ORM-fallback.
+            - Negatieve deltas worden gebruikt om activiteit terug te draaien.
+            - Werkt ook de streak van de gebruiker bij wanneer het aantal sessies verandert.
+        """
+        values = {name: deltas.get(name) or 0 for name in cls.COUNTERS}
+        if not any(values.values()):
+            return
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls).values(user_id=user_id, date=day, **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id', 'date'],
+                set_={name: getattr(cls, name) + getattr(stmt.excluded, name) for name in cls.COUNTERS}
+            )
+            db.session.execute(stmt)
+        else:
+            row = db.session.get(cls, (user_id, day))
+            if row is None:
+                row = cls(user_id=user_id, date=day, **{name: 0 for name in cls.COUNTERS})
+                db.session.add(row)
+            for name, delta in values.items():
+                setattr(row, name, getattr(row, name) + delta)
+
+        # Houd de streak op de User-rij synchroon met de rollup
+        if values['sessions']:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                if values['sessions'] > 0:
+                    user.record_workout_day(day)
+                else:
+                    user.recompute_streak()
+
+    @classmethod
+    def record_session(cls, workout_session, sign=1):
+        """
+        Verwerk een voltooide WorkoutSession in de rollup (sign=-1 draait dit terug).
+
+        Notities:
+            - Gebruikt de totalen van calculate_statistics plus de cardio-minuten uit de SetLogs.
+        """
+        if not workout_session.is_completed or not workout_session.completed_at:
+            return
+        cardio_minutes = db.session.query(
+            db.func.coalesce(db.func.sum(SetLog.duration_minutes), 0.0)
+        ).filter(
+            SetLog.workout_session_id == workout_session.id,
+            SetLog.completed == True
+        ).scalar()
+        cls.add(
+            workout_session.user_id,
+            workout_session.completed_at.date(),
+            sessions=sign,
+            sets=sign * (workout_session.total_sets or 0),
+            reps=sign * (workout_session.total_reps or 0),
+            volume=sign * (workout_session.total_weight or 0.0),
+            cardio_minutes=sign * (cardio_minutes or 0.0)
+        )
+
+    @classmethod
+    def record_event(cls, event, sign=1):
+        """
+        Verwerk een voltooid workout/cardio CalendarEvent in de rollup (sign=-1 draait dit terug).
+
+        Notities:
+            - Voor reeksen telt niet de reeks zelf maar elk voltooid voorkomen (CalendarOccurrence).
+        """
+        if isinstance(event, CalendarEvent) and event.is_recurring:
+            return
+        if event.status != 'completed' or event.event_type not in ('workout', 'cardio'):
+            return
+        cls.add(event.user_id, event.start_datetime.date(), sessions=sign)
+
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """
+        Herbereken de rollup vanuit WorkoutSessions, SetLogs en CalendarEvents.
+
+        Args:
+            user_id (int, optional): Beperk tot één gebruiker; None herbouwt alle gebruikers.
+
+        Returns:
+            int: Aantal geschreven dag-rijen.
+        """
+        session_day = sa.type_coerce(db.func.date(WorkoutSession.completed_at), sa.Date)
+        event_day = sa.type_coerce(db.func.date(CalendarEvent.start_datetime), sa.Date)
+
+        sessions_query = db.session.query(
+            WorkoutSession.user_id, session_day, db.func.count(WorkoutSession.id)
+        ).filter(
+            WorkoutSession.is_completed == True,
+            WorkoutSession.completed_at.isnot(None)
+        )
+        sets_query = db.session.query(
+            WorkoutSession.user_id,
+            session_day,
+            db.func.count(SetLog.id),
+            db.func.coalesce(db.func.sum(SetLog.reps), 0),
+            db.func.coalesce(db.func.sum(SetLog.reps * SetLog.weight), 0.0),
+            db.func.coalesce(db.func.sum(SetLog.duration_minutes), 0.0)
+        ).join(
+            SetLog, SetLog.workout_session_id == WorkoutSession.id
+        ).filter(
+            WorkoutSession.is_completed == True,
+            WorkoutSession.completed_at.isnot(None),
+            SetLog.completed == True
+        )
+        events_query = db.session.query(
+            CalendarEvent.user_id, event_day, db.func.count(CalendarEvent.id)
+        ).filter(
+            CalendarEvent.is_recurring == False,
+            CalendarEvent.status == 'completed',
+            CalendarEvent.event_type.in_(['workout', 'cardio'])
+        )
+        occurrence_day = sa.type_coerce(db.func.date(db.func.coalesce(
+            CalendarEventException.start_datetime, CalendarEventException.occurrence_start
+        )), sa.Date)
+        occurrences_query = db.session.query(
+            CalendarEvent.user_id, occurrence_day, db.func.count(CalendarEventException.id)
+        ).join(
+            CalendarEvent, CalendarEvent.id == CalendarEventException.event_id
+        ).filter(
+            CalendarEvent.is_recurring == True,
+            CalendarEventException.is_cancelled == False,
+            db.func.coalesce(CalendarEventException.status, CalendarEvent.status) == 'completed',
+            CalendarEvent.event_type.in_(['workout', 'cardio'])
+        )
+        delete_query = cls.query
+        if user_id is not None:
+            sessions_query = sessions_query.filter(WorkoutSession.user_id == user_id)
+            sets_query = sets_query.filter(WorkoutSession.user_id == user_id)
+            events_query = events_query.filter(CalendarEvent.user_id == user_id)
+            occurrences_query = occurrences_query.filter(CalendarEvent.user_id == user_id)
+            delete_query = delete_query.filter_by(user_id=user_id)
+
+        rows = {}
+
+        def row_for(key):
+            if key not in rows:
+                rows[key] = {'user_id': key[0], 'date': key[1], **{name: 0 for name in cls.COUNTERS}}
+            return rows[key]
+
+        for uid, day, count in sessions_query.group_by(WorkoutSession.user_id, session_day):
+            row_for((uid, day))['sessions'] += count
+        for uid, day, sets, reps, volume, cardio in sets_query.group_by(WorkoutSession.user_id, session_day):
+            row = row_for((uid, day))
+            row.update(sets=sets, reps=reps, volume=volume, cardio_minutes=cardio)
+        for uid, day, count in events_query.group_by(CalendarEvent.user_id, event_day):
+            row_for((uid, day))['sessions'] += count
+        for uid, day, count in occurrences_query.group_by(CalendarEvent.user_id, occurrence_day):
+            row_for((uid, day))['sessions'] += count
+
+        delete_query.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(sa.insert(cls), list(rows.values()))
+        return len(rows)
+
+
+class PersonalRecord(db.Model):
+    """
+    Persoonlijke records per gebruiker per oefening.
+
+    Notities:
+        - Wordt bijgewerkt zodra een voltooide set een record verbetert (apply_sets); dashboard en profiel
+          lezen deze tabel direct in plaats van de volledige set-historie te aggregeren.
+        - Records dalen niet mee als een set later gewijzigd of verwijderd wordt; rebuild() herberekent ze.
+        - Elke verbetering wordt vastgelegd in PersonalRecordHistory.
+        - Cardio-sets tellen niet mee.
+    """
+    __tablename__ = 'personal_record'
+
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    exercise_id: so.Mapped[str] = so.mapped_column(sa.ForeignKey('exercise.id', ondelete='CASCADE'), primary_key=True)
+    best_weight: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_weight_reps: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    best_weight_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    best_one_rm: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_one_rm_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    best_volume: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_volume_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    best_reps: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    best_reps_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    updated_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True),
+                                                       default=lambda: datetime.now(timezone.utc))
+    exercise: so.Mapped['Exercise'] = so.relationship()
+
+    KINDS = ('weight', 'one_rm', 'volume', 'reps')
+
+    def __repr__(self):
+        """String-representatie van het PersonalRecord-object."""
+        return f'<PersonalRecord {self.user_id} {self.exercise_id}: {self.best_weight}kg>'
+
+    @staticmethod
+    def estimate_one_rm(weight, reps):
+        """Geschatte 1RM volgens Epley: gewicht * (1 + reps / 30); bij één rep het gewicht zelf."""
+        if not weight or weight <= 0 or not reps or reps <= 0:
+            return 0.0
+        return float(weight) if reps == 1 else weight * (1 + reps / 30)
+
+    @classmethod
+    def set_values(cls, reps, weight):
+        """Waarde van één set per recordsoort."""
+        reps, weight = reps or 0, weight or 0.0
+        return {
+            'weight': weight,
+            'one_rm': cls.estimate_one_rm(weight, reps),
+            'volume': reps * weight,
+            'reps': reps,
+        }
+
+    @staticmethod
+    def _field(row, name):
+        """Lees een kolom uit een SetLog, Row of kolom-dict."""
+        return row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+
+    def improve(self, kind, value, row, now=None):
+        """
+        Zet een nieuw record als value het huidige verbetert.
+
+        Returns:
+            dict: Kolommen voor PersonalRecordHistory, of None als het geen verbetering is.
+        """
+        current = getattr(self, f'best_{kind}')
+        if value <= 0 or (current is not None and value <= current):
+            return None
+        now = now or datetime.now(timezone.utc)
+        achieved_at = self._field(row, 'completed_at') or self._field(row, 'created_at') or now
+        setattr(self, f'best_{kind}', value)
+        setattr(self, f'best_{kind}_at', achieved_at)
+        if kind == 'weight':
+            self.best_weight_reps = self._field(row, 'reps')
+        self.updated_at = now
+        return {
+            'user_id': self.user_id,
+            'exercise_id': self.exercise_id,
+            'kind': kind,
+            'value': value,
+            'previous_value': current,
+            'reps': self._field(row, 'reps'),
+            'weight': self._field(row, 'weight') or 0.0,
+            'workout_session_id': self._field(row, 'workout_session_id'),
+            'achieved_at': achieved_at,
+        }
+
+    @classmethod
+    def apply_sets(cls, user_id, sets):
+        """
+        Werk de records van een gebruiker bij met zojuist opgeslagen sets.
+
+        Args:
+            user_id (int): Eigenaar van de sets.
+            sets (iterable): SetLogs of kolom-dicts (zie SetLogService.build_row).
+
+        Returns:
+            list: Nieuwe PersonalRecordHistory-rijen als dicts, bv. om een nieuw PR te melden.
+
+        Notities:
+            - Eén SELECT ... FOR UPDATE op de bestaande records en één bulk INSERT voor de historie.
+            - Alleen voltooide krachtsets met reps tellen mee; per oefening en soort telt de beste set.
+        """
+        best = {}
+        for row in sets:
+            if (not cls._field(row, 'completed') or cls._field(row, 'duration_minutes') is not None
+                    or not cls._field(row, 'reps')):
+                continue
+            per_exercise = best.setdefault(cls._field(row, 'exercise_id'), {})
+            for kind, value in cls.set_values(cls._field(row, 'reps'), cls._field(row, 'weight')).items():
+                if kind not in per_exercise or value > per_exercise[kind][0]:
+                    per_exercise[kind] = (value, row)
+        if not best:
+            return []
+
+        records = {record.exercise_id: record for record in cls.query.filter(
+            cls.user_id == user_id, cls.exercise_id.in_(best)
+        ).with_for_update()}
+        now = datetime.now(timezone.utc)
+        history = []
+        for exercise_id, kinds in best.items():
+            record = records.get(exercise_id)
+            if record is None:
+                record = cls(user_id=user_id, exercise_id=exercise_id)
+            for kind, (value, row) in kinds.items():
+                event = record.improve(kind, value, row, now)
+                if event:
+                    history.append(event)
+            if exercise_id not in records and record.updated_at is not None:
+                db.session.add(record)
+
+        if history:
+            db.session.execute(sa.insert(PersonalRecordHistory), history)
+        return history
+
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """
+        Herbereken records en historie chronologisch vanuit alle voltooide sets.
+
+        Args:
+            user_id (int, optional): Beperk tot één gebruiker; None herbouwt alle gebruikers.
+
+        Returns:
+            int: Aantal geschreven records.
+        """
+        query = db.session.query(
+            SetLog.user_id, SetLog.exercise_id, SetLog.workout_session_id, SetLog.reps, SetLog.weight,
+            SetLog.completed_at, SetLog.created_at
+        ).filter(
+            SetLog.completed == True,
+            SetLog.duration_minutes.is_(None),
+            SetLog.reps > 0
+        ).order_by(db.func.coalesce(SetLog.completed_at, SetLog.created_at), SetLog.id)
+        delete_records = cls.query
+        delete_history = PersonalRecordHistory.query
+        if user_id is not None:
+            query = query.filter(SetLog.user_id == user_id)
+            delete_records = delete_records.filter_by(user_id=user_id)
+            delete_history = delete_history.filter_by(user_id=user_id)
+
+        # Niet-opgeslagen records als accumulator; daarna in bulk ingevoegd
+        records = {}
+        history = []
+        for row in query.yield_per(1000):
+            key = (row.user_id, row.exercise_id)
+            if key not in records:
+                records[key] = cls(user_id=row.user_id, exercise_id=row.exercise_id)
+            for kind, value in cls.set_values(row.reps, row.weight).items():
+                event = records[key].improve(kind, value, row)
+                if event:
+                    history.append(event)
+
+        delete_history.delete(synchronize_session=False)
+        delete_records.delete(synchronize_session=False)
+        columns = [column.key for column in cls.__table__.columns]
+        if records:
+            db.session.execute(sa.insert(cls), [
+                {name: getattr(record, name) for name in columns} for record in records.values()
+            ])
+        if history:
+            db.session.execute(sa.insert(PersonalRecordHistory), history)
+        return len(records)
+
+
+class PersonalRecordHistory(db.Model):
+    """
+    Historie van persoonlijke records; één rij per verbetering.
+
+    Notities:
+        - previous_value is None voor het eerste record van een soort.
+        - workout_session_id verwijst naar de sessie van de set, zonder foreign key zodat de historie blijft.
+    """
+    __tablename__ = 'personal_record_history'
+    __table_args__ = (
+        sa.Index('ix_personal_record_history_user_achieved', 'user_id', 'achieved_at'),
+    )
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    exercise_id: so.Mapped[str] = so.mapped_column(sa.ForeignKey('exercise.id', ondelete='CASCADE'), nullable=False)
+    kind: so.Mapped[str] = so.mapped_column(sa.String(10), nullable=False)
+    value: so.Mapped[float] = so.mapped_column(nullable=False)
+    previous_value: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    reps: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    weight: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    workout_session_id: so.Mapped[Optional[str]] = so.mapped_column(sa.String(36), nullable=True)
+    achieved_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), nullable=False)
+    exercise: so.Mapped['Exercise'] = so.relationship()
+
+    KIND_LABELS = {
+        'weight': 'Zwaarste gewicht',
+        'one_rm': 'Geschatte 1RM',
+        'volume': 'Beste set-volume',
+        'reps': 'Meeste reps',
+    }
+
+    def __repr__(self):
+        """String-representatie van het PersonalRecordHistory-object."""
+        return f'<PersonalRecordHistory {self.user_id} {self.exercise_id} {self.kind}={self.value}>'
+
+    @property
+    def label(self):
+        return self.KIND_LABELS.get(self.kind, self.kind)
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+
+import numpy as np
+
+from .. import db, chart_cache, chart_renderer
+from ..main.services import as_utc
+from ..models import WeightLog
+from ..rendering import render_weight_chart
+
+logger = logging.getLogger(__name__)
+
+# Verhoog bij een wijziging in het formaat van de reeks of de opmaak van de PNG,
+# zodat clients met een oude ETag opnieuw ophalen
+WEIGHT_SERIES_VERSION = 1
+WEIGHT_CHART_STYLE_VERSION = 1
+
+# Minimaal aantal metingen voor een grafiek en voor een trendlijn
+MIN_CHART_POINTS = 2
+MIN_TREND_POINTS = 3
+
+DAY_MS = 86400 * 1000
+
+
+def weight_log_state(user_id):
+    """
+    Aantal gewichtsmetingen en hoogste id van een gebruiker, in één aggregate.
+
+    Notities:
+        - WeightLog wordt alleen aangevuld, nooit gewijzigd; (aantal, hoogste id) identificeert de reeks dus.
+    """
+    count, last_id = db.session.query(
+        db.func.count(WeightLog.id), db.func.max(WeightLog.id)
+    ).filter(WeightLog.user_id == user_id).one()
+    return count, last_id
+
+
+def weight_chart_etag(user, state, kind):
+    """
+    Sterke ETag voor de gewichtsgrafiek van een gebruiker.
+
+    Args:
+        user (User): Eigenaar van de metingen; fitness_goal bepaalt de doellijn.
+        state (tuple): (aantal, hoogste id) uit weight_log_state.
+        kind (str): 'series' of 'png'.
+    """
+    version = WEIGHT_SERIES_VERSION if kind == 'series' else WEIGHT_CHART_STYLE_VERSION
+    key = f'{kind}:{version}:{user.id}:{state[0]}:{state[1]}:{user.fitness_goal}'
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def weight_chart_series(weights, user):
+    """
+    Gewichtsreeks voor een grafiek in de browser.
+
+    Notities:
+        - timestamps zijn epoch-milliseconden (direct bruikbaar in JavaScript Date).
+        - De trend is een lineaire fit over de tijd: gewicht = intercept + slope * dagen sinds origin.
+          Zonder voldoende metingen is trend None.
+
+    Returns:
+        dict: timestamps, weights, trend, goal en unit.
+    """
+    timestamps = [int(as_utc(w.logged_at).timestamp() * 1000) for w in weights]
+    values = [w.weight for w in weights]
+
+    trend = None
+    if len(values) >= MIN_TREND_POINTS:
+        days = (np.array(timestamps, dtype=float) - timestamps[0]) / DAY_MS
+        if np.ptp(days) > 0:
+            slope, intercept = np.polyfit(days, values, 1)
+            trend = {
+                'slope': round(float(slope), 4),
+                'intercept': round(float(intercept), 2),
+                'origin': timestamps[0]
+            }
+
+    return {
+        'timestamps': timestamps,
+        'weights': values,
+        'trend': trend,
+        'goal': user.fitness_goal,
+        'unit': 'kg'
+    }
+
+
+def cached_weight_chart(user, state):
+    """
+    PNG-bytes van de gewichtsgrafiek, uit chart_cache of opnieuw gerenderd.
+
+    Notities:
+        - De cachesleutel is de ETag van de PNG, dus een hit kost een stat en een read.
+        - Bij een miss worden de metingen geladen en wordt de grafiek in chart_renderer gerenderd.
+          Een render die de timeout overschrijdt komt alsnog in de cache zodra hij klaar is.
+
+    Returns:
+        bytes: PNG, of None als renderen mislukte of niet op tijd klaar was.
+    """
+    key = weight_chart_etag(user, state, 'png')
+    data = chart_cache.get(key)
+    if data is None:
+        rows = db.session.query(WeightLog.logged_at, WeightLog.weight).filter(
+            WeightLog.user_id == user.id
+        ).order_by(WeightLog.logged_at).all()
+        data = chart_renderer.render(
+            render_weight_chart, [row.logged_at for row in rows], [row.weight for row in rows], user.fitness_goal,
+            on_late_result=lambda result: chart_cache.set(key, result)
+        )
+        if data:
+            chart_cache.set(key, data)
+    return data
@@ -1,7 +1,5 @@
-import base64
-import io
 import os
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 
 import numpy as np
@@ -9,13 +7,13 @@ from markupsafe import escape
 
 from flask import flash, redirect, url_for, request, render_template, current_app
 from flask_login import login_required, current_user
-from matplotlib import pyplot as plt
 
 from . import bp
 from .. import logger, db
-from ..decorators import get_user_workout_plans, get_workout_data
+from ..decorators import get_user_workout_plans, get_workout_data, invalidates_dashboard
 from ..forms import EditProfileForm, AddWeightForm
-from ..models import WeightLog, WorkoutSession, SetLog
+from ..models import WeightLog, WorkoutSession, SetLog, PersonalRecord, PersonalRecordHistory
+from .charts import MIN_CHART_POINTS
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -27,6 +25,7 @@ def allowed_file(filename):
 
 @bp.route('/profile', methods=['GET', 'POST'])
 @login_required
+@invalidates_dashboard
 def profile():
     """Beheer gebruikersprofiel en gewichtslog."""
     logger.debug(f"Profile route, user: {current_user.name}")
@@ -154,29 +153,35 @@ def profile():
         .order_by(WeightLog.logged_at.desc()) \
         .limit(10).all()
 
-    # Generate chart
-    chart_data = None
+    # De grafiek zelf wordt in de browser getekend vanuit /api/weight_chart
     weight_stats = None
 
     if recent_weights:
         all_weights = WeightLog.query.filter_by(user_id=current_user.id) \
             .order_by(WeightLog.logged_at).all()
 
-        if len(all_weights) >= 2:
-            chart_data = generate_weight_chart_data(all_weights, current_user)
+        if len(all_weights) >= MIN_CHART_POINTS:
             weight_stats = calculate_weight_statistics(all_weights)
 
+    # Sterkste records (op geschatte 1RM) rechtstreeks uit personal_record
+    personal_records = PersonalRecord.query.options(
+        db.joinedload(PersonalRecord.exercise)
+    ).filter(
+        PersonalRecord.user_id == current_user.id,
+        PersonalRecord.best_one_rm > 0
+    ).order_by(PersonalRecord.best_one_rm.desc()).limit(5).all()
+
     return render_template('user.html',
                            user=current_user,
                            form=form,
                            weight_form=weight_form,
                            recent_weights=recent_weights,
-                           chart_data=chart_data,
-                           weight_stats=weight_stats)
+                           weight_stats=weight_stats,
+                           personal_records=personal_records)
 
 
 def update_user_statistics(user):
-    """Update user statistics like total workouts and streak"""
+    """Update user statistics like total workouts and achievements"""
     # Count total completed workouts
     total = WorkoutSession.query.filter_by(
         user_id=user.id,
@@ -184,9 +189,7 @@ def update_user_statistics(user):
     ).count()
     user.total_workouts = total
 
-    # Calculate workout streak
-    streak = calculate_workout_streak(user.id)
-    user.workout_streak = streak
+    # De streak wordt incrementeel bijgehouden, zie User.record_workout_day
 
     # Achievements (simple count for now)
     user.achievements_count = total // 10  # 1 achievement per 10 workouts
@@ -194,97 +197,6 @@ def update_user_statistics(user):
     db.session.commit()
 
 
-def calculate_workout_streak(user_id):
-    """Calculate current workout streak in days"""
-    sessions = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        is_completed=True
-    ).order_by(WorkoutSession.completed_at.desc()).all()
-
-    if not sessions:
-        return 0
-
-    streak = 0
-    current_date = date.today()
-
-    for session in sessions:
-        session_date = session.completed_at.date() if session.completed_at else None
-        if not session_date:
-            continue
-
-        days_diff = (current_date - session_date).days
-
-        if days_diff <= 1:  # Today or yesterday
-            if days_diff == 0 or streak == 0:  # Only count once per day
-                streak += 1
-                current_date = session_date
-        else:
-            break
-
-    return streak
-
-
-def generate_weight_chart_data(weights, user):
-    """Genereer grafiek data als base64 string"""
-    try:
-        dates = [w.logged_at for w in weights]
-        weight_values = [w.weight for w in weights]
-
-        plt.style.use('default')
-        fig, ax = plt.subplots(figsize=(10, 6))
-
-        ax.plot(dates, weight_values, 'o-',
-                linewidth=2.5, markersize=6,
-                color='#ff6b35', markerfacecolor='white',
-                markeredgecolor='#ff6b35', markeredgewidth=2,
-                alpha=0.8)
-
-        if len(dates) > 2:
-            x_numeric = np.arange(len(dates))
-            z = np.polyfit(x_numeric, weight_values, 1)
-            p = np.poly1d(z)
-            ax.plot(dates, p(x_numeric),
-                    '--', alpha=0.6, color='#666',
-                    linewidth=1.5, label='Trend')
-
-        if user.fitness_goal:
-            ax.axhline(y=user.fitness_goal,
-                       color='#28a745', linestyle=':',
-                       alpha=0.7, linewidth=2,
-                       label=f'Doel: {user.fitness_goal} kg')
-
-        ax.set_xlabel('Datum', fontsize=11)
-        ax.set_ylabel('Gewicht (kg)', fontsize=11)
-        ax.set_title('Jouw Gewichtsontwikkeling', fontsize=14, fontweight='bold', pad=20)
-        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
-
-        fig.autofmt_xdate()
-
-        if user.fitness_goal or len(dates) > 2:
-            ax.legend(loc='best', framealpha=0.9)
-
-        plt.tight_layout()
-
-        y_range = max(weight_values) - min(weight_values)
-        if y_range > 0:
-            padding = y_range * 0.1
-            ax.set_ylim(min(weight_values) - padding, max(weight_values) + padding)
-
-        img = io.BytesIO()
-        plt.savefig(img, format='png', dpi=150, bbox_inches='tight',
-                    facecolor='white', edgecolor='none')
-        img.seek(0)
-        plot_url = base64.b64encode(img.getvalue()).decode()
-        plt.close(fig)
-
-        return plot_url
-
-    except Exception as e:
-        print(f"Fout bij het genereren van grafiek: {e}")
-        plt.close('all')
-        return None
-
-
 def calculate_weight_statistics(weights):
     """Bereken statistieken van gewichtsmetingen"""
     try:
@@ -328,6 +240,29 @@ def weight_history():
                            user=current_user)
 
 
+@bp.route('/personal_records')
+@login_required
+def personal_records():
+    """Toon alle persoonlijke records en de historie van verbeteringen"""
+    page = request.args.get('page', 1, type=int)
+
+    records = PersonalRecord.query.options(
+        db.joinedload(PersonalRecord.exercise)
+    ).filter_by(user_id=current_user.id).order_by(
+        PersonalRecord.best_one_rm.desc().nullslast(), PersonalRecord.best_reps.desc()
+    ).all()
+
+    history = PersonalRecordHistory.query.options(
+        db.joinedload(PersonalRecordHistory.exercise)
+    ).filter_by(user_id=current_user.id).order_by(
+        PersonalRecordHistory.achieved_at.desc(), PersonalRecordHistory.id.desc()
+    ).paginate(page=page, per_page=20, error_out=False)
+
+    return render_template('personal_records.html',
+                           records=records,
+                           history=history)
+
+
 @bp.route('/workout_history')
 @login_required
 def workout_history():
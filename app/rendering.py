@@ -0,0 +1,275 @@
+import io
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Aantal recente renders waarover latency-percentielen berekend worden
+LATENCY_WINDOW = 256
+
+
+def init_worker():
+    """Initializer van een renderproces: matplotlib één keer laden, met de Agg-backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot  # noqa: F401
+
+
+def warmup():
+    """Lege taak om een renderproces direct te starten en te initialiseren."""
+    return os.getpid()
+
+
+def render_weight_chart(dates, weight_values, goal):
+    """
+    Render de gewichtsgrafiek met matplotlib als PNG-bytes.
+
+    Notities:
+        - Draait in een renderproces; krijgt alleen picklebare data mee, geen ORM-objecten.
+
+    Args:
+        dates (list): Meetmomenten (datetime), oplopend.
+        weight_values (list): Gewichten in kg.
+        goal (float, optional): Doelgewicht voor de doellijn.
+    """
+    from matplotlib import pyplot as plt
+
+    try:
+        plt.style.use('default')
+        fig, ax = plt.subplots(figsize=(10, 6))
+
+        ax.plot(dates, weight_values, 'o-',
+                linewidth=2.5, markersize=6,
+                color='#ff6b35', markerfacecolor='white',
+                markeredgecolor='#ff6b35', markeredgewidth=2,
+                alpha=0.8)
+
+        if len(dates) > 2:
+            x_numeric = np.arange(len(dates))
+            z = np.polyfit(x_numeric, weight_values, 1)
+            p = np.poly1d(z)
+            ax.plot(dates, p(x_numeric),
+                    '--', alpha=0.6, color='#666',
+                    linewidth=1.5, label='Trend')
+
+        if goal:
+            ax.axhline(y=goal,
+                       color='#28a745', linestyle=':',
+                       alpha=0.7, linewidth=2,
+                       label=f'Doel: {goal} kg')
+
+        ax.set_xlabel('Datum', fontsize=11)
+        ax.set_ylabel('Gewicht (kg)', fontsize=11)
+        ax.set_title('Jouw Gewichtsontwikkeling', fontsize=14, fontweight='bold', pad=20)
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+
+        fig.autofmt_xdate()
+
+        if goal or len(dates) > 2:
+            ax.legend(loc='best', framealpha=0.9)
+
+        plt.tight_layout()
+
+        y_range = max(weight_values) - min(weight_values)
+        if y_range > 0:
+            padding = y_range * 0.1
+            ax.set_ylim(min(weight_values) - padding, max(weight_values) + padding)
+
+        img = io.BytesIO()
+        plt.savefig(img, format='png', dpi=150, bbox_inches='tight',
+                    facecolor='white', edgecolor='none')
+        plt.close(fig)
+
+        return img.getvalue()
+
+    except Exception:
+        logger.exception("Fout bij het genereren van grafiek")
+        plt.close('all')
+        return None
+
+
+class RenderPool:
+    """
+    Begrensde ProcessPoolExecutor voor CPU-zware renders buiten de request-thread.
+
+    Notities:
+        - Processen worden met 'spawn' gestart (geen geërfde databaseverbindingen of locks) en via
+          init_worker voorverwarmd; de pool start bij het eerste request, niet bij create_app,
+          zodat CLI-commando's geen processen opstarten.
+        - Per gunicorn-worker een eigen pool; na een fork wordt hij opnieuw aangemaakt.
+        - Sterft een renderproces (OOM-kill, segfault), dan is de executor onbruikbaar; hij wordt dan
+          afgesloten en de volgende render start een nieuwe pool.
+        - render() wacht maximaal RENDER_POOL_TIMEOUT seconden en geeft anders None, zodat de
+          aanroeper kan terugvallen. Bij meer dan RENDER_POOL_MAX_QUEUE lopende renders wordt
+          een nieuwe render direct geweigerd.
+        - RENDER_POOL_WORKERS = 0 rendert in de request-thread zelf (zonder timeout).
+        - stats() geeft wachtrijdiepte, tellers en latency van dit proces.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.timeout = 5.0
+        self.max_queue = 8
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = dict.fromkeys(('submitted', 'completed', 'failed', 'timeouts', 'rejected'), 0)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lees de poolgrootte en limieten uit de app-configuratie en start de pool bij het eerste request."""
+        self.workers = app.config.get('RENDER_POOL_WORKERS', 2)
+        self.timeout = app.config.get('RENDER_POOL_TIMEOUT', 5.0)
+        self.max_queue = app.config.get('RENDER_POOL_MAX_QUEUE', 8)
+        if self.workers:
+            app.before_request(self._ensure_started)
+
+    def _is_running(self):
+        return self._executor is not None and self._pid == os.getpid()
+
+    def _ensure_started(self):
+        if not self._is_running():
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._is_running():
+                return
+            if self._pid != os.getpid():
+                # Na een fork horen de lopende renders bij het ouderproces
+                self._in_flight = 0
+            executor = self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker
+            )
+            self._pid = os.getpid()
+        for _ in range(self.workers):
+            executor.submit(warmup)
+        logger.info(f"Renderpool gestart met {self.workers} processen (pid {self._pid})")
+
+    def _discard(self, executor):
+        """Sluit een kapotte executor af; de volgende render start een nieuwe pool."""
+        with self._lock:
+            if self._executor is not executor:
+                # Al vervangen door een andere thread
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.error("Renderproces onverwacht gestopt, renderpool wordt opnieuw gestart")
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _finished(self, started, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None or future.result() is None:
+                self._counters['failed'] += 1
+            else:
+                self._counters['completed'] += 1
+                self._latencies.append(time.perf_counter() - started)
+
+    def render(self, fn, *args, on_late_result=None):
+        """
+        Voer fn(*args) uit in de pool en wacht maximaal timeout seconden.
+
+        Args:
+            fn: Picklebare functie op moduleniveau.
+            on_late_result (callable, optional): Wordt met het resultaat aangeroepen als de render na
+                een timeout alsnog slaagt (bijvoorbeeld om het in een cache te zetten).
+
+        Returns:
+            Het resultaat van fn, of None bij een timeout, een volle wachtrij of een fout.
+        """
+        if not self.workers:
+            started = time.perf_counter()
+            result = fn(*args)
+            with self._lock:
+                self._counters['submitted'] += 1
+                self._counters['completed' if result is not None else 'failed'] += 1
+                if result is not None:
+                    self._latencies.append(time.perf_counter() - started)
+            return result
+
+        self._ensure_started()
+        with self._lock:
+            if self._in_flight >= self.max_queue:
+                self._counters['rejected'] += 1
+                logger.warning(f"Renderpool vol ({self._in_flight} lopend), render geweigerd")
+                return None
+            self._in_flight += 1
+            self._counters['submitted'] += 1
+
+        started = time.perf_counter()
+        executor = self._executor
+        try:
+            if executor is None:
+                raise BrokenProcessPool('renderpool is afgesloten')
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                self._in_flight -= 1
+                self._counters['failed'] += 1
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._discard(executor)
+            logger.error(f"Render kon niet ingepland worden: {str(e)}")
+            return None
+        future.add_done_callback(lambda f: self._finished(started, f))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._count('timeouts')
+            logger.warning(f"Render duurde langer dan {self.timeout}s, terugvallen")
+            if on_late_result is not None:
+                future.add_done_callback(
+                    lambda f: not f.cancelled() and f.exception() is None and f.result() is not None
+                    and on_late_result(f.result())
+                )
+            return None
+        except BrokenProcessPool:
+            self._discard(executor)
+            return None
+        except Exception as e:
+            logger.error(f"Render mislukt: {str(e)}")
+            return None
+
+    def stats(self):
+        """Wachtrijdiepte, tellers en render-latency (ms) van de pool in dit proces."""
+        with self._lock:
+            last = self._latencies[-1] if self._latencies else None
+            latencies = sorted(self._latencies)
+            stats = {
+                'pid': os.getpid(),
+                'workers': self.workers,
+                'started': self._is_running() or not self.workers,
+                'queue_depth': self._in_flight,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                **self._counters
+            }
+        if latencies:
+            stats['latency_ms'] = {
+                'last': round(last * 1000, 1),
+                'mean': round(statistics.fmean(latencies) * 1000, 1),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                'samples': len(latencies)
+            }
+        else:
+            stats['latency_ms'] = None
+        return stats
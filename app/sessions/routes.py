@@ -1,15 +1,26 @@
+import re
 import uuid
-import json
 from datetime import timezone, datetime
 
+import sqlalchemy as sa
 from flask import jsonify, session, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
 
 from . import bp, logger
 from .. import db
-from ..decorators import owns_workout_plan, get_user_workout_plans, get_workout_data
+from ..decorators import owns_workout_plan, get_user_workout_plans, get_workout_data, invalidates_dashboard
 from ..forms import ActiveWorkoutForm
-from ..models import WorkoutPlan, WorkoutSession, WorkoutPlanExercise, SetLog, ExerciseLog
+from ..models import WorkoutPlan, WorkoutSession, WorkoutPlanExercise, SetLog, ExerciseLog, UserDailyActivity, Exercise, \
+    PersonalRecord
+from .services import SetLogService, SessionSyncService, SetValidationError
+
+COMPLETED_FIELD = re.compile(r'completed_(\d+)_(\d+)')
+
+# Bovengrens voor /save_sets zodat één verzoek geen onbegrensde upsert wordt
+MAX_SETS_PER_BATCH = 200
+
+# Bovengrens voor het aantal operaties per /<session_id>/sync
+MAX_SYNC_OPERATIONS = 500
 
 
 @bp.route('/start_workout/<int:plan_id>', methods=['GET'])
@@ -38,51 +49,10 @@ def start_workout(plan_id):
     # Sla session_id op in browser session voor tracking
     session['current_workout_session'] = session_id
 
-    # Haal oefeningen op met de bijbehorende Exercise objecten
-    exercises = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id).order_by(WorkoutPlanExercise.order).all()
-
-    # Parse images en instructions voor elke exercise
-    for wpe in exercises:
-        exercise = wpe.exercise
-
-        # Parse images
-        if exercise.images:
-            try:
-                if isinstance(exercise.images, str):
-                    images_list = json.loads(exercise.images)
-                else:
-                    images_list = exercise.images
-
-                # Fix image paths
-                fixed_images = []
-                for img in images_list:
-                    if img and img != 'img/exercises/default.jpg' and 'default.jpg' not in img:
-                        if img.startswith('img/exercises/'):
-                            fixed_images.append(img)
-                        elif img.startswith('img/'):
-                            fixed_images.append(img.replace('img/', 'img/exercises/'))
-                        else:
-                            fixed_images.append(f'img/exercises/{img}')
-
-                exercise.images_list = fixed_images if fixed_images else ['img/placeholder.png']
-            except (json.JSONDecodeError, TypeError) as e:
-                logger.warning(f"Failed to parse images for exercise {exercise.id}: {str(e)}")
-                exercise.images_list = ['img/placeholder.png']
-        else:
-            exercise.images_list = ['img/placeholder.png']
-
-        # Parse instructions
-        if exercise.instructions:
-            try:
-                if isinstance(exercise.instructions, str):
-                    exercise.instructions_list = json.loads(exercise.instructions)
-                else:
-                    exercise.instructions_list = exercise.instructions
-            except (json.JSONDecodeError, TypeError) as e:
-                logger.warning(f"Failed to parse instructions for exercise {exercise.id}: {str(e)}")
-                exercise.instructions_list = []
-        else:
-            exercise.instructions_list = []
+    # Haal oefeningen op met Exercise (join) en afbeeldingen (selectin), zonder lazy loads
+    exercises = WorkoutPlanExercise.query.options(
+        db.joinedload(WorkoutPlanExercise.exercise).selectinload(Exercise.image_records)
+    ).filter_by(workout_plan_id=plan_id).order_by(WorkoutPlanExercise.order).all()
 
     form = ActiveWorkoutForm()
     return render_template('active_workout.html',
@@ -94,6 +64,7 @@ def start_workout(plan_id):
 
 @bp.route('/save_workout/<int:plan_id>', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def save_workout(plan_id):
     """Sla een actieve workout op met set-logs - nu met cardio support"""
@@ -107,73 +78,53 @@ def save_workout(plan_id):
             logger.error("No active workout session found")
             return jsonify({'success': False, 'message': 'Geen actieve workout sessie gevonden.'}), 400
 
-        # Verwijder bestaande SetLogs om herschrijven mogelijk te maken
-        existing_logs = SetLog.query.filter_by(workout_session_id=session_id).all()
-        for log in existing_logs:
-            db.session.delete(log)
-
-        wpes = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id).all()
-        for wpe in wpes:
-            set_num = 0
-            while True:
-                completed_key = f'completed_{wpe.id}_{set_num}'
-                if completed_key not in request.form:
-                    break
-                if request.form.get(completed_key) == 'on':
-                    if wpe.exercise.is_cardio:
-                        logger.debug(f"Processing cardio exercise: {wpe.exercise.name}")
-                        duration_key = f'duration_{wpe.id}_{set_num}'
-                        distance_key = f'distance_{wpe.id}_{set_num}'
-                        duration = request.form.get(duration_key, type=float)
-                        distance = request.form.get(distance_key, type=float, default=0.0)
-
-                        if duration and duration > 0:
-                            log = SetLog(
-                                user_id=current_user.id,
-                                workout_plan_id=plan_id,
-                                exercise_id=wpe.exercise_id,
-                                workout_plan_exercise_id=wpe.id,
-                                workout_session_id=session_id,
-                                set_number=set_num,
-                                duration_minutes=duration,
-                                distance_km=distance,
-                                reps=1,
-                                weight=0.0,
-                                completed=True,
-                                completed_at=datetime.now(timezone.utc)
-                            )
-                            db.session.add(log)
-                    else:
-                        logger.debug(f"Processing strength exercise: {wpe.exercise.name}")
-                        reps_key = f'reps_{wpe.id}_{set_num}'
-                        weight_key = f'weight_{wpe.id}_{set_num}'
-                        reps = request.form.get(reps_key, type=float)
-                        weight = request.form.get(weight_key, type=float, default=0.0)
-
-                        if reps and reps > 0:
-                            log = SetLog(
-                                user_id=current_user.id,
-                                workout_plan_id=plan_id,
-                                exercise_id=wpe.exercise_id,
-                                workout_plan_exercise_id=wpe.id,
-                                workout_session_id=session_id,
-                                set_number=set_num,
-                                reps=reps,
-                                weight=weight,
-                                duration_minutes=None,
-                                distance_km=None,
-                                completed=True,
-                                completed_at=datetime.now(timezone.utc)
-                            )
-                            db.session.add(log)
-                set_num += 1
+        # Een al voltooide sessie wordt opnieuw opgeteld in de dag-rollup
+        workout_session = WorkoutSession.query.get(session_id)
+        if workout_session:
+            UserDailyActivity.record_session(workout_session, sign=-1)
+
+        # Lees alle voltooide sets in één keer uit het formulier: completed_<wpe_id>_<set_num>
+        completed_sets = []
+        for key in request.form:
+            match = COMPLETED_FIELD.fullmatch(key)
+            if match and request.form.get(key) == 'on':
+                completed_sets.append((int(match.group(1)), int(match.group(2))))
+
+        wpes = {wpe.id: wpe for wpe in WorkoutPlanExercise.query.options(
+            db.joinedload(WorkoutPlanExercise.exercise)
+        ).filter_by(workout_plan_id=plan_id)}
+
+        now = datetime.now(timezone.utc)
+        desired_rows = []
+        for wpe_id, set_num in sorted(completed_sets):
+            wpe = wpes.get(wpe_id)
+            if wpe is None:
+                continue
+            if wpe.exercise.is_cardio:
+                duration = request.form.get(f'duration_{wpe_id}_{set_num}', type=float)
+                distance = request.form.get(f'distance_{wpe_id}_{set_num}', type=float, default=0.0)
+                if not duration or duration <= 0:
+                    continue
+                values = {'duration_minutes': duration, 'distance_km': distance}
+            else:
+                reps = request.form.get(f'reps_{wpe_id}_{set_num}', type=float)
+                weight = request.form.get(f'weight_{wpe_id}_{set_num}', type=float, default=0.0)
+                if not reps or reps <= 0:
+                    continue
+                values = {'reps': reps, 'weight': weight}
+            desired_rows.append(SetLogService.build_row(
+                wpe, dict(values, set_number=set_num, completed=True), current_user.id, session_id, now
+            ))
 
-        db.session.commit()
+        # Alleen gewijzigde sets schrijven; ongewijzigde rijen behouden id en tijdstempels
+        changes = SetLogService.sync_session_sets(session_id, desired_rows)
+        logger.debug(f"save_workout diff voor sessie {session_id}: {changes}")
+
+        db.session.flush()
 
-        workout_session = WorkoutSession.query.get(session_id)
         if workout_session:
-            workout_session.calculate_statistics()
-            db.session.commit()
+            UserDailyActivity.record_session(workout_session)
+        db.session.commit()
 
         return jsonify({'success': True, 'message': 'Workout succesvol opgeslagen!'})
 
@@ -185,6 +136,7 @@ def save_workout(plan_id):
 
 @bp.route('/save_set', methods=['POST'])
 @login_required
+@invalidates_dashboard
 def save_set():
     """Sla een individuele set op tijdens een actieve workout - nu met cardio support"""
     data = request.get_json()
@@ -210,7 +162,10 @@ def save_set():
             workout_plan_exercise_id=wpe_id,
             set_number=set_number,
             workout_session_id=session_id
-        ).first()
+        ).with_for_update().first()
+        old_contribution = WorkoutSession.set_contribution(
+            existing_set.completed, existing_set.reps, existing_set.weight
+        ) if existing_set else (0, 0, 0.0)
 
         if wpe.exercise.is_cardio:
             logger.debug(f"Saving cardio set for {wpe.exercise.name}")
@@ -279,6 +234,13 @@ def save_set():
                 )
                 db.session.add(set_log)
 
+        # Lopende sessietotalen bijwerken met het verschil voor deze set
+        new_contribution = WorkoutSession.set_contribution(set_log.completed, set_log.reps, set_log.weight)
+        WorkoutSession.apply_totals_delta(
+            session_id, *(after - before for after, before in zip(new_contribution, old_contribution))
+        )
+        new_records = PersonalRecord.apply_sets(current_user.id, [set_log])
+
         db.session.commit()
 
         return jsonify({
@@ -287,6 +249,7 @@ def save_set():
             'set_id': set_log.id,
             'is_cardio': wpe.exercise.is_cardio,
             'exercise_category': wpe.exercise.category.value,
+            'new_records': [record['kind'] for record in new_records],
             "status": "Set saved"
         })
 
@@ -296,8 +259,130 @@ def save_set():
         return jsonify({'success': False, 'message': f'Error saving set: {str(e)}'}), 500
 
 
+@bp.route('/save_sets', methods=['POST'])
+@login_required
+@invalidates_dashboard
+def save_sets():
+    """
+    Sla meerdere sets van één sessie in één keer op.
+
+    Verwacht JSON: {"session_id": "...", "sets": [{"wpe_id", "set_number", "completed",
+    "reps", "weight" | "duration_minutes", "distance_km"}, ...]}.
+    Eigendom wordt één keer gecontroleerd, alle sets gaan in één upsert en één commit.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('sets')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'Missing required data'}), 400
+    if len(items) > MAX_SETS_PER_BATCH:
+        return jsonify({'success': False, 'message': f'Maximaal {MAX_SETS_PER_BATCH} sets per verzoek'}), 400
+
+    session_id = data.get('session_id') or session.get('current_workout_session')
+    if not session_id:
+        return jsonify({'success': False, 'message': 'No active workout session'}), 400
+
+    workout_session = db.session.get(WorkoutSession, session_id)
+    if not workout_session or workout_session.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    try:
+        written = SetLogService.save_sets(workout_session, items, current_user.id)
+        db.session.commit()
+    except SetValidationError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e), 'index': e.index}), 400
+    except PermissionError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 403
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving sets: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error saving sets: {str(e)}'}), 500
+
+    return jsonify({
+        'success': True,
+        'message': f'{len(written)} sets saved',
+        'sets': [{'set_id': set_id, 'wpe_id': wpe_id, 'set_number': set_number}
+                 for set_id, wpe_id, set_number in written]
+    })
+
+
+@bp.route('/<session_id>/sync', methods=['POST'])
+@login_required
+@invalidates_dashboard
+def sync_session(session_id):
+    """
+    Offline sync: pas een geordende lijst set-operaties precies één keer toe.
+
+    Verwacht JSON: {"cursor": <laatst geziene server-cursor>, "operations": [{"key": "<idempotency key>",
+    "op": "set" | "delete", "wpe_id", "set_number", ...setwaarden}, ...]}.
+    Al toegepaste keys worden opnieuw bevestigd maar niet opnieuw uitgevoerd, dus de client mag
+    een batch na een netwerkfout gewoon opnieuw versturen.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations', [])
+    if not isinstance(operations, list):
+        return jsonify({'success': False, 'message': 'Missing required data'}), 400
+    if len(operations) > MAX_SYNC_OPERATIONS:
+        return jsonify({'success': False, 'message': f'Maximaal {MAX_SYNC_OPERATIONS} operaties per verzoek'}), 400
+    cursor = data.get('cursor')
+    if cursor is not None and (not isinstance(cursor, int) or isinstance(cursor, bool) or cursor < 0):
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    workout_session = db.session.get(WorkoutSession, session_id)
+    if not workout_session or workout_session.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+    # Een gelijktijdige sync met dezelfde keys kan op de unieke key botsen; de herhaling ziet ze als duplicaat
+    for attempt in range(2):
+        try:
+            result = SessionSyncService.sync(workout_session, operations, current_user.id, cursor)
+            db.session.commit()
+            break
+        except SetValidationError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e), 'index': e.index}), 400
+        except PermissionError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 403
+        except sa.exc.IntegrityError as e:
+            db.session.rollback()
+            if attempt:
+                logger.error(f"Error syncing session {session_id}: {str(e)}")
+                return jsonify({'success': False, 'message': 'Sync conflict, please retry'}), 409
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error syncing session {session_id}: {str(e)}")
+            return jsonify({'success': False, 'message': f'Error syncing session: {str(e)}'}), 500
+
+    return jsonify({'success': True, **result})
+
+
+@bp.route('/<session_id>/stats', methods=['GET'])
+@login_required
+def session_stats(session_id):
+    """Live statistieken van een sessie uit de lopende totalen (één rij lezen)."""
+    row = db.session.execute(
+        sa.select(WorkoutSession.total_sets, WorkoutSession.total_reps, WorkoutSession.total_weight,
+                  WorkoutSession.is_completed).where(
+            WorkoutSession.id == session_id,
+            WorkoutSession.user_id == current_user.id
+        )
+    ).first()
+    if row is None:
+        return jsonify({'success': False, 'message': 'Workout session not found'}), 404
+    return jsonify({
+        'success': True,
+        'total_sets': row.total_sets or 0,
+        'total_reps': row.total_reps or 0,
+        'total_weight': row.total_weight or 0.0,
+        'is_completed': row.is_completed
+    })
+
+
 @bp.route('/complete_workout/<int:plan_id>', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def complete_workout(plan_id):
     logger.debug(f"Attempting to complete workout for plan_id={plan_id}, user_id={current_user.id}")
@@ -312,37 +397,28 @@ def complete_workout(plan_id):
             logger.error(f"Unauthorized: session_user_id={workout_session.user_id}, current_user_id={current_user.id}")
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
 
+        # Nogmaals voltooien mag de dag-rollup niet dubbel tellen
+        UserDailyActivity.record_session(workout_session, sign=-1)
+
         workout_session.completed_at = datetime.now(timezone.utc)
         workout_session.is_completed = True
-        workout_session.calculate_statistics()
-
-        completed_sets = SetLog.query.filter_by(
-            workout_session_id=session_id,
-            completed=True
-        ).all()
-
-        exercise_groups = {}
-        for set_log in completed_sets:
-            exercise_id = set_log.exercise_id
-            if exercise_id not in exercise_groups:
-                exercise_groups[exercise_id] = []
-            exercise_groups[exercise_id].append(set_log)
-
-        for exercise_id, sets in exercise_groups.items():
-            if sets:
-                avg_reps = sum(s.reps for s in sets) / len(sets)
-                avg_weight = sum(s.weight for s in sets) / len(sets)
-                exercise_log = ExerciseLog(
-                    user_id=current_user.id,
-                    exercise_id=exercise_id,
-                    workout_plan_id=plan_id,
-                    sets=len(sets),
-                    reps=avg_reps,
-                    weight=avg_weight,
-                    completed=True,
-                    completed_at=datetime.now(timezone.utc)
-                )
-                db.session.add(exercise_log)
+        # Totalen worden per set bijgehouden; hier alleen de duur. Het aggregaat voedt de ExerciseLogs.
+        workout_session.calculate_duration()
+        UserDailyActivity.record_session(workout_session)
+        exercise_stats = workout_session.exercise_stats()
+
+        if exercise_stats:
+            completed_at = datetime.now(timezone.utc)
+            db.session.execute(sa.insert(ExerciseLog), [{
+                'user_id': current_user.id,
+                'exercise_id': row.exercise_id,
+                'workout_plan_id': plan_id,
+                'sets': row.sets,
+                'reps': row.avg_reps,
+                'weight': row.avg_weight,
+                'completed': True,
+                'completed_at': completed_at
+            } for row in exercise_stats])
 
         db.session.commit()
         session.pop('current_workout_session', None)
@@ -0,0 +1,418 @@
+from datetime import datetime, timezone
+import logging
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import WorkoutPlan, WorkoutPlanExercise, WorkoutSession, SetLog, SetOperation, PersonalRecord
+
+logger = logging.getLogger(__name__)
+
+
+class SetValidationError(ValueError):
+    """Ongeldige set in een batch; index verwijst naar de positie in de payload."""
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+
+class SetLogService:
+    # Kolommen die save_workout vergelijkt om te bepalen of een bestaande set gewijzigd is
+    DIFF_FIELDS = ('reps', 'weight', 'duration_minutes', 'distance_km', 'exercise_id', 'workout_plan_id')
+
+    @staticmethod
+    def totals(rows):
+        """Som van de bijdragen van sets aan de sessietotalen: [sets, reps, volume]."""
+        totals = [0, 0, 0.0]
+        for row in rows:
+            if isinstance(row, dict):
+                contribution = WorkoutSession.set_contribution(row['completed'], row['reps'], row['weight'])
+            else:
+                contribution = WorkoutSession.set_contribution(row.completed, row.reps, row.weight)
+            for i, value in enumerate(contribution):
+                totals[i] += value
+        return totals
+
+    @staticmethod
+    def apply_delta(session_id, old_rows, new_rows):
+        """Werk de lopende sessietotalen bij met het verschil tussen oude en nieuwe sets."""
+        old, new = SetLogService.totals(old_rows), SetLogService.totals(new_rows)
+        WorkoutSession.apply_totals_delta(
+            session_id, sets=new[0] - old[0], reps=new[1] - old[1], volume=new[2] - old[2]
+        )
+
+    @staticmethod
+    def load_plan_exercises(wpe_ids, user_id):
+        """
+        Load WorkoutPlanExercises with their exercise in one query and check ownership once.
+
+        Returns:
+            dict: {wpe_id: WorkoutPlanExercise}
+
+        Raises:
+            PermissionError: If any of the ids does not exist or belongs to another user.
+        """
+        wpe_ids = set(wpe_ids)
+        wpes = WorkoutPlanExercise.query.options(
+            db.joinedload(WorkoutPlanExercise.exercise)
+        ).join(
+            WorkoutPlan, WorkoutPlan.id == WorkoutPlanExercise.workout_plan_id
+        ).filter(
+            WorkoutPlanExercise.id.in_(wpe_ids),
+            WorkoutPlan.user_id == user_id
+        ).all()
+        by_id = {wpe.id: wpe for wpe in wpes}
+        if len(by_id) != len(wpe_ids):
+            raise PermissionError('Unauthorized')
+        return by_id
+
+    @staticmethod
+    def build_row(wpe, data, user_id, session_id, now=None):
+        """
+        Build the SetLog column values for one set update (cardio or strength).
+
+        Raises:
+            SetValidationError: If required values for a completed set are missing.
+        """
+        now = now or datetime.now(timezone.utc)
+        completed = bool(data.get('completed', False))
+        row = {
+            'user_id': user_id,
+            'workout_plan_id': wpe.workout_plan_id,
+            'exercise_id': wpe.exercise_id,
+            'workout_plan_exercise_id': wpe.id,
+            'workout_session_id': session_id,
+            'set_number': int(data['set_number']),
+            'completed': completed,
+            'created_at': now,
+            'completed_at': now if completed else None,
+        }
+
+        if wpe.exercise.is_cardio:
+            duration_minutes = data.get('duration_minutes')
+            if not duration_minutes and completed:
+                raise SetValidationError('Duration is required for cardio exercises')
+            row.update(duration_minutes=duration_minutes, distance_km=data.get('distance_km', 0.0),
+                       reps=1, weight=0.0)
+        else:
+            reps = data.get('reps')
+            if not reps and completed:
+                raise SetValidationError('Reps are required for strength exercises')
+            row.update(reps=reps or 0, weight=data.get('weight', 0.0) or 0.0,
+                       duration_minutes=None, distance_km=None)
+        return row
+
+    @staticmethod
+    def build_rows(workout_session, items, user_id):
+        """
+        Validate set updates and build their SetLog rows with one ownership query.
+
+        Args:
+            workout_session (WorkoutSession): Session the sets belong to (already ownership-checked).
+            items (list): Dicts with wpe_id, set_number, completed and reps/weight or duration/distance.
+            user_id (int): Current user.
+
+        Returns:
+            list: Column dicts (see build_row), in the order of items.
+
+        Raises:
+            SetValidationError: If an item is invalid; index points to the item.
+            PermissionError: If an exercise belongs to another user or another plan.
+        """
+        wpe_ids = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('wpe_id') or item.get('set_number') is None:
+                raise SetValidationError('Missing required data', index)
+            try:
+                wpe_ids.append(int(item['wpe_id']))
+            except (TypeError, ValueError):
+                raise SetValidationError('Invalid wpe_id', index)
+
+        wpes = SetLogService.load_plan_exercises(wpe_ids, user_id)
+        if any(wpe.workout_plan_id != workout_session.workout_plan_id for wpe in wpes.values()):
+            raise PermissionError('Exercise does not belong to this workout session')
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for index, item in enumerate(items):
+            try:
+                rows.append(SetLogService.build_row(
+                    wpes[wpe_ids[index]], item, user_id, workout_session.id, now
+                ))
+            except SetValidationError as e:
+                e.index = index
+                raise
+            except (TypeError, ValueError):
+                raise SetValidationError('Invalid set data', index)
+        return rows
+
+    @staticmethod
+    def write_sets(session_id, rows, delete_keys=()):
+        """
+        Upsert rows and delete sets by (wpe_id, set_number), keeping the session totals and
+        personal records in step.
+
+        Returns:
+            list: [(set_id, wpe_id, set_number), ...] of the upserted sets.
+
+        Notities:
+            - Duplicate keys in rows: the last one wins, just like in SetLog.upsert_many.
+            - A key in both rows and delete_keys is written; the caller decides which operation was last.
+        """
+        # Huidige waarden van de te overschrijven sets (vergrendeld op PostgreSQL) voor de totalen-delta
+        final_rows = {(row['workout_plan_exercise_id'], row['set_number']): row for row in rows}
+        delete_keys = set(delete_keys) - set(final_rows)
+        keys = set(final_rows) | delete_keys
+        if not keys:
+            return []
+        existing = [
+            row for row in db.session.execute(
+                sa.select(SetLog.id, SetLog.workout_plan_exercise_id, SetLog.set_number,
+                          SetLog.completed, SetLog.reps, SetLog.weight).where(
+                    SetLog.workout_session_id == session_id,
+                    SetLog.workout_plan_exercise_id.in_({wpe_id for wpe_id, _ in keys})
+                ).with_for_update()
+            ) if (row.workout_plan_exercise_id, row.set_number) in keys
+        ]
+
+        written = SetLog.upsert_many(list(final_rows.values()))
+        delete_ids = [row.id for row in existing if (row.workout_plan_exercise_id, row.set_number) in delete_keys]
+        if delete_ids:
+            db.session.execute(
+                sa.delete(SetLog).where(SetLog.id.in_(delete_ids)).execution_options(synchronize_session=False)
+            )
+        SetLogService.apply_delta(session_id, existing, final_rows.values())
+        written_rows = list(final_rows.values())
+        if written_rows:
+            PersonalRecord.apply_sets(written_rows[0]['user_id'], written_rows)
+        return written
+
+    @staticmethod
+    def save_sets(workout_session, items, user_id):
+        """
+        Save many set updates for one session: one ownership query, one upsert, no commit.
+        The running session totals are updated with the delta of the overwritten sets.
+
+        Args:
+            workout_session (WorkoutSession): Session the sets belong to (already ownership-checked).
+            items (list): Dicts with wpe_id, set_number, completed and reps/weight or duration/distance.
+            user_id (int): Current user.
+
+        Returns:
+            list: [(set_id, wpe_id, set_number), ...]
+        """
+        rows = SetLogService.build_rows(workout_session, items, user_id)
+        return SetLogService.write_sets(workout_session.id, rows)
+
+    @staticmethod
+    def sync_session_sets(session_id, desired_rows):
+        """
+        Make the SetLogs of a session match desired_rows with a minimal diff.
+
+        Args:
+            session_id (str): WorkoutSession id being saved.
+            desired_rows (list): Column dicts (see build_row) for every set that should exist.
+
+        Returns:
+            dict: Number of inserted, updated, deleted and unchanged sets.
+
+        Notities:
+            - Unchanged sets are not touched, so ids, created_at and completed_at stay the same.
+            - At most one bulk INSERT, one bulk UPDATE (by primary key) and one DELETE.
+            - The running session totals are adjusted by the difference between old and new sets.
+            - Inserted and changed sets are checked against the personal records.
+        """
+        columns = (SetLog.id, SetLog.workout_plan_exercise_id, SetLog.set_number, SetLog.completed) + tuple(
+            getattr(SetLog, name) for name in SetLogService.DIFF_FIELDS
+        )
+        all_existing = db.session.execute(
+            sa.select(*columns).where(SetLog.workout_session_id == session_id).with_for_update()
+        ).all()
+        existing = {(row.workout_plan_exercise_id, row.set_number): row for row in all_existing}
+
+        inserts, updates, changed_rows = [], [], []
+        unchanged = 0
+        for row in desired_rows:
+            current = existing.pop((row['workout_plan_exercise_id'], row['set_number']), None)
+            if current is None:
+                inserts.append(row)
+                continue
+            changes = {name: row[name] for name in SetLogService.DIFF_FIELDS
+                       if not SetLogService._same(getattr(current, name), row[name])}
+            if current.completed != row['completed']:
+                changes['completed'] = row['completed']
+                changes['completed_at'] = row['completed_at']
+            if changes:
+                updates.append({'id': current.id, **changes})
+                changed_rows.append(row)
+            else:
+                unchanged += 1
+        delete_ids = [row.id for row in existing.values()]
+
+        if inserts:
+            db.session.execute(sa.insert(SetLog), inserts)
+        if updates:
+            db.session.execute(sa.update(SetLog), updates)
+        if delete_ids:
+            db.session.execute(
+                sa.delete(SetLog).where(SetLog.id.in_(delete_ids)).execution_options(synchronize_session=False)
+            )
+
+        SetLogService.apply_delta(session_id, all_existing, desired_rows)
+        written_rows = inserts + changed_rows
+        if written_rows:
+            PersonalRecord.apply_sets(written_rows[0]['user_id'], written_rows)
+
+        return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(delete_ids), 'unchanged': unchanged}
+
+    @staticmethod
+    def _same(old, new):
+        """Compare stored and submitted values; numbers are compared as floats (form values are floats)."""
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            return float(old) == float(new)
+        return old == new
+
+
+class SessionSyncService:
+    """
+    Offline-first sync of set operations for one WorkoutSession.
+
+    Notities:
+        - The client queues operations locally, each with its own idempotency key, and flushes them in order.
+        - Keys that were already applied are acknowledged again but never re-applied, so retries are safe.
+        - The id of the last SetOperation is the server cursor; the client sends it back on the next sync.
+    """
+
+    MAX_KEY_LENGTH = 64
+
+    @staticmethod
+    def sync(workout_session, operations, user_id, cursor=None):
+        """
+        Apply an ordered log of set operations exactly once, in bulk, without committing.
+
+        Args:
+            workout_session (WorkoutSession): Session the operations belong to (already ownership-checked).
+            operations (list): Dicts with key, op ('set' or 'delete'), wpe_id, set_number and,
+                for 'set', the set values (see SetLogService.build_row).
+            user_id (int): Current user.
+            cursor (int, optional): Last server cursor the client has seen.
+
+        Returns:
+            dict: applied and duplicate keys, the new cursor and the current state of every set
+                  changed after the client's cursor (also by other devices).
+
+        Raises:
+            SetValidationError: If an operation is invalid; index points to the operation.
+            PermissionError: If an exercise belongs to another user or another plan.
+        """
+        for index, item in enumerate(operations):
+            if not isinstance(item, dict):
+                raise SetValidationError('Missing required data', index)
+            key = item.get('key')
+            if not isinstance(key, str) or not key or len(key) > SessionSyncService.MAX_KEY_LENGTH:
+                raise SetValidationError('Invalid operation key', index)
+            if item.get('op', 'set') not in SetOperation.OPS:
+                raise SetValidationError('Unknown operation', index)
+
+        # Gelijktijdige syncs van dezelfde sessie na elkaar afhandelen (rijlock op PostgreSQL)
+        db.session.execute(
+            sa.select(WorkoutSession.id).where(WorkoutSession.id == workout_session.id).with_for_update()
+        )
+        seen = set(db.session.scalars(
+            sa.select(SetOperation.op_key).where(
+                SetOperation.workout_session_id == workout_session.id,
+                SetOperation.op_key.in_({item['key'] for item in operations})
+            )
+        ))
+
+        pending, positions, duplicates = [], [], []
+        for index, item in enumerate(operations):
+            if item['key'] in seen:
+                duplicates.append(item['key'])
+                continue
+            seen.add(item['key'])
+            pending.append(item)
+            positions.append(index)
+
+        if pending:
+            try:
+                rows = SetLogService.build_rows(workout_session, pending, user_id)
+            except SetValidationError as e:
+                if e.index is not None:
+                    e.index = positions[e.index]
+                raise
+
+            # In volgorde afspelen: per set telt alleen de laatste operatie
+            final = {}
+            for item, row in zip(pending, rows):
+                final[(row['workout_plan_exercise_id'], row['set_number'])] = row if item.get('op', 'set') == 'set' else None
+            written = SetLogService.write_sets(
+                workout_session.id,
+                [row for row in final.values() if row is not None],
+                [key for key, row in final.items() if row is None]
+            )
+            set_ids = {(wpe_id, set_number): set_id for set_id, wpe_id, set_number in written}
+
+            now = datetime.now(timezone.utc)
+            db.session.execute(sa.insert(SetOperation), [{
+                'workout_session_id': workout_session.id,
+                'user_id': user_id,
+                'op_key': item['key'],
+                'op': item.get('op', 'set'),
+                'workout_plan_exercise_id': row['workout_plan_exercise_id'],
+                'set_number': row['set_number'],
+                'set_log_id': set_ids.get((row['workout_plan_exercise_id'], row['set_number']))
+                if item.get('op', 'set') == 'set' else None,
+                'applied_at': now,
+            } for item, row in zip(pending, rows)])
+
+        new_cursor = db.session.scalar(
+            sa.select(db.func.max(SetOperation.id)).where(SetOperation.workout_session_id == workout_session.id)
+        ) or 0
+
+        return {
+            'applied': [item['key'] for item in pending],
+            'duplicates': duplicates,
+            'cursor': new_cursor,
+            'changes': SessionSyncService.changes_since(workout_session.id, cursor or 0),
+        }
+
+    @staticmethod
+    def changes_since(session_id, cursor):
+        """
+        Current state of every set touched by an operation after cursor, in two queries.
+
+        Returns:
+            list: Dicts with wpe_id, set_number and deleted, plus the set values if the set still exists.
+        """
+        keys = db.session.execute(
+            sa.select(SetOperation.workout_plan_exercise_id, SetOperation.set_number).where(
+                SetOperation.workout_session_id == session_id,
+                SetOperation.id > cursor
+            ).distinct()
+        ).all()
+        if not keys:
+            return []
+
+        current = {
+            (set_log.workout_plan_exercise_id, set_log.set_number): set_log
+            for set_log in db.session.execute(
+                sa.select(SetLog.id, SetLog.workout_plan_exercise_id, SetLog.set_number, SetLog.completed,
+                          SetLog.reps, SetLog.weight, SetLog.duration_minutes, SetLog.distance_km).where(
+                    SetLog.workout_session_id == session_id,
+                    SetLog.workout_plan_exercise_id.in_({wpe_id for wpe_id, _ in keys})
+                )
+            )
+        }
+
+        changes = []
+        for wpe_id, set_number in sorted(keys, key=lambda key: (key[0] or 0, key[1])):
+            set_log = current.get((wpe_id, set_number))
+            change = {'wpe_id': wpe_id, 'set_number': set_number, 'deleted': set_log is None}
+            if set_log is not None:
+                change.update(set_id=set_log.id, completed=set_log.completed, reps=set_log.reps,
+                              weight=set_log.weight, duration_minutes=set_log.duration_minutes,
+                              distance_km=set_log.distance_km)
+            changes.append(change)
+        return changes
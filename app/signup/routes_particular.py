@@ -3,6 +3,7 @@ from flask import render_template, redirect, url_for, flash, request
 from . import signup_bp
 from flask_login import current_user, login_required
 from app import db
+from app.decorators import invalidates_dashboard
 from app.models import WeightLog
 import logging
 
@@ -11,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 @signup_bp.route('/particular', methods=['GET', 'POST'])
 @login_required
+@invalidates_dashboard
 def signup_particular():
     """Registratie proces voor normale gebruikers"""
 
@@ -0,0 +1,337 @@
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from app.models import Exercise, ExerciseMuscle, exercise_muscle_association
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Minimale fractie van de trigrammen uit de zoekterm die in de naam moet voorkomen
+SIMILARITY_THRESHOLD = 0.5
+
+# Kortere zoektermen worden alleen als prefix gematcht; trigrammen zeggen daar te weinig
+MIN_FUZZY_LENGTH = 3
+
+# Facetten die als bitset worden bijgehouden, met het bijbehorende Exercise-attribuut
+FACETS = {
+    'difficulty': 'level',
+    'category': 'category',
+    'equipment': 'equipment',
+    'mechanic': 'mechanic',
+    'force': 'force',
+}
+
+
+def tokenize(text):
+    """Splits tekst in lowercase alfanumerieke tokens."""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(text):
+    """
+    Trigrammen van een tekst, in de stijl van pg_trgm.
+
+    Notities:
+        - Elk token wordt opgevuld als '  token ', zodat begin en einde van woorden meetellen.
+        - De aaneengeschreven vorm wordt ook meegenomen, zodat 'benchpress' 'Bench Press' vindt.
+    """
+    tokens = tokenize(text)
+    words = tokens + [''.join(tokens)] if len(tokens) > 1 else tokens
+    grams = set()
+    for word in words:
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def enum_key(value):
+    """Normaliseer een enum-waarde naar de naam die de zoekformulieren gebruiken (bv. 'BEGINNER')."""
+    if value is None:
+        return None
+    return getattr(value, 'name', str(value).upper())
+
+
+def iter_bits(bits):
+    """Geef de posities van alle gezette bits terug, van laag naar hoog."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class CatalogPage:
+    """
+    Eén pagina zoekresultaten, compatibel met de velden van Flask-SQLAlchemy's Pagination
+    die de templates gebruiken.
+    """
+
+    def __init__(self, ids, page, per_page, total, facets):
+        self.ids = ids
+        self.items = []
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.facets = facets
+
+    @property
+    def pages(self):
+        return math.ceil(self.total / self.per_page) if self.per_page else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+
+class CatalogIndex:
+    """
+    Onveranderlijke in-memory index over de oefeningencatalogus.
+
+    Notities:
+        - Documenten krijgen een positie in alfabetische volgorde; resultaten zijn dus al gesorteerd.
+        - Per token een posting-bitset (Python int), per facetwaarde en spiergroep ook een bitset.
+        - Tokens uit de zoekterm matchen als prefix, zodat zoeken per toetsaanslag werkt.
+        - Daarnaast trigram-postings voor typo-tolerant zoeken met een similarity-score.
+    """
+
+    def __init__(self, rows, muscles):
+        self.ids = []
+        self.names = []
+        self.postings = {}
+        self.trigram_postings = {}
+        self.trigram_counts = []
+        self.by_name = {}
+        self.facets = {facet: {} for facet in FACETS}
+        self.facets['muscle'] = {}
+
+        position = {}
+        for doc, row in enumerate(sorted(rows, key=lambda r: ((r.name or '').lower(), r.id))):
+            bit = 1 << doc
+            self.ids.append(row.id)
+            self.names.append(row.name)
+            position[row.id] = doc
+            self.by_name.setdefault((row.name or '').strip().lower(), doc)
+            for token in set(tokenize(row.name)):
+                self.postings[token] = self.postings.get(token, 0) | bit
+            grams = trigrams(row.name)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_postings.setdefault(gram, []).append(doc)
+            for facet, attribute in FACETS.items():
+                key = enum_key(getattr(row, attribute))
+                if key is not None:
+                    self.facets[facet][key] = self.facets[facet].get(key, 0) | bit
+
+        for exercise_id, muscle in muscles:
+            doc = position.get(exercise_id)
+            if doc is not None:
+                key = enum_key(muscle)
+                self.facets['muscle'][key] = self.facets['muscle'].get(key, 0) | (1 << doc)
+
+        self.vocabulary = sorted(self.postings)
+        self.all_bits = (1 << len(self.ids)) - 1
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls):
+        """Bouw de index met twee queries: oefeningen en spier-koppelingen."""
+        rows = db.session.query(
+            Exercise.id, Exercise.name, Exercise.level, Exercise.category,
+            Exercise.equipment, Exercise.mechanic, Exercise.force
+        ).all()
+        muscles = db.session.query(
+            exercise_muscle_association.c.exercise_id, ExerciseMuscle.muscle
+        ).join(
+            ExerciseMuscle, ExerciseMuscle.id == exercise_muscle_association.c.muscle_id
+        ).all()
+        index = cls(rows, muscles)
+        logger.info(f"Oefeningencatalogus geïndexeerd: {len(index.ids)} oefeningen, {len(index.vocabulary)} tokens")
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def match_text(self, search_term):
+        """Bitset van oefeningen waarvan de naam alle tokens (als prefix) bevat."""
+        bits = self.all_bits
+        for token in set(tokenize(search_term)):
+            token_bits = 0
+            start = bisect.bisect_left(self.vocabulary, token)
+            for candidate in self.vocabulary[start:]:
+                if not candidate.startswith(token):
+                    break
+                token_bits |= self.postings[candidate]
+            bits &= token_bits
+            if not bits:
+                break
+        return bits
+
+    def rank(self, search_term, threshold=SIMILARITY_THRESHOLD):
+        """
+        Rangschik oefeningen op gelijkenis met de zoekterm.
+
+        Returns:
+            list: [(doc, score), ...] met de beste match eerst.
+
+        Notities:
+            - Score = fractie van de trigrammen uit de zoekterm die in de naam voorkomen.
+            - Prefix-matches op alle tokens krijgen +1, zodat exacte treffers altijd bovenaan staan.
+            - Bij gelijke score wint de kortere naam (minder overbodige trigrammen), daarna alfabetisch.
+        """
+        prefix_bits = self.match_text(search_term)
+        scores = {doc: 1.0 for doc in iter_bits(prefix_bits)}
+
+        grams = trigrams(search_term)
+        if len(''.join(tokenize(search_term))) >= MIN_FUZZY_LENGTH and grams:
+            hits = {}
+            for gram in grams:
+                for doc in self.trigram_postings.get(gram, ()):
+                    hits[doc] = hits.get(doc, 0) + 1
+            for doc, count in hits.items():
+                score = count / len(grams)
+                if doc in scores:
+                    scores[doc] += score
+                elif score >= threshold:
+                    scores[doc] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (
+            -item[1], self.trigram_counts[item[0]], item[0]
+        ))
+        return ranked
+
+    def best_match(self, name, threshold=SIMILARITY_THRESHOLD):
+        """Beste oefening-id voor een naam: eerst exact (hoofdletterongevoelig), anders de hoogste score."""
+        doc = self.by_name.get((name or '').strip().lower())
+        if doc is None:
+            ranked = self.rank(name, threshold)
+            if not ranked:
+                return None
+            doc = ranked[0][0]
+        return self.ids[doc]
+
+    def first_containing(self, text):
+        """Eerste oefening-id (alfabetisch) waarvan de naam de hele tekst bevat, hoofdletterongevoelig."""
+        needle = (text or '').strip().lower()
+        if not needle:
+            return None
+        for doc in iter_bits(self.match_text(needle)):
+            if needle in (self.names[doc] or '').lower():
+                return self.ids[doc]
+        return None
+
+    def _facet_bits(self, facet, value):
+        """Bitset voor één facetwaarde; onbekende waarden matchen niets."""
+        return self.facets[facet].get(enum_key(value), 0)
+
+    def search(self, search_term=None, page=1, per_page=10, threshold=SIMILARITY_THRESHOLD, **filters):
+        """
+        Zoek in de catalogus.
+
+        Args:
+            search_term (str): Vrije tekst, typo-tolerant gematcht op de naam.
+            page (int): Paginanummer (1-based).
+            per_page (int): Resultaten per pagina.
+            threshold (float): Minimale trigram-similarity voor fuzzy matches.
+            **filters: Facetfilters (difficulty, category, equipment, mechanic, force, muscle).
+
+        Returns:
+            CatalogPage: ids van de gevraagde pagina, totaal en facet-tellingen.
+
+        Notities:
+            - Met zoekterm zijn de resultaten op relevantie gesorteerd, anders alfabetisch.
+            - De tellingen per facet negeren het eigen filter, zodat alternatieven zichtbaar blijven.
+        """
+        ranked = None
+        if search_term and tokenize(search_term):
+            ranked = [doc for doc, _ in self.rank(search_term, threshold)]
+            text_bits = 0
+            for doc in ranked:
+                text_bits |= 1 << doc
+        else:
+            text_bits = self.all_bits
+        active = {facet: self._facet_bits(facet, value)
+                  for facet, value in filters.items() if facet in self.facets and value}
+
+        bits = text_bits
+        for facet_bits in active.values():
+            bits &= facet_bits
+
+        facet_counts = {}
+        for facet, values in self.facets.items():
+            base = text_bits
+            for other, facet_bits in active.items():
+                if other != facet:
+                    base &= facet_bits
+            facet_counts[facet] = {key: (base & value_bits).bit_count()
+                                   for key, value_bits in values.items() if base & value_bits}
+
+        page = max(page, 1)
+        offset = (page - 1) * per_page
+        if ranked is not None:
+            docs = [doc for doc in ranked if bits >> doc & 1][offset:offset + per_page]
+        else:
+            docs = []
+            for position, doc in enumerate(iter_bits(bits)):
+                if position >= offset + per_page:
+                    break
+                if position >= offset:
+                    docs.append(doc)
+        ids = [self.ids[doc] for doc in docs]
+
+        return CatalogPage(ids, page, per_page, bits.bit_count(), facet_counts)
+
+
+class ExerciseCatalog:
+    """
+    Proces-lokale houder van de CatalogIndex.
+
+    Notities:
+        - Wordt lui gebouwd bij het eerste gebruik en daarna atomair vervangen, nooit gemuteerd.
+        - invalidate() na het toevoegen van oefeningen; andere workers bouwen opnieuw na
+          EXERCISE_CATALOG_MAX_AGE seconden.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self, index):
+        max_age = current_app.config.get('EXERCISE_CATALOG_MAX_AGE', 600)
+        return index is None or time.monotonic() - index.built_at > max_age
+
+    def get(self):
+        """Geef de huidige index, en bouw hem (opnieuw) als hij ontbreekt of verouderd is."""
+        index = self._index
+        if self._is_stale(index):
+            with self._lock:
+                index = self._index
+                if self._is_stale(index):
+                    index = CatalogIndex.build()
+                    self._index = index
+        return index
+
+    def invalidate(self):
+        """Markeer de index als verouderd; de volgende zoekopdracht bouwt hem opnieuw."""
+        self._index = None
+
+
+exercise_catalog = ExerciseCatalog()
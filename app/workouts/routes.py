@@ -6,14 +6,14 @@ from flask_login import login_required, current_user
 from flask_wtf.csrf import CSRFError
 from markupsafe import escape
 import logging
-import json
 
 from werkzeug.utils import secure_filename
 
 from . import bp as workouts
 from .services import WorkoutService, ExerciseService
+from .catalog import exercise_catalog
 from app.decorators import owns_workout_plan, get_user_workout_plans, fix_image_path, clean_instruction_text, \
-    get_workout_data
+    get_workout_data, invalidates_dashboard
 from app.forms import WorkoutPlanForm, SearchExerciseForm, ExerciseForm, DeleteExerciseForm, AddExerciseForm
 from app.models import WorkoutPlan, Exercise, WorkoutPlanExercise
 from app import db
@@ -23,6 +23,7 @@ logger = logging.getLogger(__name__)
 
 @workouts.route('/add', methods=['GET', 'POST'])
 @login_required
+@invalidates_dashboard
 def add_workout():
     """Maak een nieuw workout-plan aan."""
     logger.debug(f"Add workout route, user: {current_user.name}, user_id: {current_user.id}")
@@ -91,6 +92,7 @@ def add_workout():
 
 @workouts.route('/edit_workout/<int:plan_id>', methods=['GET', 'POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def edit_workout(plan_id):
     """Bewerk een bestaand workout-plan."""
@@ -122,13 +124,6 @@ def edit_workout(plan_id):
     exercises = Exercise.query.all()
     exercises_dict = {str(ex.id): ex for ex in exercises}
 
-    # Verwerk afbeeldingen
-    for ex in exercises:
-        try:
-            ex.images_list = json.loads(ex.images) if ex.images else []
-        except Exception:
-            ex.images_list = []
-
     if request.method == 'POST':
         if form.validate_on_submit():
             try:
@@ -197,6 +192,7 @@ def edit_workout(plan_id):
 
 @workouts.route('/<int:plan_id>/add_exercise', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def add_exercise_to_workout(plan_id):
     """Voeg een oefening toe aan een workout-plan."""
@@ -250,6 +246,7 @@ def add_exercise_to_workout(plan_id):
 
 @workouts.route('/<int:plan_id>/exercise/<int:exercise_id>/edit', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def edit_exercise(plan_id, exercise_id):
     """Bewerk een oefening in een workout-plan."""
@@ -283,6 +280,7 @@ def edit_exercise(plan_id, exercise_id):
 
 @workouts.route('/<int:plan_id>/exercise/<int:exercise_id>/remove', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def remove_exercise_from_workout(plan_id, exercise_id):
     """Verwijder een oefening uit een workout-plan."""
@@ -330,50 +328,11 @@ def search_exercise():
             if form.category.data and form.category.data != 'NONE':
                 filters['category'] = form.category.data
 
-        query = ExerciseService.search_exercises(**filters)
-
         # Pagination
         page = request.args.get('page', 1, type=int)
-        pagination = query.paginate(page=page, per_page=10, error_out=False)
+        pagination = ExerciseService.search_exercises(page=page, per_page=10, **filters)
         exercises = pagination.items
 
-        # Fix image paths - Dit is de belangrijke fix
-        for exercise in exercises:
-            try:
-                image_url = None
-                if exercise.images:
-                    # Parse de images JSON
-                    images_list = json.loads(exercise.images) if isinstance(exercise.images, str) else exercise.images
-
-                    # Verwerk de afbeelding-paden
-                    real_images = []
-                    for img in images_list:
-                        if img and img != 'img/exercises/default.jpg' and 'default.jpg' not in img:
-                            # Als het pad al volledig is (begint met img/exercises/), gebruik direct
-                            if img.startswith('img/exercises/'):
-                                real_images.append(img)
-                            # Als het alleen img/ heeft, voeg exercises/ toe
-                            elif img.startswith('img/'):
-                                # img/3_4_Sit-Up/0.jpg -> img/exercises/3_4_Sit-Up/0.jpg
-                                real_images.append(img.replace('img/', 'img/exercises/'))
-                            else:
-                                # Voor paden zonder img/ prefix
-                                real_images.append(f'img/exercises/{img}')
-
-                    # Gebruik de eerste echte afbeelding
-                    if real_images:
-                        image_url = real_images[0]
-
-                # Als we geen echte afbeelding hebben, gebruik placeholder
-                if not image_url:
-                    image_url = 'img/placeholder.png'
-
-                exercise.image_url = image_url
-
-            except (json.JSONDecodeError, IndexError, TypeError) as e:
-                logger.warning(f"Failed to parse images for exercise {exercise.id}: {str(e)}")
-                exercise.image_url = 'img/placeholder.png'
-
         # AJAX-verzoek? -> alleen oefeningen (HTML-fragment)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return render_template('_exercise_items.html', exercises=exercises, plan_id=plan_id)
@@ -398,70 +357,12 @@ def exercise_detail(exercise_id):
     """Toon details van een specifieke oefening."""
     exercise = Exercise.query.get_or_404(exercise_id)
 
-    # Debug logging
-    logger.debug(f"Exercise {exercise_id}: raw images = {exercise.images}")
-
-    # Verwerk de images van de exercise
-    image_url = None
-    fixed_images = []
-
-    if exercise.images:
-        if isinstance(exercise.images, str):
-            try:
-                raw_images = json.loads(exercise.images)
-            except Exception as e:
-                logger.error(f"Kon images niet parsen: {exercise.images} — fout: {e}")
-                raw_images = []
-        else:
-            raw_images = exercise.images
-
-        logger.debug(f"Exercise {exercise_id}: parsed raw_images = {raw_images}")
-
-        # Verwerk de afbeelding-paden
-        for img in raw_images:
-            if img and img != 'img/exercises/default.jpg' and 'default.jpg' not in img:
-                # Als het pad al volledig is (begint met img/exercises/), gebruik direct
-                if img.startswith('img/exercises/'):
-                    fixed_images.append(img)
-                # Als het alleen img/ heeft, voeg exercises/ toe
-                elif img.startswith('img/'):
-                    # img/3_4_Sit-Up/0.jpg -> img/exercises/3_4_Sit-Up/0.jpg
-                    fixed_images.append(img.replace('img/', 'img/exercises/'))
-                else:
-                    # Voor paden zonder img/ prefix
-                    fixed_images.append(f'img/exercises/{img}')
-
-        logger.debug(f"Exercise {exercise_id}: fixed_images = {fixed_images}")
-
-        # Gebruik de eerste echte afbeelding
-        if fixed_images:
-            image_url = fixed_images[0]
-
-    # Als we geen echte afbeelding hebben, gebruik placeholder
-    if not image_url:
-        image_url = 'img/placeholder.png'
-
-    logger.debug(f"Exercise {exercise_id}: final image_url = {image_url}")
-
-    # Parseer instructies
-    raw_instructions = exercise.instructions or []
-    if isinstance(raw_instructions, str):
-        try:
-            raw_instructions = json.loads(raw_instructions)
-        except Exception as e:
-            logger.error(f"Kon instructies niet parsen: {raw_instructions} — fout: {e}")
-            raw_instructions = []
-
-    # Gebruik clean_instruction_text als beschikbaar, anders gewoon de instructies
-    try:
-        cleaned_instructions = [clean_instruction_text(step) for step in raw_instructions]
-    except NameError:
-        cleaned_instructions = raw_instructions
+    cleaned_instructions = [clean_instruction_text(step) for step in exercise.instructions or []]
 
     exercise_dict = {
         'name': exercise.name,
-        'images': fixed_images,
-        'image_url': image_url,
+        'images': exercise.image_urls,
+        'image_url': exercise.thumbnail_url,
         'instructions': cleaned_instructions,
         'level': exercise.level,
         'equipment': exercise.equipment,
@@ -475,6 +376,7 @@ def exercise_detail(exercise_id):
 
 @workouts.route('/<int:plan_id>/archive', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def archive_workout(plan_id):
     """Archiveer een workout-plan."""
@@ -493,6 +395,7 @@ def archive_workout(plan_id):
 
 @workouts.route('/add_new_exercise', methods=['GET', 'POST'])
 @login_required
+@invalidates_dashboard
 def add_new_exercise():
     """Maak een nieuwe oefening aan."""
     logger.debug(f"Add new exercise route, user: {current_user.name}, user_id: {current_user.id}")
@@ -546,14 +449,15 @@ def add_new_exercise():
                 mechanic=form.mechanic.data if form.mechanic.data != 'NONE' else None,
                 equipment=form.equipment.data if form.equipment.data != 'NONE' else None,
                 category=form.category.data,
-                instructions=json.dumps(instructions),
-                images=json.dumps(images),
+                instructions=instructions,
+                images=images,
                 is_public=form.is_public.data,
                 user_id=current_user.id if not form.is_public.data else None
             )
 
             db.session.add(new_exercise)
             db.session.commit()
+            exercise_catalog.invalidate()
 
             # Haal workout_plan_id uit formulier of gebruik plan_id
             workout_plan_id = request.form.get('workout_plan', type=int) or plan_id
@@ -606,6 +510,7 @@ def archived_plans():
 
 @workouts.route('/<int:plan_id>/use_template', methods=['POST'])
 @login_required
+@invalidates_dashboard
 @owns_workout_plan
 def use_template(plan_id):
     """Voeg een voorgemaakt workout template toe aan een plan."""
@@ -697,19 +602,9 @@ def use_template(plan_id):
         ).scalar() or -1
 
         for idx, exercise_config in enumerate(template_exercises):
-            # Zoek exercise op naam (case-insensitive, flexibele matching)
+            # Zoek exercise op naam: eerst exacte match, anders de beste fuzzy match
             exercise_name = exercise_config['name']
-
-            # Probeer eerst exacte match
-            exercise = Exercise.query.filter(
-                Exercise.name.ilike(exercise_name)
-            ).first()
-
-            # Als niet gevonden, probeer gedeeltelijke match
-            if not exercise:
-                exercise = Exercise.query.filter(
-                    Exercise.name.ilike(f'%{exercise_name}%')
-                ).first()
+            exercise = ExerciseService.find_by_name(exercise_name)
 
             if exercise:
                 try:
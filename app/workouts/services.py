@@ -1,8 +1,12 @@
+from flask import current_app
+
 from app.models import WorkoutPlan, Exercise, WorkoutPlanExercise
 from app import db
 import logging
 from sqlalchemy.exc import IntegrityError
 
+from .catalog import exercise_catalog
+
 logger = logging.getLogger(__name__)
 
 
@@ -262,15 +266,50 @@ class WorkoutService:
 
 class ExerciseService:
     @staticmethod
-    def search_exercises(search_term=None, category=None, difficulty=None, **filters):
-        """Search exercises with filters"""
-        query = Exercise.query
-
-        if search_term:
-            query = query.filter(Exercise.name.ilike(f"%{search_term}%"))
-        if category:
-            query = query.filter_by(category=category)
-        if difficulty:
-            query = query.filter_by(level=difficulty)
-
-        return query
\ No newline at end of file
+    def search_exercises(search_term=None, category=None, difficulty=None, page=1, per_page=10, **filters):
+        """
+        Search exercises with filters via the in-memory catalog index.
+        The search term is matched typo-tolerant (trigrams) and results are ranked by relevance.
+
+        Returns:
+            CatalogPage: Exercises of the requested page in .items, plus total and facet counts.
+        """
+        result = exercise_catalog.get().search(
+            search_term=search_term, category=category, difficulty=difficulty,
+            page=page, per_page=per_page,
+            threshold=current_app.config.get('EXERCISE_SEARCH_SIMILARITY', 0.5), **filters
+        )
+
+        # Alleen de oefeningen van deze pagina ophalen (primary key lookup)
+        if result.ids:
+            by_id = {e.id: e for e in Exercise.query.filter(Exercise.id.in_(result.ids)).all()}
+            result.items = [by_id[exercise_id] for exercise_id in result.ids if exercise_id in by_id]
+
+        return result
+
+    @staticmethod
+    def find_by_name(name):
+        """
+        Resolve an exercise name to an Exercise, or None.
+
+        Notes:
+            - An exact case-insensitive name match always wins. It is looked up in the database, so
+              exercises the (per-worker) catalog index has not seen yet are found too.
+            - Otherwise the first name containing the whole term, like the former ILIKE '%name%' lookup.
+            - Only when neither exists, the best typo-tolerant match.
+        """
+        key = (name or '').strip().lower()
+        if not key:
+            return None
+
+        exercise = Exercise.query.filter(
+            db.func.lower(Exercise.name) == key
+        ).order_by(Exercise.name, Exercise.id).first()
+        if exercise:
+            return exercise
+
+        index = exercise_catalog.get()
+        exercise_id = index.first_containing(key) or index.best_match(
+            name, threshold=current_app.config.get('EXERCISE_SEARCH_SIMILARITY', 0.5)
+        )
+        return db.session.get(Exercise, exercise_id) if exercise_id else None
@@ -23,6 +23,32 @@ class Config:
 
     DEBUG = True
 
+    # Dashboard-cache: 'sqlite' (gedeeld tussen workers), 'memory' (alleen bij één worker) of 'null'
+    DASHBOARD_CACHE_BACKEND = os.getenv('DASHBOARD_CACHE_BACKEND', 'sqlite')
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 300))
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', 1024))
+    DASHBOARD_CACHE_PATH = os.getenv('DASHBOARD_CACHE_PATH')
+
+    # Bestandscache voor server-side gerenderde grafieken (LRU; 0 bytes schakelt hem uit)
+    FILE_CACHE_DIR = os.getenv('FILE_CACHE_DIR')
+    FILE_CACHE_MAX_BYTES = int(os.getenv('FILE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Procespool voor matplotlib-renders (0 processen = renderen in de request-thread)
+    RENDER_POOL_WORKERS = int(os.getenv('RENDER_POOL_WORKERS', 2))
+    RENDER_POOL_TIMEOUT = float(os.getenv('RENDER_POOL_TIMEOUT', 5.0))
+    RENDER_POOL_MAX_QUEUE = int(os.getenv('RENDER_POOL_MAX_QUEUE', 8))
+
+    # In-process interval tree van de huidige kalendermaand per gebruiker (0 gebruikers schakelt hem uit)
+    CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', 60))
+    CALENDAR_CACHE_MAX_USERS = int(os.getenv('CALENDAR_CACHE_MAX_USERS', 512))
+    # Bewaartermijn van tombstones voor de delta-sync van de agenda; oudere cursors herladen volledig
+    CALENDAR_TOMBSTONE_RETENTION_DAYS = int(os.getenv('CALENDAR_TOMBSTONE_RETENTION_DAYS', 30))
+
+    # Maximale leeftijd (seconden) van de in-memory oefeningenindex per worker
+    EXERCISE_CATALOG_MAX_AGE = int(os.getenv('EXERCISE_CATALOG_MAX_AGE', 600))
+    # Minimale trigram-similarity (0-1) voor typo-tolerant zoeken op oefeningnamen
+    EXERCISE_SEARCH_SIMILARITY = float(os.getenv('EXERCISE_SEARCH_SIMILARITY', 0.5))
+
     UPLOAD_FOLDER = os.path.abspath(os.path.join('app', 'static', 'img', 'exercises'))
     VIDEO_UPLOAD_FOLDER = os.path.abspath(os.path.join('app', 'static', 'videos', 'exercises'))
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'mp4', 'webm'}
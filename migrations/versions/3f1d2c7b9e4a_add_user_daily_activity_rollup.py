@@ -0,0 +1,35 @@
+"""Add user_daily_activity rollup table
+
+Revision ID: 3f1d2c7b9e4a
+Revises: a59fbc9325d8
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1d2c7b9e4a'
+down_revision = 'a59fbc9325d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_daily_activity',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('sessions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('sets', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('reps', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('volume', sa.Float(), server_default='0', nullable=False),
+    sa.Column('cardio_minutes', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'date')
+    )
+    # Vul de rollup daarna met: flask activity rebuild
+
+
+def downgrade():
+    op.drop_table('user_daily_activity')
@@ -0,0 +1,27 @@
+"""Add longest_streak to user
+
+Revision ID: 8b2e6f0a4c1d
+Revises: 3f1d2c7b9e4a
+Create Date: 2026-10-18 11:03:27.581932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e6f0a4c1d'
+down_revision = '3f1d2c7b9e4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+    # Vul bestaande streaks daarna met: flask activity rebuild && flask activity backfill-streaks
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('longest_streak')
@@ -0,0 +1,54 @@
+"""Composite and partial indexes for the hot dashboard, history and calendar queries
+
+Revision ID: a7d3e5f1c9b2
+Revises: f2c6a9d4b8e1
+Create Date: 2026-10-18 17:02:19.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5f1c9b2'
+down_revision = 'f2c6a9d4b8e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('weight_log', schema=None) as batch_op:
+        batch_op.create_index('ix_weight_log_user_logged_at', ['user_id', 'logged_at'], unique=False)
+
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_set_logs_user_completed', ['user_id', 'completed'], unique=False)
+        batch_op.create_index('ix_set_logs_user_exercise_weight', ['user_id', 'exercise_id', 'weight'], unique=False,
+                              sqlite_where=sa.text('completed = 1'), postgresql_where=sa.text('completed'))
+
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_workout_sessions_user_completed_at',
+                              ['user_id', 'is_completed', 'completed_at'], unique=False)
+        batch_op.create_index('ix_workout_sessions_plan_completed_at',
+                              ['workout_plan_id', 'is_completed', 'completed_at'], unique=False)
+
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_events_user_start', ['user_id', 'start_datetime'], unique=False)
+        batch_op.create_index('ix_calendar_events_user_status_type',
+                              ['user_id', 'status', 'event_type'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_calendar_events_user_status_type')
+        batch_op.drop_index('ix_calendar_events_user_start')
+
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_workout_sessions_plan_completed_at')
+        batch_op.drop_index('ix_workout_sessions_user_completed_at')
+
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_set_logs_user_exercise_weight')
+        batch_op.drop_index('ix_set_logs_user_completed')
+
+    with op.batch_alter_table('weight_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_weight_log_user_logged_at')
@@ -0,0 +1,28 @@
+"""Add calendar_feed_token to user for the iCalendar feed
+
+Revision ID: a8d5c2f7e9b3
+Revises: e7c1a5b9d4f2
+Create Date: 2026-10-18 21:42:37.184205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d5c2f7e9b3'
+down_revision = 'e7c1a5b9d4f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('calendar_feed_token', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_calendar_feed_token'), ['calendar_feed_token'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_calendar_feed_token'))
+        batch_op.drop_column('calendar_feed_token')
@@ -0,0 +1,69 @@
+"""Add personal_record and personal_record_history tables
+
+Revision ID: b5e8f2a4d6c3
+Revises: a7d3e5f1c9b2
+Create Date: 2026-10-18 18:21:37.640915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8f2a4d6c3'
+down_revision = 'a7d3e5f1c9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('personal_record',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.String(length=50), nullable=False),
+    sa.Column('best_weight', sa.Float(), nullable=True),
+    sa.Column('best_weight_reps', sa.Integer(), nullable=True),
+    sa.Column('best_weight_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('best_one_rm', sa.Float(), nullable=True),
+    sa.Column('best_one_rm_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('best_volume', sa.Float(), nullable=True),
+    sa.Column('best_volume_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('best_reps', sa.Integer(), nullable=True),
+    sa.Column('best_reps_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'exercise_id')
+    )
+    op.create_table('personal_record_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.String(length=50), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('previous_value', sa.Float(), nullable=True),
+    sa.Column('reps', sa.Integer(), nullable=True),
+    sa.Column('weight', sa.Float(), nullable=True),
+    sa.Column('workout_session_id', sa.String(length=36), nullable=True),
+    sa.Column('achieved_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('personal_record_history', schema=None) as batch_op:
+        batch_op.create_index('ix_personal_record_history_user_achieved', ['user_id', 'achieved_at'], unique=False)
+
+    # Het dashboard leest records nu uit personal_record; de partiële set_logs-index is overbodig
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_set_logs_user_exercise_weight')
+    # Vul de records daarna met: flask records rebuild
+
+
+def downgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_set_logs_user_exercise_weight', ['user_id', 'exercise_id', 'weight'], unique=False,
+                              sqlite_where=sa.text('completed = 1'), postgresql_where=sa.text('completed'))
+
+    with op.batch_alter_table('personal_record_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_personal_record_history_user_achieved')
+    op.drop_table('personal_record_history')
+    op.drop_table('personal_record')
@@ -0,0 +1,91 @@
+"""Precompute exercise image urls
+
+Revision ID: c4a7d9e2f1b3
+Revises: 8b2e6f0a4c1d
+Create Date: 2026-10-18 13:20:14.402117
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a7d9e2f1b3'
+down_revision = '8b2e6f0a4c1d'
+branch_labels = None
+depends_on = None
+
+PLACEHOLDER_IMAGE = 'img/placeholder.png'
+
+
+def normalize_image_path(img):
+    # Kopie van app.models.normalize_image_path, zodat de migratie los van de app-code blijft werken
+    if not img or not isinstance(img, str) or 'default.jpg' in img:
+        return None
+    if img.startswith('img/exercises/'):
+        return img
+    if img.startswith('img/'):
+        return img.replace('img/', 'img/exercises/', 1)
+    return f'img/exercises/{img}'
+
+
+def upgrade():
+    op.create_table('exercise_image',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.String(length=50), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('exercise_image', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_exercise_image_exercise_id'), ['exercise_id'], unique=False)
+
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('thumbnail_url', sa.String(length=255), server_default=PLACEHOLDER_IMAGE, nullable=False))
+        batch_op.add_column(sa.Column('image_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill: normaliseer de bestaande images-JSON eenmalig
+    exercise = sa.table('exercise',
+        sa.column('id', sa.String), sa.column('images', sa.Text),
+        sa.column('thumbnail_url', sa.String), sa.column('image_count', sa.Integer))
+    exercise_image = sa.table('exercise_image',
+        sa.column('exercise_id', sa.String), sa.column('position', sa.Integer), sa.column('url', sa.String))
+
+    conn = op.get_bind()
+    image_rows = []
+    for exercise_id, images in conn.execute(sa.select(exercise.c.id, exercise.c.images)).all():
+        try:
+            raw_images = json.loads(images) if images else []
+        except ValueError:
+            raw_images = []
+        if not isinstance(raw_images, list):
+            raw_images = [raw_images]
+
+        urls = []
+        for img in raw_images:
+            url = normalize_image_path(img)
+            if url and url not in urls:
+                urls.append(url)
+        if not urls:
+            continue
+
+        conn.execute(exercise.update().where(exercise.c.id == exercise_id).values(
+            thumbnail_url=urls[0], image_count=len(urls)))
+        image_rows.extend({'exercise_id': exercise_id, 'position': i, 'url': url} for i, url in enumerate(urls))
+
+    if image_rows:
+        op.bulk_insert(exercise_image, image_rows)
+
+
+def downgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_column('image_count')
+        batch_op.drop_column('thumbnail_url')
+
+    with op.batch_alter_table('exercise_image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exercise_image_exercise_id'))
+
+    op.drop_table('exercise_image')
@@ -0,0 +1,48 @@
+"""Store recurring calendar events as rules with per-occurrence exceptions
+
+Revision ID: c9a4e7d2f1b8
+Revises: b5e8f2a4d6c3
+Create Date: 2026-10-18 19:04:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a4e7d2f1b8'
+down_revision = 'b5e8f2a4d6c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recurrence_count', sa.Integer(), nullable=True))
+
+    op.create_table('calendar_event_exceptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('is_cancelled', sa.Boolean(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('start_datetime', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('end_datetime', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('color', sa.String(length=7), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['calendar_events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'occurrence_start', name='uq_calendar_event_exceptions_occurrence')
+    )
+
+    # Bestaande reeksen zijn al als losse kopieën opgeslagen; de basis blijft een los event,
+    # anders zou hij naast die kopieën nog eens uitgeklapt worden
+    op.execute("UPDATE calendar_events SET is_recurring = false WHERE is_recurring = true")
+
+
+def downgrade():
+    op.drop_table('calendar_event_exceptions')
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_column('recurrence_count')
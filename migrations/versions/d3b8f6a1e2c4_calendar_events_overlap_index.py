@@ -0,0 +1,33 @@
+"""Index calendar_events for overlap queries and recurring series
+
+Revision ID: d3b8f6a1e2c4
+Revises: c9a4e7d2f1b8
+Create Date: 2026-10-18 19:41:53.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b8f6a1e2c4'
+down_revision = 'c9a4e7d2f1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # De nieuwe index begint met dezelfde kolommen; de oude is daarmee overbodig
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_events_user_start_end',
+                              ['user_id', 'start_datetime', 'end_datetime'], unique=False)
+        batch_op.drop_index('ix_calendar_events_user_start')
+        batch_op.create_index('ix_calendar_events_user_series_start', ['user_id', 'start_datetime'], unique=False,
+                              sqlite_where=sa.text('is_recurring = 1'), postgresql_where=sa.text('is_recurring'))
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_calendar_events_user_series_start')
+        batch_op.create_index('ix_calendar_events_user_start', ['user_id', 'start_datetime'], unique=False)
+        batch_op.drop_index('ix_calendar_events_user_start_end')
@@ -0,0 +1,61 @@
+"""Native JSON for exercise images and instructions
+
+Revision ID: d8e3b5a1c6f2
+Revises: c4a7d9e2f1b3
+Create Date: 2026-10-18 13:58:40.117302
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3b5a1c6f2'
+down_revision = 'c4a7d9e2f1b3'
+branch_labels = None
+depends_on = None
+
+JSON_LIST = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+
+def as_json_text(value):
+    # Herschrijf elke waarde naar een geldige JSON-lijst, zodat de typeconversie niet faalt
+    try:
+        parsed = json.loads(value) if value else []
+    except ValueError:
+        parsed = []
+    if not isinstance(parsed, list):
+        parsed = [parsed]
+    return json.dumps(parsed)
+
+
+def upgrade():
+    exercise = sa.table('exercise',
+        sa.column('id', sa.String), sa.column('images', sa.Text), sa.column('instructions', sa.Text))
+
+    conn = op.get_bind()
+    for exercise_id, images, instructions in conn.execute(
+            sa.select(exercise.c.id, exercise.c.images, exercise.c.instructions)).all():
+        fixed_images, fixed_instructions = as_json_text(images), as_json_text(instructions)
+        if (fixed_images, fixed_instructions) != (images, instructions):
+            conn.execute(exercise.update().where(exercise.c.id == exercise_id).values(
+                images=fixed_images, instructions=fixed_instructions))
+
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.alter_column('images', existing_type=sa.Text(), type_=JSON_LIST,
+                              postgresql_using='images::jsonb')
+        batch_op.alter_column('instructions', existing_type=sa.Text(), type_=JSON_LIST,
+                              postgresql_using='instructions::jsonb')
+        batch_op.create_index('ix_exercise_images_gin', ['images'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_index('ix_exercise_images_gin', postgresql_using='gin')
+        batch_op.alter_column('instructions', existing_type=JSON_LIST, type_=sa.Text(),
+                              postgresql_using='instructions::text')
+        batch_op.alter_column('images', existing_type=JSON_LIST, type_=sa.Text(),
+                              postgresql_using='images::text')
@@ -0,0 +1,41 @@
+"""Unique set per session for set_logs upserts
+
+Revision ID: e1f4a8c3b7d5
+Revises: d8e3b5a1c6f2
+Create Date: 2026-10-18 14:31:05.886421
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f4a8c3b7d5'
+down_revision = 'd8e3b5a1c6f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Verwijder eerst dubbele sets (zelfde sessie, oefening en setnummer); de nieuwste blijft staan
+    set_logs = sa.table('set_logs',
+        sa.column('id', sa.Integer), sa.column('workout_session_id', sa.String),
+        sa.column('workout_plan_exercise_id', sa.Integer), sa.column('set_number', sa.Integer))
+    has_key = sa.and_(set_logs.c.workout_session_id.isnot(None), set_logs.c.workout_plan_exercise_id.isnot(None))
+    newest = sa.select(sa.func.max(set_logs.c.id)).where(has_key).group_by(
+        set_logs.c.workout_session_id, set_logs.c.workout_plan_exercise_id, set_logs.c.set_number
+    )
+    duplicates = sa.select(set_logs.c.id).where(has_key, set_logs.c.id.notin_(newest))
+    conn = op.get_bind()
+    duplicate_ids = [row[0] for row in conn.execute(duplicates)]
+    if duplicate_ids:
+        conn.execute(set_logs.delete().where(set_logs.c.id.in_(duplicate_ids)))
+
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_set_logs_session_wpe_set',
+                                          ['workout_session_id', 'workout_plan_exercise_id', 'set_number'])
+
+
+def downgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_set_logs_session_wpe_set', type_='unique')
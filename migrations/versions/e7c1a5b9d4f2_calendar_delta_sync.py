@@ -0,0 +1,41 @@
+"""Add calendar_tombstones and an updated_at index for calendar delta sync
+
+Revision ID: e7c1a5b9d4f2
+Revises: d3b8f6a1e2c4
+Create Date: 2026-10-18 20:16:08.551937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c1a5b9d4f2'
+down_revision = 'd3b8f6a1e2c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.String(length=64), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('calendar_tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_tombstones_user_deleted', ['user_id', 'deleted_at'], unique=False)
+
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.create_index('ix_calendar_events_user_updated', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_calendar_events_user_updated')
+
+    with op.batch_alter_table('calendar_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_calendar_tombstones_user_deleted')
+    op.drop_table('calendar_tombstones')
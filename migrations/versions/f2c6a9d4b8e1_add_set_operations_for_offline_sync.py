@@ -0,0 +1,38 @@
+"""Add set_operations for offline session sync
+
+Revision ID: f2c6a9d4b8e1
+Revises: e1f4a8c3b7d5
+Create Date: 2026-10-18 16:12:44.503127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a9d4b8e1'
+down_revision = 'e1f4a8c3b7d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('set_operations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workout_session_id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('op_key', sa.String(length=64), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('workout_plan_exercise_id', sa.Integer(), nullable=True),
+    sa.Column('set_number', sa.Integer(), nullable=False),
+    sa.Column('set_log_id', sa.Integer(), nullable=True),
+    sa.Column('applied_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['workout_session_id'], ['workout_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('workout_session_id', 'op_key', name='uq_set_operations_session_key')
+    )
+
+
+def downgrade():
+    op.drop_table('set_operations')
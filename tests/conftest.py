@@ -0,0 +1,71 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    WTF_CSRF_ENABLED = False
+    DASHBOARD_CACHE_BACKEND = 'null'
+    FILE_CACHE_MAX_BYTES = 0
+    RENDER_POOL_WORKERS = 0
+    CALENDAR_CACHE_MAX_USERS = 0
+
+
+@pytest.fixture
+def app():
+    """App met een lege in-memory SQLite-database, binnen een app context."""
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    """Maak een geregistreerde gebruiker aan."""
+    def make(name='test'):
+        user = User(name=name, email=f'{name}-{uuid.uuid4().hex[:8]}@example.com', auth0_id=uuid.uuid4().hex,
+                    registration_step='completed', account_type='user')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """Log een gebruiker in op een test client (zonder Auth0)."""
+    def log_in(client, user):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return log_in
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager die de uitgevoerde SQL-statements telt: with count_queries() as queries: ..."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return counter
@@ -0,0 +1,15 @@
+from app import db
+
+
+def test_client_muscle_volume_is_disabled_for_trainers(app, make_user, login):
+    trainer, client = make_user('trainer'), make_user('client')
+    trainer.account_type = 'trainer'
+    db.session.commit()
+
+    with app.test_client() as http:
+        login(http, trainer)
+        response = http.get(f'/admin/api/clients/{client.id}/muscle_volume')
+
+    # Zonder trainer-klantrelatie mag geen trainer het volume van een willekeurige gebruiker lezen
+    assert response.status_code == 404
+    assert 'muscles' not in response.get_json()
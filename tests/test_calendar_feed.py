@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.calendar.ics import session_entry
+from app.models import CalendarEvent, WorkoutPlan
+
+
+def test_feed_uses_session_duration_for_late_completion(app, make_user, login):
+    user = make_user()
+    plan = WorkoutPlan(user_id=user.id, name='Push')
+    db.session.add(plan)
+    db.session.flush()
+    start = datetime(2026, 2, 28, 8, 0, tzinfo=timezone.utc)
+    event = CalendarEvent(user_id=user.id, workout_plan_id=plan.id, title='Push', event_type='workout',
+                          start_datetime=start, end_datetime=start + timedelta(minutes=45))
+    user.rotate_calendar_feed_token()
+    db.session.add(event)
+    db.session.commit()
+
+    client = login(app.test_client(), user)
+    assert client.post(f'/calendar/event/{event.id}/complete').json['success']
+
+    body = client.get(f'/calendar/feed/{user.calendar_feed_token}.ics').get_data(as_text=True)
+    session_block = body[body.index('UID:session-'):]
+    assert 'DTSTART:20260228T080000Z\r\n' in session_block
+    assert 'DTEND:20260228T084500Z\r\n' in session_block
+
+
+def test_session_entry_without_start_or_duration():
+    completed_at = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+    without_start = session_entry('s1', 'Push', None, completed_at, 30)
+    assert 'DTSTART:20260301T093000Z\r\n' in without_start and 'DTEND:20260301T100000Z\r\n' in without_start
+
+    without_duration = session_entry('s2', None, completed_at, completed_at, None)
+    assert 'DTSTART:20260301T100000Z\r\n' in without_duration and 'DTEND:20260301T110000Z\r\n' in without_duration
@@ -0,0 +1,70 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.calendar.services import RECONCILED_SESSION_NAMESPACE, CalendarService
+from app.models import CalendarEvent, UserDailyActivity, WorkoutPlan, WorkoutSession
+
+
+@pytest.fixture
+def plan(app, make_user):
+    user = make_user()
+    plan = WorkoutPlan(user_id=user.id, name='Push')
+    db.session.add(plan)
+    db.session.commit()
+    return plan
+
+
+def completed_event(plan, start, hours=1):
+    event = CalendarEvent(user_id=plan.user_id, workout_plan_id=plan.id, title=plan.name, event_type='workout',
+                          start_datetime=start, end_datetime=start + timedelta(hours=hours), status='completed')
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+def session_count(plan):
+    return WorkoutSession.query.filter_by(workout_plan_id=plan.id).count()
+
+
+def test_event_across_midnight_is_reconciled_once(plan):
+    completed_event(plan, datetime(2026, 3, 1, 23, 30, tzinfo=timezone.utc))
+
+    assert CalendarService.reconcile_workout_sessions(plan.user_id)[plan.user_id] == 1
+    assert CalendarService.unmatched_completed_events(plan.user_id) == []
+    assert CalendarService.reconcile_workout_sessions(plan.user_id)[plan.user_id] == 0
+    assert session_count(plan) == 1
+
+    # Een later voltooid event wordt niet meer tegengehouden door het event over middernacht
+    completed_event(plan, datetime(2026, 3, 5, 18, 0, tzinfo=timezone.utc))
+    assert CalendarService.reconcile_workout_sessions(plan.user_id)[plan.user_id] == 1
+    assert session_count(plan) == 2
+
+
+def test_sync_stats_reconciles_after_midnight_event(app, plan, login):
+    completed_event(plan, datetime(2026, 3, 1, 23, 30, tzinfo=timezone.utc))
+    client = login(app.test_client(), plan.user)
+
+    assert client.post('/calendar/sync-stats').json['synced_count'] == 1
+    completed_event(plan, datetime(2026, 3, 5, 18, 0, tzinfo=timezone.utc))
+    assert client.post('/calendar/sync-stats').json['synced_count'] == 1
+    assert client.post('/calendar/sync-stats').json['synced_count'] == 0
+
+
+def test_existing_session_id_does_not_discard_batch(plan):
+    taken = completed_event(plan, datetime(2026, 3, 2, 10, 0, tzinfo=timezone.utc))
+    completed_event(plan, datetime(2026, 3, 3, 10, 0, tzinfo=timezone.utc))
+    # Een gelijktijdige run heeft het id van het eerste event al gebruikt, maar nog niet als voltooid
+    db.session.add(WorkoutSession(id=str(uuid.uuid5(RECONCILED_SESSION_NAMESPACE, f'{taken.id}:2026-03-02')),
+                                  user_id=plan.user_id, workout_plan_id=plan.id,
+                                  started_at=taken.start_datetime, is_completed=False))
+    db.session.commit()
+
+    created = CalendarService.reconcile_workout_sessions(plan.user_id, batch_size=10)
+
+    assert created[plan.user_id] == 1
+    assert session_count(plan) == 2
+    # Alleen de werkelijk ingevoegde sessie telt mee in de rollup
+    assert db.session.query(db.func.sum(UserDailyActivity.sessions)).filter_by(user_id=plan.user_id).scalar() == 1
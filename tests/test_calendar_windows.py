@@ -0,0 +1,116 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from app import calendar_cache, db
+from app.calendar.recurrence import as_utc
+from app.calendar.services import CalendarService
+from app.intervals import IntervalTree, MonthIntervalCache
+from app.models import CalendarEvent
+
+
+def brute_force(intervals, start, end):
+    """Zelfde overlapregel als CalendarEvent.in_window, zonder index."""
+    return sorted((value for item_start, item_end, value in intervals
+                   if item_start < end and (item_end > start or item_start >= start)), key=str)
+
+
+def edge_cases(window_start, window_end):
+    """(start, end) rond de grenzen van een venster: zonder duur, precies aansluitend en overlappend."""
+    hour = timedelta(hours=1)
+    return [
+        (window_start, window_start),  # zonder duur op het begin: telt mee
+        (window_end, window_end),  # zonder duur op het einde: telt niet mee
+        (window_start - hour, window_start),  # eindigt precies op het begin: telt niet mee
+        (window_end, window_end + hour),  # begint precies op het einde: telt niet mee
+        (window_start - hour, window_start + hour),  # kruist het begin
+        (window_end - hour, window_end + hour),  # kruist het einde
+        (window_start - hour, window_end + hour),  # omvat het venster
+        (window_start + hour, window_start + 2 * hour),  # er binnen
+        (window_start + hour, window_start + hour),  # zonder duur er binnen
+        (window_start - 2 * hour, window_start - hour),  # er vóór
+    ]
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for value in range(2000):
+        start = rng.randint(0, 10000)
+        # Ongeveer een op de vijf zonder duur
+        intervals.append((start, start + rng.choice([0, rng.randint(1, 300)]), value))
+    intervals += [(5000, 5000, 'punt'), (4900, 5000, 'tot begin'), (6000, 6100, 'vanaf einde')]
+    tree = IntervalTree(intervals)
+
+    windows = [(5000, 6000), (0, 1), (10300, 20000), (-5, 0)] + [
+        tuple(sorted(rng.sample(range(-100, 10400), 2))) for _ in range(500)
+    ]
+    for start, end in windows:
+        assert sorted(tree.overlapping(start, end), key=str) == brute_force(intervals, start, end)
+
+    result = tree.overlapping(5000, 6000)
+    assert 'punt' in result and 'tot begin' not in result and 'vanaf einde' not in result
+
+
+@pytest.fixture
+def seeded_user(app, make_user):
+    """Gebruiker met randgevallen en willekeurige events verspreid over de gecachete maand."""
+    user = make_user()
+    _, span_start, span_end = MonthIntervalCache.month_span()
+    window_start, window_end = span_start + timedelta(days=20), span_start + timedelta(days=27)
+    intervals = edge_cases(window_start, window_end)
+
+    rng = random.Random(11)
+    span_hours = int((span_end - span_start).total_seconds() // 3600)
+    for _ in range(400):
+        start = span_start + timedelta(hours=rng.randint(-48, span_hours + 48))
+        intervals.append((start, start + timedelta(minutes=rng.choice([0, 30, 90, 60 * 30]))))
+
+    db.session.add_all(CalendarEvent(user_id=user.id, title=f'Event {i}', start_datetime=start, end_datetime=end)
+                       for i, (start, end) in enumerate(intervals))
+    series_start = span_start + timedelta(days=3, hours=7)
+    db.session.add(CalendarEvent(user_id=user.id, title='Reeks', start_datetime=series_start,
+                                 end_datetime=series_start + timedelta(hours=1), is_recurring=True,
+                                 recurrence_pattern='daily'))
+    db.session.commit()
+    return user, span_start, span_end, (window_start, window_end)
+
+
+def windows(span_start, span_end, edge_window):
+    rng = random.Random(3)
+    span_hours = int((span_end - span_start).total_seconds() // 3600)
+    result = [edge_window, (span_start, span_end)]
+    for _ in range(60):
+        start = span_start + timedelta(hours=rng.randint(0, span_hours - 1))
+        result.append((start, min(span_end, start + timedelta(hours=rng.randint(1, 24 * 14)))))
+    return result
+
+
+def test_interval_tree_matches_in_window(seeded_user):
+    user, span_start, span_end, edge_window = seeded_user
+    events = CalendarEvent.query.filter_by(user_id=user.id, is_recurring=False).all()
+    tree = IntervalTree([(as_utc(e.start_datetime), as_utc(e.end_datetime), e.id) for e in events])
+
+    for start, end in windows(span_start, span_end, edge_window):
+        from_database = sorted(e.id for e in CalendarEvent.in_window(user.id, start, end) if not e.is_recurring)
+        assert sorted(tree.overlapping(start, end)) == from_database
+
+    # Van de tien randgevallen vallen er zes in het venster
+    edge_ids = sorted(e.id for e in events)[:10]
+    assert sorted(set(tree.overlapping(*edge_window)) & set(edge_ids)) == \
+        [edge_ids[i] for i in (0, 4, 5, 6, 7, 8)]
+
+
+def test_cached_windows_match_database(app, seeded_user):
+    user, span_start, span_end, edge_window = seeded_user
+    calendar_cache.max_users = 512
+    try:
+        for start, end in windows(span_start, span_end, edge_window):
+            cached, _ = CalendarService.get_events(user.id, start, end)
+            from_database = [item for _, _, item in CalendarService.window_items(user.id, start, end)]
+            assert sorted(str(item['id']) for item in cached) == sorted(str(item['id']) for item in from_database)
+        assert calendar_cache.stats()['hits'] > 0
+    finally:
+        calendar_cache.invalidate(user.id)
+        calendar_cache.max_users = 0
@@ -0,0 +1,109 @@
+import csv
+import os
+import re
+
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import Category, Exercise, ExperienceLevel
+from app.workouts.catalog import exercise_catalog, iter_bits
+from app.workouts.services import ExerciseService
+
+CATALOG_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exercises.csv')
+
+# Correct gespelde zoektermen: het oude zoekpad (prefix op alle tokens) moet een deelverzameling blijven
+PREFIX_QUERIES = ['bench', 'bench press', 'curl', 'squ', 'pull', 'barbell row', 'dumbbell', 'lateral raise']
+
+# Typefouten met de tekst die de beste drie resultaten moeten bevatten
+TYPO_QUERIES = {
+    'benchpress': 'bench press',
+    'bench pres': 'bench press',
+    'dumbell curl': 'dumbbell curl',
+    'barbel row': 'barbell row',
+    'shouldr press': 'shoulder press',
+    'deadlfit': 'deadlift',
+    'tricep pushdown': 'triceps pushdown',
+}
+
+
+@pytest.fixture
+def catalog(app):
+    """De oefeningen uit exercises.csv in de database, met een verse catalogusindex."""
+    with open(CATALOG_CSV, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f, delimiter=';'))
+    db.session.execute(sa.insert(Exercise), [
+        {'id': row['id'], 'name': row['name'], 'level': ExperienceLevel(row['level']),
+         'category': Category(row['category'])} for row in rows
+    ])
+    db.session.commit()
+    exercise_catalog.invalidate()
+    yield exercise_catalog.get()
+    exercise_catalog.invalidate()
+
+
+def find_by_name_ilike(name):
+    """Het oude opzoekpad van use_template: exacte ILIKE, daarna ILIKE '%name%' (alfabetisch eerste)."""
+    exercise = Exercise.query.filter(Exercise.name.ilike(name)).first()
+    if not exercise:
+        exercise = Exercise.query.filter(
+            Exercise.name.ilike(f'%{name}%')
+        ).order_by(db.func.lower(Exercise.name), Exercise.id).first()
+    return exercise
+
+
+@pytest.mark.parametrize('query', PREFIX_QUERIES)
+def test_search_ranks_prefix_matches_first(catalog, query):
+    prefix_ids = {catalog.ids[doc] for doc in iter_bits(catalog.match_text(query))}
+    result = catalog.search(search_term=query, per_page=len(catalog))
+
+    assert prefix_ids
+    assert set(result.ids[:len(prefix_ids)]) == prefix_ids
+
+
+@pytest.mark.parametrize('query,expected', TYPO_QUERIES.items())
+def test_search_tolerates_typos(catalog, query, expected):
+    result = catalog.search(search_term=query, per_page=3)
+    names = [catalog.names[catalog.ids.index(exercise_id)].lower() for exercise_id in result.ids]
+
+    assert len(names) == 3
+    assert all(expected in name for name in names)
+
+
+def test_short_terms_match_by_prefix_only(catalog):
+    result = catalog.search(search_term='ab', per_page=len(catalog))
+    prefix_ids = [catalog.ids[doc] for doc in iter_bits(catalog.match_text('ab'))]
+
+    assert sorted(result.ids) == sorted(prefix_ids)
+
+
+def test_find_by_name_matches_former_lookup_for_templates(catalog):
+    from app.workouts import routes
+    with open(routes.__file__, encoding='utf-8') as f:
+        source = f.read()
+    names = sorted(set(re.findall(r"\{'name': '([^']+)'", source)))
+
+    assert names
+    for name in names:
+        expected = find_by_name_ilike(name)
+        if expected is not None:
+            assert ExerciseService.find_by_name(name).name == expected.name, name
+
+
+def test_find_by_name_prefers_exact_names(catalog):
+    assert ExerciseService.find_by_name('Bench Press').name == 'Barbell Bench Press - Medium Grip'
+    assert ExerciseService.find_by_name('deadlift').name == 'Axle Deadlift'
+    assert ExerciseService.find_by_name('cable curl').name == 'High Cable Curls'
+
+    # Exact, ook als de catalogusindex van deze worker de oefening nog niet kent
+    db.session.add(Exercise(id='Bench_Press', name='Bench Press', level=ExperienceLevel.BEGINNER,
+                            category=Category.STRENGTH))
+    db.session.commit()
+    assert ExerciseService.find_by_name('bench press ').id == 'Bench_Press'
+
+
+def test_find_by_name_falls_back_to_fuzzy(catalog):
+    assert ExerciseService.find_by_name('Barbell Front Squat').name == 'Front Barbell Squat'
+    assert ExerciseService.find_by_name('Pushups - Close Triceps Position').name == \
+        'Push-Ups - Close Triceps Position'
+    assert ExerciseService.find_by_name('Xyzzy') is None
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.main.services import DashboardService
+from app.models import Category, CalendarEvent, Exercise, ExperienceLevel, SetLog, UserDailyActivity, WeightLog, \
+    WorkoutPlan, WorkoutPlanExercise, WorkoutSession
+
+
+def add_history(user, exercise, plans, sessions_per_plan):
+    """Plannen met oefeningen, voltooide sessies, sets, events en gewichtsmetingen voor user."""
+    now = datetime.now(timezone.utc)
+    for p in range(plans):
+        plan = WorkoutPlan(user_id=user.id, name=f'Plan {p}')
+        db.session.add(plan)
+        db.session.flush()
+        wpe = WorkoutPlanExercise(workout_plan_id=plan.id, exercise_id=exercise.id, sets=3, reps=10)
+        db.session.add(wpe)
+        db.session.flush()
+        for s in range(sessions_per_plan):
+            completed_at = now - timedelta(days=s, hours=p)
+            db.session.add(WorkoutSession(user_id=user.id, workout_plan_id=plan.id, started_at=completed_at,
+                                          completed_at=completed_at, duration_minutes=45, is_completed=True))
+            db.session.add(SetLog(user_id=user.id, workout_plan_id=plan.id, exercise_id=exercise.id,
+                                  workout_plan_exercise_id=wpe.id, set_number=s + 1, reps=10, weight=50.0,
+                                  completed=True, completed_at=completed_at))
+            db.session.add(CalendarEvent(user_id=user.id, title=f'Training {s}', start_datetime=completed_at,
+                                         end_datetime=completed_at + timedelta(hours=1), status='completed'))
+            db.session.add(WeightLog(user_id=user.id, weight=80.0 - s * 0.1, logged_at=completed_at))
+    db.session.commit()
+    UserDailyActivity.rebuild(user.id)
+    db.session.commit()
+
+
+def test_dashboard_query_count_is_independent_of_history(app, make_user, count_queries):
+    exercise = Exercise(id='bench_press', name='Bench Press', level=ExperienceLevel.BEGINNER,
+                        category=Category.STRENGTH)
+    db.session.add(exercise)
+    small, large = make_user('small'), make_user('large')
+    add_history(small, exercise, plans=1, sessions_per_plan=1)
+    add_history(large, exercise, plans=5, sessions_per_plan=40)
+
+    with app.test_request_context():
+        # Eenmalige initialisatie (o.a. de spierverdeling) buiten de telling houden
+        DashboardService.build_context(small)
+
+        counts = []
+        for user in (small, large):
+            db.session.expire_all()
+            with count_queries() as queries:
+                context = DashboardService.build_context(user)
+            counts.append(len(queries))
+
+    assert len(context['workout_data']) == 5
+    assert counts[0] == counts[1]
@@ -0,0 +1,50 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import CalendarEvent, WorkoutPlan, WorkoutSession
+
+
+def seed_history(user):
+    """Een plan met voltooide sessies en kalender-events, zodat alle dashboardqueries draaien."""
+    now = datetime.now(timezone.utc)
+    plan = WorkoutPlan(user_id=user.id, name='Push')
+    db.session.add(plan)
+    db.session.flush()
+    for day in range(3):
+        moment = now - timedelta(days=day)
+        db.session.add(WorkoutSession(user_id=user.id, workout_plan_id=plan.id, started_at=moment,
+                                      completed_at=moment, is_completed=True))
+        db.session.add(CalendarEvent(user_id=user.id, title='Push', start_datetime=moment,
+                                     end_datetime=moment + timedelta(hours=1), status='completed'))
+    db.session.commit()
+
+
+def check_plans(app, user):
+    return app.test_cli_runner().invoke(args=['queries', 'check-plans', '--user-id', str(user.id), '--verbose'])
+
+
+def test_hot_queries_use_indexes(app, make_user):
+    user = make_user()
+    seed_history(user)
+
+    result = check_plans(app, user)
+
+    assert result.exit_code == 0, result.output
+    checked, scans = map(int, re.search(r'(\d+) queries gecontroleerd, (\d+) met', result.output).groups())
+    assert checked >= 10
+    assert scans == 0
+
+
+def test_check_plans_fails_on_table_scan(app, make_user):
+    user = make_user()
+    seed_history(user)
+    db.session.execute(sa.text('DROP INDEX ix_workout_sessions_user_completed_at'))
+    db.session.commit()
+
+    result = check_plans(app, user)
+
+    assert result.exit_code == 1
+    assert 'SCAN workout_sessions' in result.output
@@ -0,0 +1,26 @@
+import os
+
+from app.rendering import RenderPool, warmup
+
+
+def crash():
+    """Renderproces dat hard stopt, zoals bij een OOM-kill of segfault."""
+    os._exit(1)
+
+
+def test_render_pool_recovers_from_dead_process():
+    pool = RenderPool()
+    pool.workers, pool.timeout, pool.max_queue = 1, 30.0, 4
+    try:
+        assert pool.render(warmup) is not None
+
+        assert pool.render(crash) is None
+        assert pool.stats()['started'] is False
+
+        assert pool.render(warmup) is not None
+        stats = pool.stats()
+        assert stats['started'] is True
+        assert stats['queue_depth'] == 0
+    finally:
+        if pool._executor is not None:
+            pool._executor.shutdown(wait=True)
@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import db
+from app.models import Category, Exercise, ExperienceLevel, SetLog, WorkoutPlan, WorkoutPlanExercise, WorkoutSession
+
+
+@pytest.fixture
+def workout(app, make_user, login):
+    """Ingelogde client met een actieve sessie voor een plan met twee oefeningen."""
+    user = make_user()
+    plan = WorkoutPlan(user_id=user.id, name='Push')
+    db.session.add_all([
+        plan,
+        Exercise(id='bench', name='Bench Press', level=ExperienceLevel.BEGINNER, category=Category.STRENGTH),
+        Exercise(id='dips', name='Dips', level=ExperienceLevel.BEGINNER, category=Category.STRENGTH),
+    ])
+    db.session.flush()
+    bench = WorkoutPlanExercise(workout_plan_id=plan.id, exercise_id='bench', sets=3, reps=8)
+    dips = WorkoutPlanExercise(workout_plan_id=plan.id, exercise_id='dips', sets=1, reps=12)
+    workout_session = WorkoutSession(id='session-1', user_id=user.id, workout_plan_id=plan.id,
+                                     started_at=datetime.now(timezone.utc))
+    db.session.add_all([bench, dips, workout_session])
+    db.session.commit()
+
+    client = login(app.test_client(), user)
+    with client.session_transaction() as session:
+        session['current_workout_session'] = workout_session.id
+    return client, plan.id, bench.id, dips.id
+
+
+def form(*sets):
+    """Formulier van save_workout voor (wpe_id, set_number, reps, weight)-tuples."""
+    data = {}
+    for wpe_id, set_number, reps, weight in sets:
+        data[f'completed_{wpe_id}_{set_number}'] = 'on'
+        data[f'reps_{wpe_id}_{set_number}'] = str(reps)
+        data[f'weight_{wpe_id}_{set_number}'] = str(weight)
+    return data
+
+
+def stored_sets():
+    """{(wpe_id, set_number): (id, created_at, completed_at, reps, weight)} van de sessie."""
+    db.session.expire_all()
+    return {(row.workout_plan_exercise_id, row.set_number): (row.id, row.created_at, row.completed_at,
+                                                             row.reps, row.weight)
+            for row in SetLog.query.filter_by(workout_session_id='session-1')}
+
+
+def set_log_writes(statements):
+    """INSERT-, UPDATE- en DELETE-statements op set_logs."""
+    writes = {'INSERT': 0, 'UPDATE': 0, 'DELETE': 0}
+    for statement in statements:
+        words = statement.split()
+        verb = words[0].upper()
+        if verb in writes and 'set_logs' in words[:4]:
+            writes[verb] += 1
+    return writes
+
+
+def test_save_workout_writes_only_changed_sets(workout, count_queries):
+    client, plan_id, bench, dips = workout
+    url = f'/sessions/save_workout/{plan_id}'
+    first = form((bench, 1, 8, 60), (bench, 2, 8, 60), (bench, 3, 8, 60), (dips, 1, 12, 0))
+
+    assert client.post(url, data=first).json['success']
+    before = stored_sets()
+    assert len(before) == 4
+
+    # Opnieuw opslaan zonder wijzigingen schrijft niets
+    with count_queries() as statements:
+        assert client.post(url, data=first).json['success']
+    assert set_log_writes(statements) == {'INSERT': 0, 'UPDATE': 0, 'DELETE': 0}
+    assert stored_sets() == before
+
+    # Eén set gewijzigd en één set weggehaald
+    edited = form((bench, 1, 8, 60), (bench, 2, 6, 65), (bench, 3, 8, 60))
+    with count_queries() as statements:
+        assert client.post(url, data=edited).json['success']
+    assert set_log_writes(statements) == {'INSERT': 0, 'UPDATE': 1, 'DELETE': 1}
+
+    after = stored_sets()
+    assert set(after) == {(bench, 1), (bench, 2), (bench, 3)}
+    assert after[(bench, 1)] == before[(bench, 1)]
+    assert after[(bench, 3)] == before[(bench, 3)]
+    # Bijgewerkt op dezelfde rij
+    assert after[(bench, 2)][:3] == before[(bench, 2)][:3]
+    assert after[(bench, 2)][3:] == (6, 65.0)
+
+    workout_session = db.session.get(WorkoutSession, 'session-1')
+    assert (workout_session.total_sets, workout_session.total_reps) == (3, 22)